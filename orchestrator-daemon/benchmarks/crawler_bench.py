@@ -0,0 +1,133 @@
+"""
+Crawler benchmark: builds a synthetic project tree and times the old
+os.walk crawler against src.indexing.crawler.crawl_entries.
+
+    python benchmarks/crawler_bench.py --files 100000
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+import pathspec
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import Settings
+from src.indexing.crawler import CrawlStats, crawl_entries
+
+SOURCE_EXTENSIONS = [".py", ".ts", ".js", ".md", ".rs", ".go", ".json", ".txt"]
+
+def build_tree(root: str, n_files: int, seed: int = 0):
+    """
+    ~n_files files: a nested source tree with a .gitignore every few
+    directories, plus a node_modules, a build dir, some binaries and a few
+    oversized files.
+    """
+    rng = random.Random(seed)
+    with open(os.path.join(root, ".gitignore"), "w") as f:
+        f.write("*.log\n/secret.txt\ncoverage/\n")
+    # A quarter of the files sit in directories the crawler should prune
+    pruned = n_files // 4
+    for i in range(pruned):
+        d = os.path.join(root, "node_modules" if i % 2 else "build", f"pkg{i // 50}")
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, f"f{i}.js"), "w") as f:
+            f.write("module.exports = 1;\n")
+
+    files_per_dir = 20
+    for i in range(n_files - pruned):
+        d = os.path.join(root, "src", f"a{i // 2000}", f"b{(i // 200) % 10}", f"c{(i // files_per_dir) % 10}")
+        if not os.path.isdir(d):
+            os.makedirs(d)
+            if rng.random() < 0.2:
+                with open(os.path.join(d, ".gitignore"), "w") as f:
+                    f.write("*.tmp\ngenerated/\n!keep.tmp\n")
+        kind = rng.random()
+        if kind < 0.02:
+            path = os.path.join(d, f"blob{i}")
+            with open(path, "wb") as f:
+                f.write(os.urandom(256) + b"\0" + os.urandom(256))
+        elif kind < 0.03:
+            path = os.path.join(d, f"image{i}.png")
+            with open(path, "wb") as f:
+                f.write(b"\x89PNG\r\n\x1a\n")
+        elif kind < 0.035:
+            path = os.path.join(d, f"dump{i}.txt")
+            with open(path, "w") as f:
+                f.write("x" * (1024 * 1024 + 1))
+        elif kind < 0.06:
+            path = os.path.join(d, f"scratch{i}.tmp")
+            with open(path, "w") as f:
+                f.write("tmp\n")
+        else:
+            ext = rng.choice(SOURCE_EXTENSIONS)
+            with open(os.path.join(d, f"file{i}{ext}"), "w") as f:
+                f.write(f"# file {i}\n" * 4)
+
+def legacy_crawl(root_path: str):
+    """The crawler before the scandir rewrite: root .gitignore only, no filters."""
+    patterns = [".git/", "__pycache__/", ".env", "node_modules/", "target/", "dist/", "build/"]
+    gitignore_path = os.path.join(root_path, ".gitignore")
+    if os.path.exists(gitignore_path):
+        with open(gitignore_path, "r", encoding="utf-8") as f:
+            patterns.extend(f.readlines())
+    spec = pathspec.PathSpec.from_lines("gitwildmatch", patterns)
+
+    for root, dirs, files in os.walk(root_path):
+        dirs[:] = [d for d in dirs if not spec.match_file(os.path.join(os.path.relpath(os.path.join(root, d), root_path)))]
+        for file in files:
+            abs_path = os.path.join(root, file)
+            rel_path = os.path.relpath(abs_path, root_path)
+            if not spec.match_file(rel_path):
+                # The pipeline stat()ed every path for size/mtime afterwards
+                os.stat(abs_path)
+                yield abs_path
+
+def timed(fn, repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    parser.add_argument("--keep", help="build the tree here and keep it")
+    args = parser.parse_args()
+
+    root = args.keep or tempfile.mkdtemp(prefix="crawler_bench_")
+    os.makedirs(root, exist_ok=True)
+    try:
+        start = time.perf_counter()
+        build_tree(root, args.files)
+        build_s = time.perf_counter() - start
+
+        config = Settings(index_use_global_excludes=False)
+        stats = CrawlStats()
+        legacy_s, legacy_files = timed(lambda: list(legacy_crawl(root)), args.repeat)
+        new_s, new_files = timed(lambda: list(crawl_entries(root, config)), args.repeat)
+        # One more pass to report what the filters dropped
+        list(crawl_entries(root, config, stats))
+
+        print(json.dumps({
+            "files_created": args.files,
+            "build_s": round(build_s, 2),
+            "legacy": {"wall_s": round(legacy_s, 3), "files": len(legacy_files)},
+            "scandir": {"wall_s": round(new_s, 3), "files": len(new_files), "excluded": stats.excluded},
+            "speedup": round(legacy_s / new_s, 2) if new_s else None
+        }, indent=2))
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
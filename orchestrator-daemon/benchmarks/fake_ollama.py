@@ -0,0 +1,205 @@
+"""
+Fake Ollama HTTP server for offline benchmarks. Speaks the endpoints the
+daemon uses (/, /api/tags, /api/ps, /api/show, /api/generate streaming and
+not, /api/pull, /api/delete) with a configurable time to first token,
+token rate and number of generations it serves at once. Models start
+unloaded: the first request for one pays `load_ms`, a request without a
+prompt only loads it and keep_alive=0 unloads it, as in Ollama.
+
+    python benchmarks/fake_ollama.py --port 11435 --latency-ms 50 --tokens-per-s 40
+    ORCH_OLLAMA_HOST=http://127.0.0.1:11435 uvicorn src.main:app
+"""
+import json
+import time
+import argparse
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+@dataclass
+class FakeOllamaConfig:
+    latency_ms: float = 50.0  # before the first token: prompt eval
+    load_ms: float = 0.0  # extra, when the model isn't loaded yet
+    tokens_per_s: float = 50.0
+    response_tokens: int = 64
+    parallel: int = 4  # generations served at once; more wait, like OLLAMA_NUM_PARALLEL
+    context_length: int = 8192
+    models: List[str] = field(default_factory=lambda: ["llama3.2:3b", "qwen2.5-coder:7b"])
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+    server: "FakeOllama"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _send_json(self, body: dict, status: int = 200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _model_list(self, names: List[str]) -> dict:
+        return {"models": [{"name": m, "model": m, "size": 2 * 1024 ** 3} for m in names]}
+
+    def do_GET(self):
+        if self.path == "/":
+            data = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif self.path == "/api/tags":
+            self._send_json(self._model_list(self.server.config.models))
+        elif self.path == "/api/ps":
+            self._send_json(self._model_list(sorted(self.server.loaded)))
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_DELETE(self):
+        self._read_json()
+        if self.path == "/api/delete":
+            self._send_json({})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        body = self._read_json()
+        if self.path == "/api/show":
+            self._send_json({"model_info": {"general.architecture": "llama",
+                                            "llama.context_length": self.server.config.context_length}})
+        elif self.path == "/api/pull":
+            self._send_json({"status": "success"})
+        elif self.path == "/api/generate":
+            self._generate(body)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _generate(self, body: dict):
+        cfg = self.server.config
+        model = body.get("model", cfg.models[0])
+        if body.get("keep_alive") == 0:
+            self.server.loaded.discard(model)
+            self._send_json({"model": model, "response": "", "done": True, "done_reason": "unload"})
+            return
+        if "prompt" not in body:
+            self.server.load(model)
+            self._send_json({"model": model, "response": "", "done": True, "done_reason": "load"})
+            return
+        stream = body.get("stream", True)
+        prompt_tokens = len(str(body.get("prompt", "")).split())
+        start = time.perf_counter()
+        with self.server.slots:
+            self.server.count_request()
+            self.server.load(model)
+            time.sleep(cfg.latency_ms / 1000)
+            load_done = time.perf_counter()
+            interval = 1.0 / cfg.tokens_per_s if cfg.tokens_per_s > 0 else 0.0
+            tokens = [f"tok{i} " for i in range(cfg.response_tokens)]
+            if stream:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(interval)
+                    self._chunk({"model": model, "response": token, "done": False})
+            else:
+                time.sleep(interval * len(tokens))
+            end = time.perf_counter()
+
+        final = {
+            "model": model,
+            "response": "" if stream else "".join(tokens),
+            "done": True,
+            "total_duration": int((end - start) * 1e9),
+            "load_duration": int((load_done - start) * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": len(tokens),
+            "eval_duration": int((end - load_done) * 1e9),
+        }
+        if stream:
+            self._chunk(final)
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self._send_json(final)
+
+    def _chunk(self, obj: dict):
+        data = json.dumps(obj).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+class FakeOllama(ThreadingHTTPServer):
+    """Runs on a background thread; port 0 picks a free port (see .url)."""
+    daemon_threads = True
+
+    def __init__(self, config: Optional[FakeOllamaConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeOllamaConfig()
+        self.slots = threading.Semaphore(max(1, self.config.parallel))
+        self.generations = 0
+        self.loads = 0
+        self.loaded = set()
+        self._count_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        super().__init__((host, port), _Handler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self):
+        with self._count_lock:
+            self.generations += 1
+
+    def load(self, model: str):
+        # One load at a time, like Ollama's scheduler
+        with self._load_lock:
+            if model in self.loaded:
+                return
+            self.loads += 1
+            time.sleep(self.config.load_ms / 1000)
+            self.loaded.add(model)
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--load-ms", type=float, default=0.0)
+    parser.add_argument("--tokens-per-s", type=float, default=50.0)
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument("--parallel", type=int, default=4)
+    args = parser.parse_args()
+    config = FakeOllamaConfig(latency_ms=args.latency_ms, load_ms=args.load_ms, tokens_per_s=args.tokens_per_s,
+                              response_tokens=args.response_tokens, parallel=args.parallel)
+    server = FakeOllama(config, port=args.port)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Offline benchmark suite. Generates a synthetic repository and measures,
+stage by stage:
+
+    crawl    files/s through crawl_entries
+    chunk    files/s, chunks/s and MB/s through chunk_file
+    embed    chunks/s through the embedder (embedding cache off)
+    upsert   chunks/s written to the vector index
+    index    the whole IndexPipeline on a fresh store
+    query    p50/p99 query latency per retrieval mode
+    agent    end-to-end /agent/task latency at several concurrency levels,
+             against a daemon subprocess talking to a fake Ollama server
+
+Nothing touches the network: generations come from benchmarks/fake_ollama.py
+and, when the MiniLM weights are not on disk, embeddings come from the
+hashing embedder (--embedder hash forces it). Results are written as JSON
+so two runs can be diffed.
+
+    python benchmarks/suite.py --files 2000 --out bench.json
+    python benchmarks/suite.py --phases crawl,chunk --files 20000
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import importlib.util
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+
+DAEMON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(DAEMON_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.config import Settings
+from src.indexing.chunker import LineReader, chunk_file
+from src.indexing.crawler import crawl_entries
+from src.indexing.pipeline import IndexPipeline
+from src.vector.embedder import EMBEDDING_MODEL, HASHING_MODEL, Embedder, load_embedding_model
+from src.vector.index import create_vector_index
+from src.vector.store import VectorStore
+
+from fake_ollama import FakeOllama, FakeOllamaConfig
+from synthetic_repo import WORDS, generate_repo
+
+PHASES = ("crawl", "chunk", "embed", "upsert", "index", "query", "agent")
+
+TASK_TEMPLATES = [
+    "Explain how {a} interacts with {b} in this project",
+    "Refactor {a} to avoid recomputing {b}",
+    "Write tests for {a} covering {b}",
+    "Document the {a} module",
+]
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered), math.ceil(p / 100 * len(ordered))) - 1)
+    return round(ordered[rank], 2)
+
+def rate(count: float, seconds: float) -> Optional[float]:
+    return round(count / seconds, 1) if seconds > 0 else None
+
+def pick_embedder(choice: str):
+    """(model name, model): MiniLM when its weights load offline, else the hashing embedder."""
+    if choice == HASHING_MODEL:
+        return HASHING_MODEL, load_embedding_model(HASHING_MODEL)
+    # Never download weights in a benchmark run
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    try:
+        return EMBEDDING_MODEL, load_embedding_model(EMBEDDING_MODEL)
+    except Exception as e:
+        if choice != "auto":
+            raise
+        print(f"MiniLM unavailable ({type(e).__name__}); using the hashing embedder", file=sys.stderr)
+        return HASHING_MODEL, load_embedding_model(HASHING_MODEL)
+
+def pick_backend(choice: str) -> str:
+    if choice != "auto":
+        return choice
+    return "chroma" if importlib.util.find_spec("chromadb") else "mmap"
+
+def make_queries(n: int, seed: int = 1) -> List[str]:
+    """Distinct queries, so neither the query nor the result cache hides the search."""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(n):
+        kind = i % 3
+        if kind == 0:
+            queries.append(f"{rng.choice(WORDS)}_{rng.choice(WORDS)}")  # identifier lookup
+        elif kind == 1:
+            queries.append(f"where is the {rng.choice(WORDS)} {rng.choice(WORDS)} handled #{i}")
+        else:
+            queries.append(f"how does {rng.choice(WORDS)} {rng.choice(WORDS)} reach {rng.choice(WORDS)} #{i}")
+    return queries
+
+def open_store(path: str, cfg: Settings, embedder: Embedder) -> VectorStore:
+    return VectorStore(path, retrieval_mode=cfg.retrieval_mode,
+                       index=create_vector_index(path, "bench", cfg), embedder=embedder)
+
+# -- phases ------------------------------------------------------------------
+
+def bench_crawl(repo: str, cfg: Settings, repeat: int) -> dict:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        entries = list(crawl_entries(repo, cfg))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"files": len(entries), "wall_s": round(best, 3), "files_per_s": rate(len(entries), best)}
+
+def bench_chunk(repo: str, cfg: Settings) -> Tuple[dict, List[Dict]]:
+    entries = list(crawl_entries(repo, cfg))
+    chunks = []
+    start = time.perf_counter()
+    for entry in entries:
+        reader = LineReader(entry.path, cfg.chunk_decode_errors, cfg.chunk_max_file_bytes, cfg.chunk_max_file_lines)
+        for c in chunk_file(entry.path, cfg.chunk_max_tokens, cfg.chunk_overlap_tokens, reader,
+                            cfg.chunk_stream_min_bytes):
+            chunks.append({"filepath": c.filepath, "content": c.content,
+                           "start_line": c.start_line, "end_line": c.end_line})
+    elapsed = time.perf_counter() - start
+    mb = sum(e.size for e in entries) / (1024 * 1024)
+    return {
+        "files": len(entries),
+        "chunks": len(chunks),
+        "wall_s": round(elapsed, 3),
+        "files_per_s": rate(len(entries), elapsed),
+        "chunks_per_s": rate(len(chunks), elapsed),
+        "mb_per_s": rate(mb, elapsed)
+    }, chunks
+
+def bench_embed(embedder: Embedder, chunks: List[Dict], batch_size: int) -> Tuple[dict, List[List[float]]]:
+    embeddings = []
+    start = time.perf_counter()
+    for i in range(0, len(chunks), batch_size):
+        embeddings.extend(embedder.embed_texts([c["content"] for c in chunks[i:i + batch_size]]))
+    elapsed = time.perf_counter() - start
+    return {"chunks": len(chunks), "batch_size": batch_size, "wall_s": round(elapsed, 3),
+            "chunks_per_s": rate(len(chunks), elapsed)}, embeddings
+
+def bench_upsert(store: VectorStore, chunks: List[Dict], embeddings: List[List[float]], batch_size: int) -> dict:
+    start = time.perf_counter()
+    for i in range(0, len(chunks), batch_size):
+        store.upsert_embeddings(chunks[i:i + batch_size], embeddings[i:i + batch_size])
+    store.flush()
+    elapsed = time.perf_counter() - start
+    return {"chunks": len(chunks), "batch_size": batch_size, "wall_s": round(elapsed, 3),
+            "chunks_per_s": rate(len(chunks), elapsed)}
+
+def bench_index(repo: str, path: str, cfg: Settings, embedder: Embedder) -> dict:
+    report = IndexPipeline(open_store(path, cfg, embedder), cfg).run(repo)
+    return {
+        "files": report.files_indexed,
+        "chunks": report.chunks_upserted,
+        "wall_s": report.wall_s,
+        "files_per_s": rate(report.files_indexed, report.wall_s),
+        "chunks_per_s": rate(report.chunks_upserted, report.wall_s),
+        "bottleneck": report.bottleneck
+    }
+
+def bench_query(store: VectorStore, n_queries: int, k: int, modes: List[str]) -> dict:
+    out = {}
+    for mode in modes:
+        latencies = []
+        for q in make_queries(n_queries, seed=len(out) + 1):
+            start = time.perf_counter()
+            store.query_similar(q, n_results=k, mode=mode)
+            latencies.append((time.perf_counter() - start) * 1000)
+        out[mode] = {"queries": len(latencies), "p50_ms": percentile(latencies, 50),
+                     "p99_ms": percentile(latencies, 99), "qps": rate(len(latencies), sum(latencies) / 1000)}
+    return out
+
+async def _fire(base_url: str, project: str, concurrency: int, requests: int) -> dict:
+    import httpx
+    slots = asyncio.Semaphore(concurrency)
+    latencies, retrieval, errors = [], [], 0
+    tasks = [t.format(a=f"{WORDS[i % len(WORDS)]}_{WORDS[(i * 7) % len(WORDS)]}", b=WORDS[(i * 3) % len(WORDS)])
+             for i, t in enumerate(TASK_TEMPLATES * (requests // len(TASK_TEMPLATES) + 1))][:requests]
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300.0,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one(task: str):
+            nonlocal errors
+            async with slots:
+                start = time.perf_counter()
+                resp = await client.post("/agent/task", json={"task": task, "use_cache": False, "project": project})
+                elapsed = (time.perf_counter() - start) * 1000
+            if resp.status_code != 200:
+                errors += 1
+                return
+            latencies.append(elapsed)
+            meta = resp.json().get("metadata") or {}
+            if meta.get("retrieval_ms") is not None:
+                retrieval.append(meta["retrieval_ms"])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(t) for t in tasks))
+        wall = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "retrieval_p50_ms": percentile(retrieval, 50),
+        "requests_per_s": rate(len(latencies), wall)
+    }
+
+def _wait_http(url: str, timeout: float, ok=lambda r: r.status_code == 200):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            resp = httpx.get(url, timeout=2.0)
+            if ok(resp):
+                return resp
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"Timed out waiting for {url}")
+
+def bench_agent(repo: str, work_dir: str, model_name: str, backend: str, args) -> dict:
+    missing = [m for m in ("fastapi", "uvicorn", "httpx") if importlib.util.find_spec(m) is None]
+    if missing:
+        return {"skipped": f"not installed: {', '.join(missing)}"}
+    import httpx
+
+    fake = FakeOllama(FakeOllamaConfig(latency_ms=args.ollama_latency_ms, tokens_per_s=args.ollama_tokens_per_s,
+                                       response_tokens=args.ollama_response_tokens,
+                                       parallel=args.ollama_parallel)).start()
+    port = args.daemon_port
+    env = dict(os.environ,
+               ORCH_OLLAMA_HOST=fake.url,
+               ORCH_VECTOR_DB_PATH=os.path.join(work_dir, "daemon_db"),
+               ORCH_VECTOR_BACKEND=backend,
+               ORCH_EMBEDDING_MODEL=model_name,
+               ORCH_COMPLETION_CACHE_MAX_MB="0",
+               HF_HUB_OFFLINE="1")
+    daemon = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=DAEMON_DIR, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_http(f"{base_url}/ready", timeout=120.0)
+        job = httpx.post(f"{base_url}/project/index", json={"path": repo}).json()
+        job = _wait_http(f"{base_url}/project/index/{job['job_id']}", timeout=600.0,
+                         ok=lambda r: r.json().get("status") not in ("queued", "running")).json()
+        if job["status"] != "completed":
+            return {"error": f"indexing {job['status']}: {job.get('error')}"}
+
+        levels = {}
+        for concurrency in args.concurrency:
+            requests = max(args.agent_requests, concurrency * 2)
+            levels[str(concurrency)] = asyncio.run(_fire(base_url, repo, concurrency, requests))
+        return {"ollama": asdict(fake.config), "generations": fake.generations, "concurrency": levels}
+    finally:
+        daemon.terminate()
+        try:
+            daemon.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            daemon.kill()
+        fake.stop()
+
+# -- driver ------------------------------------------------------------------
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DAEMON_DIR,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phases", default=",".join(PHASES))
+    parser.add_argument("--out", help="also write the JSON report here")
+    parser.add_argument("--work-dir", help="keep the repo and indexes here instead of a temp dir")
+    # Synthetic repository
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--min-lines", type=int, default=20)
+    parser.add_argument("--max-lines", type=int, default=400)
+    parser.add_argument("--languages", default="py,ts,go,md")
+    parser.add_argument("--seed", type=int, default=0)
+    # Retrieval
+    parser.add_argument("--embedder", default="auto", choices=["auto", EMBEDDING_MODEL, HASHING_MODEL])
+    parser.add_argument("--backend", default="auto", choices=["auto", "chroma", "mmap"])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--modes", default="vector,lexical,hybrid")
+    parser.add_argument("--repeat", type=int, default=3, help="crawl: best of N runs")
+    # End-to-end
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 4, 16])
+    parser.add_argument("--agent-requests", type=int, default=32, help="requests per concurrency level")
+    parser.add_argument("--daemon-port", type=int, default=18765)
+    parser.add_argument("--ollama-latency-ms", type=float, default=50.0)
+    parser.add_argument("--ollama-tokens-per-s", type=float, default=200.0)
+    parser.add_argument("--ollama-response-tokens", type=int, default=64)
+    parser.add_argument("--ollama-parallel", type=int, default=4)
+    args = parser.parse_args()
+
+    phases = [p for p in args.phases.split(",") if p]
+    unknown = [p for p in phases if p not in PHASES]
+    if unknown:
+        parser.error(f"unknown phases {unknown}, expected some of {PHASES}")
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="orch_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    repo = os.path.join(work_dir, "repo")
+    backend = pick_backend(args.backend)
+    cfg = Settings(vector_backend=backend, index_use_global_excludes=False)
+    report = {
+        "meta": {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "backend": backend,
+            "args": vars(args)
+        }
+    }
+    try:
+        if os.path.isdir(repo):
+            shutil.rmtree(repo)
+        start = time.perf_counter()
+        report["repo"] = asdict(generate_repo(repo, args.files, args.min_lines, args.max_lines,
+                                              args.languages, seed=args.seed))
+        report["repo"]["generate_s"] = round(time.perf_counter() - start, 2)
+
+        needs_model = any(p in phases for p in ("embed", "upsert", "index", "query", "agent"))
+        model_name, model = pick_embedder(args.embedder) if needs_model else (None, None)
+        report["meta"]["embedder"] = model_name
+        # No embedding cache: every phase measures real encoding work
+        embedder = Embedder(model, None, 0, model_name=model_name) if model is not None else None
+
+        chunks, embeddings = None, None
+        store_path = os.path.join(work_dir, "store")
+        if "crawl" in phases:
+            report["crawl"] = bench_crawl(repo, cfg, args.repeat)
+        if any(p in phases for p in ("chunk", "embed", "upsert", "query")):
+            result, chunks = bench_chunk(repo, cfg)
+            if "chunk" in phases:
+                report["chunk"] = result
+        if any(p in phases for p in ("embed", "upsert", "query")):
+            result, embeddings = bench_embed(embedder, chunks, args.batch_size)
+            if "embed" in phases:
+                report["embed"] = result
+        if any(p in phases for p in ("upsert", "query")):
+            shutil.rmtree(store_path, ignore_errors=True)
+            store = open_store(store_path, cfg, embedder)
+            result = bench_upsert(store, chunks, embeddings, args.batch_size)
+            if "upsert" in phases:
+                report["upsert"] = result
+            if "query" in phases:
+                report["query"] = bench_query(store, args.queries, args.k, args.modes.split(","))
+        if "index" in phases:
+            index_path = os.path.join(work_dir, "index_store")
+            shutil.rmtree(index_path, ignore_errors=True)
+            report["index"] = bench_index(repo, index_path, cfg, embedder)
+        if "agent" in phases:
+            report["agent"] = bench_agent(repo, work_dir, model_name, backend, args)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Synthetic repository generator: a nested source tree of plausible code in
+several languages, deterministic for a given seed. Used by the benchmark
+suite; can also be run on its own to build a tree to index by hand.
+
+    python benchmarks/synthetic_repo.py /tmp/repo --files 2000 --languages py,ts,go,md
+"""
+import os
+import json
+import random
+import argparse
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List
+
+WORDS = [
+    "user", "session", "config", "cache", "index", "token", "buffer", "request", "response", "parse",
+    "render", "schema", "record", "batch", "queue", "worker", "stream", "chunk", "vector", "model",
+    "account", "invoice", "order", "payment", "route", "handler", "client", "server", "event", "metric",
+    "load", "save", "update", "delete", "create", "merge", "filter", "build", "validate", "resolve",
+]
+
+EXTENSIONS = {"py": ".py", "ts": ".ts", "js": ".js", "go": ".go", "rs": ".rs", "java": ".java", "md": ".md"}
+
+@dataclass
+class RepoStats:
+    files: int = 0
+    bytes: int = 0
+    lines: int = 0
+    by_language: Dict[str, int] = field(default_factory=dict)
+
+def _ident(rng: random.Random, n: int = 2) -> str:
+    return "_".join(rng.choice(WORDS) for _ in range(n))
+
+def _camel(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(p.title() for p in rest)
+
+def _body(rng: random.Random, indent: str, lines: int, assign: str, end: str = "") -> List[str]:
+    out = []
+    for _ in range(lines):
+        out.append(f"{indent}{assign.format(a=_ident(rng), b=_ident(rng), n=rng.randint(0, 999))}{end}")
+    return out
+
+def _python(rng: random.Random, target_lines: int) -> List[str]:
+    lines = ["import os", "import json", ""]
+    while len(lines) < target_lines:
+        if rng.random() < 0.3:
+            cls = _ident(rng).title().replace("_", "")
+            lines += [f"class {cls}:", f'    """{" ".join(rng.choice(WORDS) for _ in range(8))}."""']
+            for _ in range(rng.randint(1, 4)):
+                lines += [f"    def {_ident(rng)}(self, {_ident(rng, 1)}):"]
+                lines += _body(rng, "        ", rng.randint(2, 12), "{a} = self.{b} + {n}")
+                lines += ["        return None", ""]
+        else:
+            lines += [f"def {_ident(rng)}({_ident(rng, 1)}, {_ident(rng, 1)}=None):"]
+            lines += _body(rng, "    ", rng.randint(2, 20), "{a} = {b}({n})")
+            lines += [f"    return {_ident(rng)}", ""]
+    return lines
+
+def _braces(rng: random.Random, target_lines: int, lang: str) -> List[str]:
+    header = {
+        "ts": ["import { readFile } from 'fs';", ""],
+        "js": ["const fs = require('fs');", ""],
+        "go": ["package main", "", 'import "fmt"', ""],
+        "rs": ["use std::collections::HashMap;", ""],
+        "java": ["package com.example;", "", "public class Generated {"],
+    }[lang]
+    lines = list(header)
+    while len(lines) < target_lines:
+        name = _camel(_ident(rng))
+        arg = _camel(_ident(rng, 1))
+        if lang == "go":
+            lines.append(f"func {name}({arg} int) int {{")
+            lines += _body(rng, "\t", rng.randint(2, 20), "{a} := fmt.Sprint({n})")
+            lines += [f"\treturn {arg}", "}", ""]
+        elif lang == "rs":
+            lines.append(f"pub fn {_ident(rng)}({_ident(rng, 1)}: usize) -> usize {{")
+            lines += _body(rng, "    ", rng.randint(2, 20), "let {a} = {n};")
+            lines += ["    0", "}", ""]
+        elif lang == "java":
+            lines.append(f"    public int {name}(int {arg}) {{")
+            lines += _body(rng, "        ", rng.randint(2, 20), "int {a} = {n};")
+            lines += [f"        return {arg};", "    }", ""]
+        else:
+            lines.append(f"export function {name}({arg}) {{")
+            lines += _body(rng, "  ", rng.randint(2, 20), "const {a} = {b}({n});")
+            lines += [f"  return {arg};", "}", ""]
+    if lang == "java":
+        lines.append("}")
+    return lines
+
+def _markdown(rng: random.Random, target_lines: int) -> List[str]:
+    lines = [f"# {' '.join(rng.choice(WORDS) for _ in range(3)).title()}", ""]
+    while len(lines) < target_lines:
+        lines += [f"## {_ident(rng).replace('_', ' ').title()}", ""]
+        for _ in range(rng.randint(1, 4)):
+            lines.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))) + ".")
+        lines.append("")
+    return lines
+
+def generate_file(rng: random.Random, lang: str, target_lines: int) -> str:
+    if lang == "py":
+        lines = _python(rng, target_lines)
+    elif lang == "md":
+        lines = _markdown(rng, target_lines)
+    else:
+        lines = _braces(rng, target_lines, lang)
+    return "\n".join(lines) + "\n"
+
+def generate_repo(root: str, files: int = 1000, min_lines: int = 20, max_lines: int = 400,
+                  languages: str = "py,ts,go,md", files_per_dir: int = 25, seed: int = 0) -> RepoStats:
+    """
+    `files` source files under root/src, file lengths drawn log-uniformly
+    between min_lines and max_lines (most files short, a few long), plus a
+    .gitignore and an ignored build/ directory the crawler should skip.
+    """
+    rng = random.Random(seed)
+    langs = [l.strip() for l in languages.split(",") if l.strip()]
+    unknown = [l for l in langs if l not in EXTENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown languages {unknown}, expected some of {sorted(EXTENSIONS)}")
+    stats = RepoStats(by_language={l: 0 for l in langs})
+
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".gitignore"), "w") as f:
+        f.write("build/\n*.log\n")
+    os.makedirs(os.path.join(root, "build"), exist_ok=True)
+    with open(os.path.join(root, "build", "bundle.js"), "w") as f:
+        f.write("// generated\n" * 100)
+
+    for i in range(files):
+        d = os.path.join(root, "src", f"pkg{i // (files_per_dir * 10)}", f"mod{(i // files_per_dir) % 10}")
+        os.makedirs(d, exist_ok=True)
+        lang = rng.choice(langs)
+        target = int(round(min_lines * (max_lines / min_lines) ** rng.random())) if max_lines > min_lines else min_lines
+        text = generate_file(rng, lang, target)
+        with open(os.path.join(d, f"{_ident(rng)}_{i}{EXTENSIONS[lang]}"), "w", encoding="utf-8") as f:
+            f.write(text)
+        stats.files += 1
+        stats.bytes += len(text.encode("utf-8"))
+        stats.lines += text.count("\n")
+        stats.by_language[lang] += 1
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--min-lines", type=int, default=20)
+    parser.add_argument("--max-lines", type=int, default=400)
+    parser.add_argument("--languages", default="py,ts,go,md")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    stats = generate_repo(args.root, args.files, args.min_lines, args.max_lines, args.languages, seed=args.seed)
+    print(json.dumps(asdict(stats), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Vector index benchmark: builds each backend from the same synthetic,
+clustered embeddings and reports build time, load time, resident memory,
+disk size, query latency and recall@k against an exact float32 search.
+Every backend runs in its own process so memory numbers don't mix.
+
+    python benchmarks/vector_index_bench.py --vectors 100000
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BACKENDS = {
+    "mmap-float32": {"dtype": "float32", "ivf_min_vectors": 0},
+    "mmap-int8": {"dtype": "int8", "ivf_min_vectors": 0},
+    "mmap-int8-ivf": {"dtype": "int8", "ivf_min_vectors": 1},
+    "chroma": {},
+}
+
+def make_data(n: int, dim: int, n_queries: int, clusters: int, seed: int = 0):
+    """Unit vectors around random cluster centers, like embeddings of related code."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    def sample(count):
+        points = centers[rng.integers(0, clusters, size=count)] + rng.normal(scale=0.6, size=(count, dim))
+        return (points / np.linalg.norm(points, axis=1, keepdims=True)).astype(np.float32)
+    return sample(n), sample(n_queries)
+
+def rss_mb() -> float:
+    import psutil
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+def open_index(backend: str, path: str, nprobe: int):
+    if backend == "chroma":
+        from src.vector.index import ChromaIndex, create_chroma_client
+        return ChromaIndex(create_chroma_client(path))
+    from src.vector.mmap_index import MmapIndex
+    return MmapIndex(path, nprobe=nprobe, **BACKENDS[backend])
+
+def disk_mb(path: str) -> float:
+    total = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+    return round(total / (1024 * 1024), 2)
+
+def worker(backend: str, data_dir: str, phase: str, k: int, nprobe: int):
+    path = os.path.join(data_dir, backend)
+    if phase == "build":
+        vectors = np.load(os.path.join(data_dir, "vectors.npy"))
+        index = open_index(backend, path, nprobe)
+        start = time.perf_counter()
+        for i in range(0, len(vectors), 1000):
+            ids = [f"src/file{j // 20}.py:{j}" for j in range(i, min(len(vectors), i + 1000))]
+            index.upsert(ids, vectors[i:i + 1000].tolist(), [f"chunk {j}" for j in range(i, i + len(ids))],
+                         [{"filepath": f"src/file{j // 20}.py", "start_line": j, "end_line": j} for j in range(i, i + len(ids))])
+        index.flush()
+        return {"build_s": round(time.perf_counter() - start, 2)}
+
+    queries = np.load(os.path.join(data_dir, "queries.npy"))
+    baseline = rss_mb()
+    start = time.perf_counter()
+    index = open_index(backend, path, nprobe)
+    index.count()
+    load_s = time.perf_counter() - start
+    latencies, results = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        hits = index.query(q.tolist(), k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        results.append([int(h["id"].rsplit(":", 1)[1]) for h in hits])
+    latencies.sort()
+    return {
+        "load_s": round(load_s, 3),
+        "rss_mb": round(rss_mb() - baseline, 1),
+        "disk_mb": disk_mb(path),
+        "query_ms_p50": round(latencies[len(latencies) // 2], 2),
+        "query_ms_p95": round(latencies[int(len(latencies) * 0.95)], 2),
+        "results": results
+    }
+
+def run_worker(backend: str, data_dir: str, phase: str, args) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--worker", backend, "--phase", phase, "--data", data_dir,
+         "--k", str(args.k), "--nprobe", str(args.nprobe)],
+        capture_output=True, text=True
+    )
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "failed"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)  # all-MiniLM-L6-v2
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--worker")
+    parser.add_argument("--phase")
+    parser.add_argument("--data")
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args.worker, args.data, args.phase, args.k, args.nprobe)))
+        return
+
+    data_dir = tempfile.mkdtemp(prefix="vector_bench_")
+    try:
+        vectors, queries = make_data(args.vectors, args.dim, args.queries, args.clusters)
+        np.save(os.path.join(data_dir, "vectors.npy"), vectors)
+        np.save(os.path.join(data_dir, "queries.npy"), queries)
+        exact = [set(np.argsort(((vectors - q) ** 2).sum(axis=1))[:args.k].tolist()) for q in queries]
+
+        report = {"vectors": args.vectors, "dim": args.dim, "k": args.k, "nprobe": args.nprobe, "backends": {}}
+        for backend in args.backends.split(","):
+            result = run_worker(backend, data_dir, "build", args)
+            if "error" not in result:
+                result.update(run_worker(backend, data_dir, "query", args))
+            hits = result.pop("results", None)
+            if hits is not None:
+                result["recall"] = round(float(np.mean([len(e & set(h)) / args.k for e, h in zip(exact, hits)])), 3)
+            report["backends"][backend] = result
+        print(json.dumps(report, indent=2))
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Optional
+from typing import AsyncIterator, Iterable, Iterator, Optional
+from ..ollama.client import CompletionChunk, complete, stream_completion
+from ..ollama.async_client import get_async_client
+from ..ollama.catalog import DEFAULT_MODEL, catalog
+from ..ollama.warm_pool import warm_pool
+from ..telemetry.tracing import span
 
 @dataclass
 class AgentResponse:
@@ -9,16 +14,99 @@ class AgentResponse:
     metadata: Optional[dict] = None
 
 class BaseAgent(ABC):
+    # Value of metadata["type"] on responses from this agent
+    response_type = "text"
+
     def __init__(self, name: str, role: str):
         self.name = name
         self.role = role
 
     @abstractmethod
-    def execute(self, task: str, context: Optional[str] = None) -> AgentResponse:
+    def build_prompt(self, task: str, context: str = "") -> str:
+        """
+        Build the agent-specific prompt.
+        :param task: The user's input/request.
+        :param context: Retrieved context from vector DB (optional).
+        """
+        pass
+
+    def select_model(self) -> str:
+        # Served from the in-memory catalog; no Ollama round-trip per task
+        return catalog.default_model()
+
+    async def aselect_model(self) -> str:
+        # Until the first refresh lands the catalog would fetch synchronously,
+        # blocking the event loop; fetch it with the async client instead
+        if catalog.refreshed_at == 0.0:
+            try:
+                await catalog.refresh()
+            except Exception as e:
+                print(f"Model catalog refresh failed: {e}")
+            if catalog.refreshed_at == 0.0:
+                return DEFAULT_MODEL
+        return self.select_model()
+
+    def execute(self, task: str, context: Optional[str] = None, model_name: Optional[str] = None,
+                use_cache: bool = True, sources: Iterable[str] = (), priority: str = "interactive") -> AgentResponse:
         """
         Execute the agent's specific task.
         :param task: The user's input/request.
         :param context: Retrieved context from vector DB (optional).
+        :param use_cache: False forces a fresh generation.
+        :param sources: Files the context came from (for cache invalidation).
+        :param priority: Scheduler class, "interactive" or "batch".
         :return: AgentResponse
         """
-        pass
+        model_name = model_name or self.select_model()
+        with span("build_prompt"):
+            prompt = self.build_prompt(task, context or "")
+        with span("generate"):
+            completion = complete(model_name, prompt, use_cache=use_cache, sources=sources, priority=priority)
+        if not completion.cache_hit:
+            warm_pool.touch(model_name)
+
+        return AgentResponse(
+            agent_name=self.name,
+            content=completion.text,
+            metadata={"type": self.response_type, "model": model_name, "cache_hit": completion.cache_hit,
+                      "queue_wait_ms": completion.queue_wait_ms}
+        )
+
+    def execute_stream(self, task: str, context: Optional[str] = None, model_name: Optional[str] = None,
+                       priority: str = "interactive") -> Iterator[CompletionChunk]:
+        """
+        Streaming variant of execute: yields tokens as Ollama produces them.
+        The final chunk has done=True and carries generation stats.
+        """
+        model_name = model_name or self.select_model()
+        warm_pool.touch(model_name)
+        return stream_completion(model_name, self.build_prompt(task, context or ""), priority=priority)
+
+    async def aexecute(self, task: str, context: Optional[str] = None, model_name: Optional[str] = None,
+                       use_cache: bool = True, sources: Iterable[str] = (),
+                       priority: str = "interactive") -> AgentResponse:
+        """Async execute over the shared connection pool; used by the API."""
+        model_name = model_name or await self.aselect_model()
+        with span("build_prompt"):
+            prompt = self.build_prompt(task, context or "")
+        with span("generate"):
+            completion = await get_async_client().complete(model_name, prompt, use_cache=use_cache,
+                                                           sources=sources, priority=priority)
+        if not completion.cache_hit:
+            warm_pool.touch(model_name)
+
+        return AgentResponse(
+            agent_name=self.name,
+            content=completion.text,
+            metadata={"type": self.response_type, "model": model_name, "cache_hit": completion.cache_hit,
+                      "queue_wait_ms": completion.queue_wait_ms}
+        )
+
+    async def aexecute_stream(self, task: str, context: Optional[str] = None, model_name: Optional[str] = None,
+                              priority: str = "interactive") -> AsyncIterator[CompletionChunk]:
+        model_name = model_name or await self.aselect_model()
+        warm_pool.touch(model_name)
+        with span("build_prompt"):
+            prompt = self.build_prompt(task, context or "")
+        async for chunk in get_async_client().stream_generate(model_name, prompt, priority=priority):
+            yield chunk
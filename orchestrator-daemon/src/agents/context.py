@@ -0,0 +1,168 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from ..indexing.chunker import count_tokens
+from ..models.selection import ModelTier
+
+# Upper bound on retrieved context per hardware tier. Prompt evaluation
+# dominates latency on small (mostly CPU-bound) setups, so they get less.
+TIER_CONTEXT_TOKENS: Dict[ModelTier, int] = {
+    ModelTier.TINY: 1024,
+    ModelTier.SMALL: 2048,
+    ModelTier.MEDIUM: 3072,
+    ModelTier.LARGE: 6144,
+}
+
+# A block that only fits partially is cut to its leading lines, unless
+# fewer than this many tokens are left for it.
+MIN_PARTIAL_TOKENS = 64
+
+@dataclass
+class ContextBlock:
+    filepath: str
+    start_line: int
+    end_line: int
+    lines: List[str]
+    rank: int  # best rank of the hits merged into this block
+
+    @property
+    def content(self) -> str:
+        return "".join(self.lines)
+
+    def render(self) -> str:
+        return f"File: {self.filepath} (lines {self.start_line}-{self.end_line})\nContent:\n{self.content}"
+
+@dataclass
+class PackedContext:
+    text: str = ""
+    tokens: int = 0
+    budget: int = 0
+    candidates: int = 0
+    blocks: int = 0
+    merged: int = 0      # hits folded into an overlapping/adjacent hit
+    duplicates: int = 0  # blocks dropped because the same text was already in
+    dropped: int = 0     # blocks that did not fit the budget
+    files: List[str] = field(default_factory=list)
+
+    def stats(self) -> dict:
+        return {
+            "context_tokens": self.tokens,
+            "context_budget": self.budget,
+            "context_blocks": self.blocks,
+            "context_candidates": self.candidates,
+            "context_merged": self.merged,
+            "context_duplicates": self.duplicates,
+            "context_dropped": self.dropped
+        }
+
+def context_budget(tier: ModelTier, context_length: Optional[int], num_ctx: int, reserve_tokens: int) -> int:
+    """
+    Tokens available for retrieved context: the model's usable window
+    (its trained length, capped by Ollama's num_ctx) minus room for the
+    prompt and the answer, and never more than the tier allows.
+    """
+    window = min(context_length, num_ctx) if context_length else num_ctx
+    return max(0, min(window - reserve_tokens, TIER_CONTEXT_TOKENS[tier]))
+
+def _to_block(result: dict, rank: int) -> ContextBlock:
+    meta = result.get("metadata") or {}
+    lines = result["content"].splitlines(keepends=True)
+    start = int(meta.get("start_line", 1))
+    end = int(meta.get("end_line", start + len(lines) - 1))
+    return ContextBlock(meta.get("filepath", "unknown"), start, end, lines, rank)
+
+def merge_blocks(results: List[dict]) -> Tuple[List[ContextBlock], int]:
+    """
+    Merge overlapping or adjacent line ranges of the same file into one
+    block. Returns the blocks in rank order and how many hits were merged.
+    """
+    by_file: Dict[str, List[ContextBlock]] = {}
+    for rank, result in enumerate(results):
+        block = _to_block(result, rank)
+        by_file.setdefault(block.filepath, []).append(block)
+
+    merged_count = 0
+    blocks = []
+    for file_blocks in by_file.values():
+        file_blocks.sort(key=lambda b: b.start_line)
+        current = file_blocks[0]
+        for block in file_blocks[1:]:
+            if block.start_line > current.end_line + 1:
+                blocks.append(current)
+                current = block
+                continue
+            merged_count += 1
+            if block.end_line > current.end_line:
+                if current.lines and not current.lines[-1].endswith("\n"):
+                    current.lines[-1] += "\n"
+                current.lines.extend(block.lines[current.end_line + 1 - block.start_line:])
+                current.end_line = block.end_line
+            current.rank = min(current.rank, block.rank)
+        blocks.append(current)
+    blocks.sort(key=lambda b: b.rank)
+    return blocks, merged_count
+
+def pack_context(results: List[dict], budget_tokens: int) -> PackedContext:
+    """
+    Build the agent context from ranked search results: merge overlapping
+    windows, skip duplicate text, and add blocks in score order until the
+    token budget is used up.
+    """
+    packed = PackedContext(budget=budget_tokens, candidates=len(results))
+    if not results:
+        return packed
+    blocks, packed.merged = merge_blocks(results)
+
+    seen = set()
+    parts = []
+    for block in blocks:
+        key = block.content.strip()
+        if key in seen:
+            packed.duplicates += 1
+            continue
+        seen.add(key)
+
+        remaining = budget_tokens - packed.tokens
+        tokens = count_tokens(block.render())
+        if tokens > remaining:
+            # Keep the leading lines that fit, if that is still worth sending
+            if remaining < MIN_PARTIAL_TOKENS:
+                packed.dropped += 1
+                continue
+            used = tokens - count_tokens(block.content)  # the File:/Content: header
+            keep = 0
+            for line in block.lines:
+                line_tokens = count_tokens(line)
+                if used + line_tokens > remaining:
+                    break
+                used += line_tokens
+                keep += 1
+            if keep == 0:
+                packed.dropped += 1
+                continue
+            block.lines = block.lines[:keep]
+            block.end_line = block.start_line + keep - 1
+            tokens = used
+
+        parts.append(block.render())
+        packed.tokens += tokens
+        packed.blocks += 1
+        if block.filepath not in packed.files:
+            packed.files.append(block.filepath)
+
+    packed.text = "\n".join(parts)
+    return packed
+
+def clip_tokens(text: str, max_tokens: int) -> str:
+    """Leading words of `text` that fit in `max_tokens` tokens."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    used, end = 0, 0
+    for match in re.finditer(r"\S+\s*", text):
+        tokens = count_tokens(match.group())
+        if used + tokens > max_tokens:
+            break
+        used += tokens
+        end = match.end()
+    return text[:end].rstrip()
@@ -1,12 +1,44 @@
 import re
-from typing import Dict, Type
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Type
 from .base import BaseAgent, AgentResponse
+from .context import PackedContext, clip_tokens, context_budget, pack_context
 from .implementations import CodeReaderAgent, RefactorAgent, TestWriterAgent, DocWriterAgent
-from ..vector.store import VectorStore
+from ..config import Settings, settings as default_settings
+from ..hardware.sampler import hardware_sampler
+from ..indexing.chunker import count_tokens
+from ..models.selection import select_model_tier
+from ..ollama.catalog import catalog
+from ..ollama.scheduler import GenerationRejected
+from ..vector.projects import ProjectNotFound, ProjectStores
+from ..resources import registry
+from ..telemetry.tracing import span
+
+# Keywords per agent, in the order single-agent classification checks them
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "refactor": ["refactor", "optimize", "rewrite", "improve"],
+    "test": ["test", "verify", "unittest", "pytest"],
+    "doc": ["doc", "explain", "readme", "comment"],
+}
+
+# "... and then ...", "...; after that ...": later parts build on earlier ones
+_SEQUENCE_SPLIT = re.compile(r"\s*(?:;|,?\s*\b(?:and then|then|after that|afterwards)\b)\s*", re.IGNORECASE)
+
+@dataclass
+class PlanStep:
+    agent: str  # key in AgentCoordinator.agents
+    task: str
+    depends_on: List[int] = field(default_factory=list)  # indexes of earlier steps
 
 class AgentCoordinator:
-    def __init__(self):
-        self.vector_store = VectorStore()
+    def __init__(self, stores_factory: Optional[Callable[[], ProjectStores]] = None,
+                 config: Optional[Settings] = None):
+        self.config = config or default_settings
+        # Resolved on first task so constructing the coordinator stays cheap
+        # and it shares the registry's stores instead of loading its own.
+        self._stores_factory = stores_factory or registry.projects
         self.agents: Dict[str, BaseAgent] = {
             "reader": CodeReaderAgent(),
             "refactor": RefactorAgent(),
@@ -14,17 +46,25 @@ class AgentCoordinator:
             "doc": DocWriterAgent()
         }
 
+    @property
+    def stores(self) -> ProjectStores:
+        return self._stores_factory()
+
+    def agent_models(self) -> List[str]:
+        """Models the agents answer with, for preloading."""
+        return list(dict.fromkeys(agent.select_model() for agent in self.agents.values()))
+
     def _classify_task(self, task: str) -> str:
         """
         Rule-based intent classification.
         """
         task_lower = task.lower()
         
-        if any(w in task_lower for w in ["refactor", "optimize", "rewrite", "improve"]):
+        if any(w in task_lower for w in INTENT_KEYWORDS["refactor"]):
             return "refactor"
-        if any(w in task_lower for w in ["test", "verify", "unittest", "pytest"]):
+        if any(w in task_lower for w in INTENT_KEYWORDS["test"]):
             return "test"
-        if any(w in task_lower for w in ["doc", "explain", "readme", "comment"]):
+        if any(w in task_lower for w in INTENT_KEYWORDS["doc"]):
             if "explain" in task_lower and len(task_lower.split()) > 3:
                 return "reader" # "Explain how X works" -> Reader
             return "doc"
@@ -32,24 +72,261 @@ class AgentCoordinator:
         # Default fallback
         return "reader"
 
-    def route_task(self, task: str) -> AgentResponse:
+    def _classify_intents(self, task: str) -> List[str]:
+        """Every agent the task asks for, in the order the task mentions them."""
+        task_lower = task.lower()
+        positions = {}
+        for key, words in INTENT_KEYWORDS.items():
+            hits = [task_lower.find(w) for w in words if w in task_lower]
+            if hits:
+                positions[key] = min(hits)
+        if "doc" in positions and self._classify_task(task) == "reader":
+            positions["reader"] = positions.pop("doc")
+        return sorted(positions, key=positions.get) or ["reader"]
+
+    def plan_task(self, task: str) -> List[PlanStep]:
+        """
+        Split a task into agent steps. Parts joined by "then" (or ";") run
+        in order, each depending on every step of the part before; agents
+        asked for in the same part ("refactor this and write tests") are
+        independent and run concurrently.
+        """
+        steps: List[PlanStep] = []
+        previous: List[int] = []
+        for part in _SEQUENCE_SPLIT.split(task):
+            part = part.strip(" ,.")
+            if not part:
+                continue
+            current = []
+            for agent_key in self._classify_intents(part):
+                if len(steps) == self.config.agent_max_plan_steps:
+                    return steps
+                current.append(len(steps))
+                steps.append(PlanStep(agent_key, part, list(previous)))
+            previous = current
+        return steps or [PlanStep(self._classify_task(task), task)]
+
+    def _context_budget(self, model_name: str) -> int:
+        tier = select_model_tier(hardware_sampler.smoothed_profile()).tier
+        return context_budget(
+            tier,
+            catalog.context_length(model_name),
+            self.config.ollama_num_ctx,
+            self.config.context_reserve_tokens
+        )
+
+    def _retrieve_context(self, task: str, model_name: str, project: Optional[str] = None) -> PackedContext:
+        return self._retrieve(task, self._context_budget(model_name), project)
+
+    def _retrieve(self, task: str, budget: int, project: Optional[str] = None) -> PackedContext:
+        # Naive RAG for all agents for now.
+        # In a real system, some agents might not need RAG, or need specific RAG strategies.
+        # Over-fetch, then let the packer merge overlapping windows and trim to budget.
+        with span("retrieve"):
+            rag_results = self.stores.query_similar(task, n_results=self.config.retrieval_candidates, project=project)
+        with span("pack_context"):
+            return pack_context(rag_results, budget)
+
+    def route_task(self, task: str, use_cache: bool = True, project: Optional[str] = None,
+                   priority: str = "interactive") -> AgentResponse:
         """
         1. Classify intent.
         2. Retrieve context (RAG).
         3. Dispatch to agent.
         """
         # 1. Classify
-        agent_key = self._classify_task(task)
+        with span("classify"):
+            agent_key = self._classify_task(task)
         agent = self.agents.get(agent_key)
         
         if not agent:
              return AgentResponse("System", "No suitable agent found.")
 
-        # 2. Retrieve Context (Naive RAG for all agents for now)
-        # In a real system, some agents might not need RAG, or need specific RAG strategies.
-        rag_results = self.vector_store.query_similar(task, n_results=3)
-        context_str = "\n".join([f"File: {r['metadata']['filepath']}\nContent:\n{r['content']}" for r in rag_results])
+        # 2. Retrieve Context (budgeted for the model that will answer)
+        model_name = agent.select_model()
+        start = time.perf_counter()
+        context = self._retrieve_context(task, model_name, project)
+        retrieval_ms = (time.perf_counter() - start) * 1000
         
         # 3. Execute
-        response = agent.execute(task, context=context_str)
+        response = agent.execute(task, context=context.text, model_name=model_name,
+                                 use_cache=use_cache, sources=context.files, priority=priority)
+        response.metadata = {**(response.metadata or {}), "retrieval_ms": round(retrieval_ms, 1), **context.stats()}
+        return response
+
+    async def aroute_task(self, task: str, use_cache: bool = True, project: Optional[str] = None,
+                          priority: str = "interactive") -> AgentResponse:
+        """Async route_task: retrieval runs in a worker thread, generation on the async client."""
+        with span("classify"):
+            agent_key = self._classify_task(task)
+        agent = self.agents.get(agent_key)
+
+        if not agent:
+             return AgentResponse("System", "No suitable agent found.")
+
+        model_name = await agent.aselect_model()
+        start = time.perf_counter()
+        context = await asyncio.to_thread(self._retrieve_context, task, model_name, project)
+        retrieval_ms = (time.perf_counter() - start) * 1000
+
+        response = await agent.aexecute(task, context=context.text, model_name=model_name,
+                                        use_cache=use_cache, sources=context.files, priority=priority)
+        response.metadata = {**(response.metadata or {}), "retrieval_ms": round(retrieval_ms, 1), **context.stats()}
         return response
+
+    async def aroute_plan(self, task: str, use_cache: bool = True, project: Optional[str] = None,
+                          priority: str = "interactive", plan: Optional[List[PlanStep]] = None) -> AgentResponse:
+        """
+        Multi-agent variant of aroute_task: plan the steps (or take `plan`),
+        retrieve context once for all of them, then run every step as soon as
+        the steps it depends on are done. Independent steps run concurrently,
+        within the generation scheduler's limits. A dependent step sees the
+        shared context plus the answers it depends on, trimmed to what the
+        shared context leaves of the token budget (retrieval gets half of it
+        when any step has dependencies). The response carries every step's
+        result and timings; if the scheduler turns a step away, the
+        remaining steps are cancelled and GenerationRejected propagates.
+        """
+        start = time.perf_counter()
+        with span("plan"):
+            steps = plan or self.plan_task(task)
+        agents = [self.agents[step.agent] for step in steps]
+
+        # One retrieval, packed for the smallest window among the models
+        models = [await agent.aselect_model() for agent in agents]
+        has_dependencies = any(step.depends_on for step in steps)
+
+        def retrieve() -> Tuple[PackedContext, int]:
+            # In the worker thread: a model's window size may come from Ollama
+            budget = min(self._context_budget(model) for model in dict.fromkeys(models))
+            return self._retrieve(task, budget // 2 if has_dependencies else budget, project), budget
+
+        context, budget = await asyncio.to_thread(retrieve)
+        retrieval_done = time.perf_counter()
+
+        async def run(i: int, results: List[asyncio.Task]) -> Tuple[AgentResponse, float, float]:
+            step, agent = steps[i], agents[i]
+            step_context = context.text
+            if step.depends_on:
+                done = [await results[j] for j in step.depends_on]
+                # Answers share what the shared context left of the budget
+                share = (budget - context.tokens) // len(done)
+                for r, _, _ in done:
+                    header = f"\n\nOutput of {r.agent_name}:\n"
+                    step_context += header + clip_tokens(r.content, max(0, share - count_tokens(header)))
+            step_start = time.perf_counter()
+            response = await agent.aexecute(step.task, context=step_context, model_name=models[i],
+                                            use_cache=use_cache, sources=context.files, priority=priority)
+            return response, step_start, time.perf_counter()
+
+        results: List[asyncio.Task] = []
+        for i in range(len(steps)):
+            results.append(asyncio.ensure_future(run(i, results)))
+        try:
+            outcomes = await asyncio.gather(*results)
+        except BaseException:
+            for t in results:
+                t.cancel()
+            await asyncio.gather(*results, return_exceptions=True)
+            raise
+        end = time.perf_counter()
+
+        step_results = []
+        for step, (response, step_start, step_end) in zip(steps, outcomes):
+            step_results.append({
+                "agent": response.agent_name,
+                "task": step.task,
+                "depends_on": step.depends_on,
+                "content": response.content,
+                "metadata": response.metadata,
+                "timing": {
+                    "start_ms": round((step_start - start) * 1000, 1),
+                    "duration_ms": round((step_end - step_start) * 1000, 1)
+                }
+            })
+        content = "\n\n".join(f"## {r['agent']}\n{r['content']}" for r in step_results)
+        return AgentResponse("Coordinator", content, metadata={
+            "type": "multi_agent",
+            "steps": step_results,
+            "timing": {
+                "retrieval_ms": round((retrieval_done - start) * 1000, 1),
+                "generation_ms": round((end - retrieval_done) * 1000, 1),
+                # Sum of the steps' own durations; above generation_ms when steps overlapped
+                "agent_ms": round(sum(r["timing"]["duration_ms"] for r in step_results), 1),
+                "total_ms": round((end - start) * 1000, 1)
+            },
+            **context.stats()
+        })
+
+    async def route_task_stream(self, task: str, project: Optional[str] = None,
+                                priority: str = "interactive") -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Streaming variant of route_task. Yields (event, data) pairs:
+        "start" once retrieval is done, one "token" per generated token,
+        then "done" with timing metadata, or "error" (with retry_after_s
+        when the generation queue is full).
+        """
+        start = time.perf_counter()
+        with span("classify"):
+            agent_key = self._classify_task(task)
+        agent = self.agents.get(agent_key)
+        if not agent:
+            yield "error", {"detail": "No suitable agent found."}
+            return
+
+        model_name = await agent.aselect_model()
+        try:
+            context = await asyncio.to_thread(self._retrieve_context, task, model_name, project)
+        except ProjectNotFound as e:
+            yield "error", {"detail": str(e)}
+            return
+        retrieval_done = time.perf_counter()
+        yield "start", {
+            "agent": agent.name,
+            "model": model_name,
+            "retrieval_ms": round((retrieval_done - start) * 1000, 1),
+            **context.stats()
+        }
+
+        first_token_at = None
+        token_count = 0
+        try:
+            async for chunk in agent.aexecute_stream(task, context=context.text, model_name=model_name,
+                                                     priority=priority):
+                if chunk.token:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    token_count += 1
+                    yield "token", {"text": chunk.token}
+                if chunk.error:
+                    yield "error", {"detail": chunk.error}
+                    return
+                if chunk.done:
+                    end = time.perf_counter()
+                    stats = chunk.stats or {}
+                    # Prefer Ollama's own counters; fall back to wall-clock
+                    eval_count = stats.get("eval_count", token_count)
+                    eval_ns = stats.get("eval_duration")
+                    if eval_ns:
+                        tokens_per_s = eval_count / (eval_ns / 1e9)
+                    elif first_token_at is not None and end > first_token_at:
+                        tokens_per_s = token_count / (end - first_token_at)
+                    else:
+                        tokens_per_s = 0.0
+                    yield "done", {
+                        "agent": agent.name,
+                        "model": model_name,
+                        "type": agent.response_type,
+                        "timing": {
+                            "retrieval_ms": round((retrieval_done - start) * 1000, 1),
+                            "queue_wait_ms": chunk.queue_wait_ms,
+                            "ttft_ms": round((first_token_at - start) * 1000, 1) if first_token_at else None,
+                            "total_ms": round((end - start) * 1000, 1),
+                            "tokens": eval_count,
+                            "tokens_per_s": round(tokens_per_s, 1)
+                        },
+                        "ollama": stats
+                    }
+                    return
+        except GenerationRejected as e:
+            yield "error", {"detail": str(e), "retry_after_s": e.retry_after_s}
@@ -1,90 +1,57 @@
-from .base import BaseAgent, AgentResponse
-from ..ollama.client import generate_completion, list_models
+from .base import BaseAgent
 
 class CodeReaderAgent(BaseAgent):
+    response_type = "explanation"
+
     def __init__(self):
         super().__init__(name="CodeReader", role="Explains code and project structure")
 
-    def execute(self, task: str, context: str = "") -> AgentResponse:
-        models = list_models()
-        model_name = models[0].name if models else "llama2"
-        
-        prompt = f"""You are a code reader agent. Explain the following code or project structure request.
+    def build_prompt(self, task: str, context: str = "") -> str:
+        return f"""You are a code reader agent. Explain the following code or project structure request.
 Context:
 {context}
 
 Request: {task}
 """
-        response_text = generate_completion(model_name, prompt)
-        
-        return AgentResponse(
-            agent_name=self.name,
-            content=response_text,
-            metadata={"type": "explanation", "model": model_name}
-        )
 
 class RefactorAgent(BaseAgent):
+    response_type = "refactor_plan"
+
     def __init__(self):
         super().__init__(name="RefactorAgent", role="Suggests code improvements")
 
-    def execute(self, task: str, context: str = "") -> AgentResponse:
-        models = list_models()
-        model_name = models[0].name if models else "llama2"
-
-        prompt = f"""You are a code refactoring expert. Suggest improvements for the following code.
+    def build_prompt(self, task: str, context: str = "") -> str:
+        return f"""You are a code refactoring expert. Suggest improvements for the following code.
 Context:
 {context}
 
 Request: {task}
 """
-        response_text = generate_completion(model_name, prompt)
-
-        return AgentResponse(
-            agent_name=self.name,
-            content=response_text,
-            metadata={"type": "refactor_plan", "model": model_name}
-        )
 
 class TestWriterAgent(BaseAgent):
+    response_type = "test_code"
+
     def __init__(self):
         super().__init__(name="TestWriterAgent", role="Generates pytest cases")
 
-    def execute(self, task: str, context: str = "") -> AgentResponse:
-        models = list_models()
-        model_name = models[0].name if models else "llama2"
-
-        prompt = f"""You are a QA automation engineer. Write a pytest case for the following scenario.
+    def build_prompt(self, task: str, context: str = "") -> str:
+        return f"""You are a QA automation engineer. Write a pytest case for the following scenario.
 Context:
 {context}
 
 Request: {task}
 """
-        response_text = generate_completion(model_name, prompt)
-
-        return AgentResponse(
-            agent_name=self.name,
-            content=response_text,
-            metadata={"type": "test_code", "model": model_name}
-        )
 
 class DocWriterAgent(BaseAgent):
+    response_type = "documentation"
+
     def __init__(self):
         super().__init__(name="DocWriterAgent", role="Generates documentation")
 
-    def execute(self, task: str, context: str = "") -> AgentResponse:
-        models = list_models()
-        model_name = models[0].name if models else "llama2"
-
-        prompt = f"""You are a technical writer. Write documentation for the following code.
+    def build_prompt(self, task: str, context: str = "") -> str:
+        return f"""You are a technical writer. Write documentation for the following code.
 Context:
 {context}
 
 Request: {task}
 """
-        response_text = generate_completion(model_name, prompt)
-
-        return AgentResponse(
-            agent_name=self.name,
-            content=response_text,
-            metadata={"type": "documentation", "model": model_name}
-        )
@@ -1,17 +1,27 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+import os
+import json
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-from ..hardware.detection import detect_hardware
+from typing import Dict, List, Literal, Optional
+from ..hardware.sampler import hardware_sampler
 from ..models.selection import select_model_tier
-from ..ollama.client import is_ollama_running, list_models
+from ..ollama.async_client import get_async_client
+from ..ollama.catalog import catalog
+from ..ollama.completion_cache import get_completion_cache
+from ..ollama.scheduler import GenerationRejected, generation_scheduler
+from ..ollama.warm_pool import warm_pool
 
 # Phase 2 Imports
-from ..indexing.crawler import crawl_project
-from ..indexing.chunker import chunk_file
-from ..vector.store import VectorStore
+from ..indexing.jobs import IndexJob, IndexJobManager
+from ..indexing.pipeline import IndexPipeline, IndexReport
+from ..indexing.watcher import WatchManager
+from ..vector.projects import ProjectNotFound
+from ..config import settings
+from ..resources import registry
+from ..telemetry.metrics import metrics
 
 router = APIRouter()
-vector_store = VectorStore() # Global instance (singleton-ish)
 
 class IndexRequest(BaseModel):
     path: str
@@ -19,83 +29,329 @@ class IndexRequest(BaseModel):
 class QueryRequest(BaseModel):
     query: str
     n_results: Optional[int] = 5
+    where: Optional[Dict] = None  # Chroma-style metadata filter, e.g. {"filepath": "..."}
+    mode: Optional[str] = None  # vector | lexical | hybrid | auto (default: settings.retrieval_mode)
+    project: Optional[str] = None  # project root; None searches every indexed project
 
-def background_index_project(path: str):
-    # This should be robust, handle errors, logs, etc.
-    print(f"Starting index for {path}")
-    chunks_batch = []
-    
-    for filepath in crawl_project(path):
-        new_chunks = chunk_file(filepath)
-        for c in new_chunks:
-            chunks_batch.append({
-                "filepath": c.filepath,
-                "content": c.content,
-                "start_line": c.start_line,
-                "end_line": c.end_line
-            })
-            
-            # Batch upsert
-            if len(chunks_batch) >= 100:
-                 vector_store.add_chunks(chunks_batch)
-                 chunks_batch = []
-                 
-    if chunks_batch:
-        vector_store.add_chunks(chunks_batch)
-    print(f"Finished index for {path}")
+class WatchRequest(BaseModel):
+    path: str
+    polling: bool = False  # force mtime polling even if inotify is available
+
+def _on_index_finished(job: IndexJob, report: Optional[IndexReport]):
+    project_watchers.job_finished(job.root_path, job.job_id)
+    if report is None:
+        print(f"Index job {job.job_id} for {job.root_path} ended: {job.status}")
+        return
+    completion_cache = get_completion_cache()
+    if completion_cache is not None and (report.files_indexed or report.files_removed):
+        # Cached answers may quote code that just changed
+        completion_cache.invalidate_project(report.root_path)
+    if job.trigger == "watch" and not (report.files_indexed or report.files_removed):
+        return
+    print(f"Finished index for {report.root_path}: {report.files_indexed} files, "
+          f"{report.chunks_upserted} chunks in {report.wall_s}s (bottleneck: {report.bottleneck})")
+
+index_jobs = IndexJobManager(
+    lambda root: IndexPipeline(registry.projects().get(root, create=True), settings),
+    history_path=os.path.join(settings.vector_db_path, "index_jobs.json"),
+    max_concurrent=settings.index_max_concurrent_jobs,
+    on_finished=_on_index_finished
+)
+
+project_watchers = WatchManager(
+    lambda root, paths: index_jobs.submit(root, paths, trigger="watch").job_id,
+    state_path=os.path.join(settings.vector_db_path, "watched_projects.json")
+)
 
 @router.post("/project/index")
-def index_project_endpoint(req: IndexRequest, bg_tasks: BackgroundTasks):
-    bg_tasks.add_task(background_index_project, req.path)
-    return {"status": "indexing_started", "path": req.path}
+def index_project_endpoint(req: IndexRequest):
+    """Queue an index run; a request for a project that is already queued joins that job."""
+    job = index_jobs.submit(req.path)
+    return {"status": "indexing_started", "job_id": job.job_id, "job_status": job.status,
+            "merged": job.merged_requests > 0, "path": job.root_path}
+
+@router.get("/project/index/stats")
+def index_stats_endpoint(path: Optional[str] = None):
+    index_reports = index_jobs.latest_reports()
+    if path is None:
+        return {"reports": index_reports}
+    report = index_reports.get(os.path.abspath(path))
+    if report is None:
+        raise HTTPException(status_code=404, detail="No index run recorded for this path")
+    return report
+
+@router.get("/project/index/jobs")
+def index_jobs_endpoint(path: Optional[str] = None):
+    return {"jobs": index_jobs.jobs(path)}
+
+@router.get("/project/index/{job_id}")
+def index_job_endpoint(job_id: str):
+    job = index_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown index job")
+    return job
+
+@router.post("/project/index/{job_id}/cancel")
+def cancel_index_job_endpoint(job_id: str):
+    job = index_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown index job")
+    return job
+
+@router.post("/project/watch")
+def watch_project_endpoint(req: WatchRequest):
+    """Keep a project's index current by re-indexing files as they change."""
+    if not os.path.isdir(req.path):
+        raise HTTPException(status_code=404, detail="No such directory")
+    return project_watchers.watch(req.path, use_polling=req.polling).status()
+
+@router.get("/project/watch")
+def watch_status_endpoint():
+    return {"watchers": project_watchers.status()}
+
+@router.delete("/project/watch")
+def unwatch_project_endpoint(path: str):
+    if not project_watchers.unwatch(path):
+        raise HTTPException(status_code=404, detail="Project is not being watched")
+    return {"status": "stopped", "path": os.path.abspath(path)}
 
 @router.post("/project/query")
 def query_project_endpoint(req: QueryRequest):
-    results = vector_store.query_similar(req.query, n_results=req.n_results)
+    try:
+        results = registry.projects().query_similar(req.query, n_results=req.n_results, where=req.where,
+                                                    mode=req.mode, project=req.project)
+    except ProjectNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {"results": results}
 
+@router.get("/project/query/stats")
+def query_stats_endpoint(path: Optional[str] = None):
+    """Query-side caches and embedding batch metrics, for one project if `path` is given."""
+    if not registry.is_ready():
+        raise HTTPException(status_code=503, detail="Vector store is still loading")
+    projects = registry.projects()
+    if path is None:
+        return projects.embedder.stats()
+    try:
+        return projects.get(path).cache_stats()
+    except ProjectNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/projects")
+def list_projects_endpoint():
+    return {"projects": registry.projects().list()}
+
+@router.get("/project/stats")
+def project_stats_endpoint(path: str):
+    """Disk use and index size of one project's partition."""
+    try:
+        return registry.projects().stats(path)
+    except ProjectNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.delete("/project/index")
+def drop_project_index_endpoint(path: str):
+    """Stop watching and indexing a project, then delete its index."""
+    project_watchers.unwatch(path)
+    if not index_jobs.cancel_project(path):
+        raise HTTPException(status_code=409, detail="Index job for this project is still stopping; retry shortly")
+    try:
+        dropped = registry.projects().drop(path)
+    except ProjectNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    completion_cache = get_completion_cache()
+    if completion_cache is not None:
+        completion_cache.invalidate_project(os.path.abspath(path))
+    return {"status": "dropped", **dropped}
+
 # Phase 3 Agent API
 from ..agents.coordinator import AgentCoordinator
-coordinator = AgentCoordinator()
+coordinator = AgentCoordinator(stores_factory=registry.projects)
 
 class AgentTaskRequest(BaseModel):
     task: str
+    use_cache: bool = True  # False forces a fresh generation
+    project: Optional[str] = None  # project root to retrieve context from; None searches all
+    # Interactive requests are scheduled ahead of batch ones
+    priority: Literal["interactive", "batch"] = "interactive"
+    # single: one agent; multi: every agent the task asks for, sharing one retrieval
+    mode: Literal["single", "multi"] = "single"
 
 @router.post("/agent/task")
-def agent_task_endpoint(req: AgentTaskRequest):
-    response = coordinator.route_task(req.task)
+async def agent_task_endpoint(req: AgentTaskRequest):
+    route = coordinator.aroute_plan if req.mode == "multi" else coordinator.aroute_task
+    try:
+        response = await route(req.task, use_cache=req.use_cache, project=req.project, priority=req.priority)
+    except ProjectNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except GenerationRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after_s)})
     return {
         "agent": response.agent_name,
         "content": response.content,
         "metadata": response.metadata
     }
 
+@router.post("/agent/plan")
+def agent_plan_endpoint(req: AgentTaskRequest):
+    """The steps multi mode would run for a task, without running them."""
+    return [{"agent": coordinator.agents[step.agent].name, "task": step.task, "depends_on": step.depends_on}
+            for step in coordinator.plan_task(req.task)]
+
+@router.get("/agent/cache/stats")
+def agent_cache_stats_endpoint():
+    completion_cache = get_completion_cache()
+    return completion_cache.stats() if completion_cache is not None else {"enabled": False}
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/agent/task/stream")
+async def agent_task_stream_endpoint(req: AgentTaskRequest):
+    """
+    Server-sent events: `start` (agent, model, retrieval time), one `token`
+    event per generated token, then `done` with TTFT and tokens/s.
+    """
+    async def events():
+        async for event, data in coordinator.route_task_stream(req.task, project=req.project, priority=req.priority):
+            yield _sse(event, data)
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/agent/scheduler")
+def agent_scheduler_stats_endpoint():
+    """Running and queued generations per model and priority."""
+    return generation_scheduler.stats()
+
 @router.get("/ollama/status")
-def get_ollama_status():
-    return {"running": is_ollama_running()}
+async def get_ollama_status():
+    return {"running": await get_async_client().is_running()}
 
 @router.get("/ollama/models")
 def get_ollama_models():
-    if not is_ollama_running():
+    models = catalog.models()
+    if not catalog.running:
+         raise HTTPException(status_code=503, detail="Ollama is not running")
+    return models
+
+@router.get("/ollama/models/loaded")
+def get_loaded_models():
+    loaded = catalog.loaded_models()
+    if not catalog.running:
          raise HTTPException(status_code=503, detail="Ollama is not running")
-    return list_models()
+    return loaded
+
+class ModelNameRequest(BaseModel):
+    name: str
+
+@router.post("/ollama/models/pull")
+async def pull_ollama_model(req: ModelNameRequest):
+    ok = await get_async_client().pull_model(req.name)
+    catalog.invalidate()
+    if not ok:
+        raise HTTPException(status_code=502, detail=f"Failed to pull {req.name}")
+    return {"status": "pulled", "model": req.name}
+
+@router.get("/ollama/models/pool")
+def get_warm_pool():
+    """Resident models in least-recently-used order, pins and the memory budget."""
+    return warm_pool.stats()
+
+@router.post("/ollama/models/pin")
+async def pin_ollama_model(req: ModelNameRequest):
+    """Load a model (pulling it if needed) and keep it loaded until unpinned."""
+    if not await warm_pool.pin(req.name):
+        raise HTTPException(status_code=502, detail=f"Failed to load {req.name}")
+    return {"status": "pinned", "model": req.name}
+
+@router.post("/ollama/models/unpin")
+async def unpin_ollama_model(req: ModelNameRequest):
+    if not await warm_pool.unpin(req.name):
+        raise HTTPException(status_code=404, detail=f"{req.name} is not pinned")
+    return {"status": "unpinned", "model": req.name}
+
+@router.delete("/ollama/models/{name:path}")
+async def delete_ollama_model(name: str):
+    ok = await get_async_client().delete_model(name)
+    catalog.invalidate()
+    if not ok:
+        raise HTTPException(status_code=502, detail=f"Failed to delete {name}")
+    warm_pool.forget(name)
+    return {"status": "deleted", "model": name}
+
+# Scrape-time metrics: read from counters the components already keep
+def _cache_counts(field: str) -> Dict[tuple, float]:
+    counts = {}
+    completion_cache = get_completion_cache()
+    if completion_cache is not None:
+        counts[("completion",)] = getattr(completion_cache, field)
+    projects = registry.loaded("projects")
+    if projects is not None:
+        embedder = projects.embedder
+        if embedder.embedding_cache is not None:
+            counts[("embedding",)] = getattr(embedder.embedding_cache, field)
+        counts[("query_embedding",)] = getattr(embedder.query_embedding_cache, field)
+        counts[("query_result",)] = sum(getattr(s.query_result_cache, field) for s in projects.open_stores())
+    return counts
+
+def _query_embedding_backlog() -> int:
+    projects = registry.loaded("projects")
+    return projects.embedder.query_batcher.pending() if projects is not None else 0
+
+metrics.counter("orch_cache_hits_total", "Cache hits", ["cache"], fn=lambda: _cache_counts("hits"))
+metrics.counter("orch_cache_misses_total", "Cache misses", ["cache"], fn=lambda: _cache_counts("misses"))
+metrics.gauge("orch_ollama_generations_in_flight", "Generations running in Ollama",
+              fn=lambda: get_async_client().in_flight)
+metrics.gauge("orch_generation_queue_depth", "Generations waiting for a slot", ["priority"],
+              fn=lambda: {(p,): n for p, n in generation_scheduler.stats()["queued"].items()})
+metrics.gauge("orch_resident_models_gb", "Size of the models the warm pool holds in memory",
+              fn=warm_pool.used_gb)
+metrics.gauge("orch_index_jobs", "Index jobs by state", ["state"],
+              fn=lambda: {(state,): n for state, n in index_jobs.counts().items()})
+metrics.gauge("orch_index_queue_depth", "Items waiting between indexing stages", ["queue"],
+              fn=lambda: {(name,): n for name, n in index_jobs.queue_depths().items()})
+metrics.gauge("orch_query_embedding_queue_depth", "Query embeddings waiting for a batch",
+              fn=_query_embedding_backlog)
+
+@router.get("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @router.get("/health")
 def health_check():
     return {"status": "ok"}
 
+@router.get("/ready")
+def readiness_check():
+    """Readiness of the heavy resources; /health stays a pure liveness probe."""
+    status = registry.status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
 @router.get("/system/hardware")
 def get_hardware():
     try:
-        hw = detect_hardware()
+        hw = hardware_sampler.latest_profile()
         return hw
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/system/hardware/history")
+def get_hardware_history(window_s: float = 60.0):
+    try:
+        return hardware_sampler.history(window_s)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/models/recommended")
-def get_model_recommendation():
+def get_model_recommendation(window_s: float = 30.0):
     try:
-        hw = detect_hardware()
+        # Smoothed free memory, so one noisy reading doesn't flip the tier
+        hw = hardware_sampler.smoothed_profile(window_s)
         rec = select_model_tier(hw)
         return rec
     except Exception as e:
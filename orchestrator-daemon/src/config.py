@@ -0,0 +1,129 @@
+import os
+from dataclasses import dataclass, field, fields
+
+ENV_PREFIX = "ORCH_"
+
+def _default_workers() -> int:
+    return max(1, (os.cpu_count() or 2) - 1)
+
+@dataclass
+class Settings:
+    """
+    Daemon tunables. Every field can be overridden with an environment
+    variable named ORCH_<FIELD_NAME>, e.g. ORCH_INDEX_READ_WORKERS=4.
+    """
+    vector_db_path: str = "./vector_db"
+    # SentenceTransformer name, or "hash" for the offline hashing embedder
+    embedding_model: str = "all-MiniLM-L6-v2"
+    embedding_cache_max_mb: float = 256.0  # 0 disables the cache
+    retrieval_mode: str = "auto"  # vector | lexical | hybrid | auto
+    # chroma | mmap (in-process memory-mapped index, no chromadb needed)
+    vector_backend: str = "chroma"
+    vector_mmap_dtype: str = "int8"  # float32 | int8 (per-vector scale, 4x smaller)
+    vector_ivf_min_vectors: int = 50_000  # mmap: partition larger indexes; 0: always scan everything
+    vector_ivf_nprobe: int = 8  # partitions scanned per query
+    # Query embeddings arriving within this window are encoded as one batch
+    query_batch_window_ms: float = 3.0
+    query_batch_max_size: int = 32
+
+    # Ollama
+    ollama_host: str = "http://127.0.0.1:11434"
+    ollama_max_connections: int = 16
+    ollama_max_concurrent_generations: int = 8
+    ollama_connect_timeout_s: float = 2.0
+    ollama_read_timeout_s: float = 60.0
+    model_catalog_ttl_s: float = 30.0
+    # Ollama's runtime window (num_ctx); prompts longer than this are truncated
+    ollama_num_ctx: int = 2048
+
+    # Generation scheduling (see src/ollama/scheduler.py)
+    generation_slots_per_model: int = 0  # 0: from the hardware tier (loaded models count as available)
+    generation_memory_headroom_gb: float = 1.0  # free beyond a model's size before it is loaded
+    generation_queue_interactive: int = 16  # waiting requests before 429
+    generation_queue_batch: int = 64
+    generation_max_wait_interactive_s: float = 30.0
+    generation_max_wait_batch_s: float = 300.0
+
+    # Warm pool (see src/ollama/warm_pool.py)
+    ollama_keep_alive: str = "30m"  # idle time before Ollama unloads a model; "": Ollama's default
+    warm_pool_preload: bool = True  # load the agents' models at startup
+    warm_pool_models: str = ""  # more models to preload, comma-separated
+    # Resident models' total size; 0: the tier's max_memory_usage_gb, resident models counted as free
+    warm_pool_budget_gb: float = 0.0
+
+    # Finished agent generations; 0 disables the cache
+    completion_cache_max_mb: float = 64.0
+    completion_cache_ttl_s: float = 86400.0
+
+    # Agent context assembly
+    retrieval_candidates: int = 8
+    context_reserve_tokens: int = 768  # prompt template, task and the answer
+    agent_max_plan_steps: int = 4  # multi-agent mode: agents one task may fan out to
+
+    # Add a Server-Timing header with per-stage durations to every response
+    server_timing: bool = False
+
+    # Hardware telemetry
+    hardware_sample_interval_s: float = 2.0
+    hardware_history_size: int = 300
+
+    # Indexing pipeline
+    index_max_concurrent_jobs: int = 1  # index runs of different projects at once
+    index_read_workers: int = field(default_factory=_default_workers)
+    index_use_processes: bool = True
+    index_path_queue_size: int = 1024
+    index_chunk_queue_size: int = 2048
+    index_write_queue_size: int = 8
+    index_embed_batch_size: int = 64
+    chunk_max_tokens: int = 500
+    chunk_overlap_tokens: int = 50
+    # Invalid UTF-8: replace | ignore | skip (drop the file; streamed files stop there)
+    chunk_decode_errors: str = "replace"
+    chunk_max_file_bytes: int = 16 * 1024 * 1024  # only the head of larger files is indexed; 0: no cap
+    chunk_max_file_lines: int = 200_000
+    # Files this large are chunked as a stream in bounded memory; 0: never
+    chunk_stream_min_bytes: int = 1024 * 1024
+
+    # Crawler filters (extension lists are comma-separated, e.g. ".py,.md")
+    # Larger files are skipped outright; keep this above chunk_stream_min_bytes
+    # and chunk_max_file_bytes, or the streaming path and head cap never run
+    index_max_file_bytes: int = 64 * 1024 * 1024  # 0: no limit
+    index_include_extensions: str = ""  # empty: every extension not excluded
+    index_exclude_extensions: str = (
+        ".png,.jpg,.jpeg,.gif,.bmp,.ico,.webp,.svgz,.pdf,.zip,.gz,.tgz,.bz2,.xz,.7z,.rar,"
+        ".jar,.war,.class,.exe,.dll,.so,.dylib,.o,.a,.lib,.obj,.pyc,.pyo,.whl,.bin,.dat,"
+        ".db,.sqlite,.woff,.woff2,.ttf,.otf,.eot,.mp3,.mp4,.wav,.avi,.mov,.mkv,.psd,"
+        ".onnx,.pt,.safetensors,.gguf,.npy,.npz,.parquet"
+    )
+    index_sniff_binary: bool = True
+    index_use_global_excludes: bool = True  # core.excludesFile and .git/info/exclude
+
+    # Watch mode
+    watch_debounce_s: float = 1.0  # quiet period before a batch of changes is indexed
+    watch_max_delay_s: float = 10.0  # ... but never hold a change longer than this
+    watch_poll_interval_s: float = 2.0  # polling fallback when watchdog is missing
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        s = cls()
+        for f in fields(cls):
+            raw = os.environ.get(ENV_PREFIX + f.name.upper())
+            if raw is None:
+                continue
+            current = getattr(s, f.name)
+            try:
+                if isinstance(current, bool):
+                    value = raw.strip().lower() in ("1", "true", "yes", "on")
+                elif isinstance(current, int):
+                    value = int(raw)
+                elif isinstance(current, float):
+                    value = float(raw)
+                else:
+                    value = raw
+            except ValueError:
+                print(f"Ignoring invalid value for {ENV_PREFIX + f.name.upper()}: {raw!r}")
+                continue
+            setattr(s, f.name, value)
+        return s
+
+settings = Settings.from_env()
@@ -0,0 +1,191 @@
+import time
+import platform
+import threading
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Deque, List, Optional
+
+import psutil
+
+from .detection import GPUInfo, HardwareProfile, HAS_PYNVML
+from ..config import settings
+
+if HAS_PYNVML:
+    import pynvml
+
+@dataclass
+class HardwareSample:
+    timestamp: float
+    cpu_percent: float
+    ram_available_gb: float
+    gpu_free_memory_mb: List[int]
+
+def _decode(value) -> str:
+    # Older pynvml returns bytes, newer returns str
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+def _summary(values: List[float]) -> dict:
+    if not values:
+        return {"min": None, "avg": None, "max": None}
+    return {
+        "min": round(min(values), 2),
+        "avg": round(sum(values) / len(values), 2),
+        "max": round(max(values), 2)
+    }
+
+class HardwareSampler:
+    """
+    Samples CPU, RAM and GPU memory on a background thread into a
+    fixed-size ring buffer. NVML is initialized once for the sampler's
+    lifetime instead of per request; without NVML only CPU/RAM are sampled.
+    """
+    def __init__(self, interval_s: float = 2.0, history_size: int = 300):
+        self.interval_s = interval_s
+        self._samples: Deque[HardwareSample] = deque(maxlen=history_size)
+        self._static: Optional[HardwareProfile] = None
+        self._gpu_handles = []
+        self._nvml_active = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._init_lock = threading.Lock()
+
+    def _init_static(self):
+        with self._init_lock:
+            if self._static is not None:
+                return
+            gpus: List[GPUInfo] = []
+            if HAS_PYNVML:
+                try:
+                    pynvml.nvmlInit()
+                    self._nvml_active = True
+                    try:
+                        driver_ver = _decode(pynvml.nvmlSystemGetDriverVersion())
+                    except Exception:
+                        driver_ver = "Unknown"
+                    try:
+                        cuda_ver_raw = pynvml.nvmlSystemGetCudaDriverVersion()
+                        cuda_ver = f"{cuda_ver_raw // 1000}.{(cuda_ver_raw % 1000) // 10}"
+                    except Exception:
+                        cuda_ver = "Unknown"
+                    for i in range(pynvml.nvmlDeviceGetCount()):
+                        handle = pynvml.nvmlDeviceGetHandleByIndex(i)
+                        mem_info = pynvml.nvmlDeviceGetMemoryInfo(handle)
+                        self._gpu_handles.append(handle)
+                        gpus.append(GPUInfo(
+                            name=_decode(pynvml.nvmlDeviceGetName(handle)),
+                            total_memory_mb=int(mem_info.total / (1024**2)),
+                            free_memory_mb=int(mem_info.free / (1024**2)),
+                            driver_version=driver_ver,
+                            cuda_version=cuda_ver
+                        ))
+                except Exception as e:
+                    print(f"NVML unavailable, sampling CPU/RAM only: {e}")
+                    self._gpu_handles = []
+                    gpus = []
+
+            vm = psutil.virtual_memory()
+            self._static = HardwareProfile(
+                os=platform.system() + " " + platform.release(),
+                cpu_cores_physical=psutil.cpu_count(logical=False) or 1,
+                cpu_cores_logical=psutil.cpu_count(logical=True) or 1,
+                ram_total_gb=round(vm.total / (1024**3), 2),
+                ram_available_gb=round(vm.available / (1024**3), 2),
+                gpus=gpus
+            )
+            # Prime cpu_percent so the first real sample is meaningful
+            psutil.cpu_percent(interval=None)
+
+    def sample_once(self) -> HardwareSample:
+        self._init_static()
+        gpu_free = []
+        for handle in self._gpu_handles:
+            try:
+                gpu_free.append(int(pynvml.nvmlDeviceGetMemoryInfo(handle).free / (1024**2)))
+            except Exception:
+                gpu_free.append(0)
+        sample = HardwareSample(
+            timestamp=time.time(),
+            cpu_percent=psutil.cpu_percent(interval=None),
+            ram_available_gb=round(psutil.virtual_memory().available / (1024**3), 2),
+            gpu_free_memory_mb=gpu_free
+        )
+        self._samples.append(sample)
+        return sample
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="hardware-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.interval_s + 1.0)
+        self._thread = None
+        if self._nvml_active:
+            try:
+                pynvml.nvmlShutdown()
+            except Exception:
+                pass
+            self._nvml_active = False
+            self._static = None
+            self._gpu_handles = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample_once()
+            except Exception as e:
+                print(f"Hardware sampling failed: {e}")
+            self._stop.wait(self.interval_s)
+
+    def _window(self, window_s: float) -> List[HardwareSample]:
+        cutoff = time.time() - window_s
+        return [s for s in list(self._samples) if s.timestamp >= cutoff]
+
+    def _profile_from(self, ram_available_gb: float, gpu_free_mb: List[int]) -> HardwareProfile:
+        gpus = [replace(gpu, free_memory_mb=free) for gpu, free in zip(self._static.gpus, gpu_free_mb)]
+        return replace(self._static, ram_available_gb=ram_available_gb, gpus=gpus)
+
+    def latest_profile(self) -> HardwareProfile:
+        """Most recent sample as a HardwareProfile; samples once if the buffer is empty."""
+        latest = self.latest_sample()
+        return self._profile_from(latest.ram_available_gb, latest.gpu_free_memory_mb)
+
+    def smoothed_profile(self, window_s: float = 30.0) -> HardwareProfile:
+        """Profile with free RAM/VRAM averaged over the window, for less noisy decisions."""
+        samples = self._window(window_s) or [self.latest_sample()]
+        n = len(samples)
+        ram = round(sum(s.ram_available_gb for s in samples) / n, 2)
+        gpu_count = len(self._static.gpus)
+        gpu_free = [int(sum(s.gpu_free_memory_mb[i] for s in samples) / n) for i in range(gpu_count)]
+        return self._profile_from(ram, gpu_free)
+
+    def latest_sample(self) -> HardwareSample:
+        return self._samples[-1] if self._samples else self.sample_once()
+
+    def history(self, window_s: float = 60.0) -> dict:
+        samples = self._window(window_s)
+        gpu_count = len(self._static.gpus) if self._static else 0
+        return {
+            "window_s": window_s,
+            "interval_s": self.interval_s,
+            "samples": len(samples),
+            "cpu_percent": _summary([s.cpu_percent for s in samples]),
+            "ram_available_gb": _summary([s.ram_available_gb for s in samples]),
+            "gpus": [
+                {
+                    "name": self._static.gpus[i].name,
+                    "free_memory_mb": _summary([s.gpu_free_memory_mb[i] for s in samples])
+                }
+                for i in range(gpu_count)
+            ]
+        }
+
+hardware_sampler = HardwareSampler(
+    interval_s=settings.hardware_sample_interval_s,
+    history_size=settings.hardware_history_size
+)
@@ -1,5 +1,11 @@
+import os
+import re
+import ast
+import codecs
+import threading
+from collections import deque
 from dataclasses import dataclass
-from typing import List
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 @dataclass
 class TextChunk:
@@ -8,44 +14,364 @@ class TextChunk:
     start_line: int
     end_line: int
 
-def chunk_file(filepath: str, max_tokens: int = 500, overlap: int = 50) -> List[TextChunk]:
+# Approximates a WordPiece tokenizer: every run of word characters is at
+# least one token (long identifiers are split further), every punctuation
+# character is its own token.
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    count = 0
+    for match in _TOKEN_RE.finditer(text):
+        count += 1 + (match.end() - match.start() - 1) // 8
+    return count
+
+# A chunker takes (filepath, lines, max_tokens, overlap) and returns chunks.
+# `lines` keep their line endings; line numbers are 1-based and inclusive.
+Chunker = Callable[[str, List[str], int, int], List[TextChunk]]
+
+CHUNKERS: Dict[str, Chunker] = {}
+
+def register_chunker(*extensions: str):
+    """Register a chunker for the given file extensions (with leading dot)."""
+    def decorator(fn: Chunker) -> Chunker:
+        for ext in extensions:
+            CHUNKERS[ext.lower()] = fn
+        return fn
+    return decorator
+
+def get_chunker(filepath: str) -> Chunker:
+    ext = os.path.splitext(filepath)[1].lower()
+    return CHUNKERS.get(ext, chunk_lines)
+
+# -- reading -----------------------------------------------------------------
+
+DECODE_POLICIES = ("replace", "ignore", "skip")
+MAX_LINE_BYTES = 16 * 1024  # longer lines (minified code, data) are clipped
+STREAM_MIN_BYTES = 1024 * 1024
+
+_decode_errors = threading.local()
+
+def _counting_handler(replacement: str):
+    def handler(exc: UnicodeDecodeError):
+        _decode_errors.count = getattr(_decode_errors, "count", 0) + 1
+        return replacement, exc.end
+    return handler
+
+codecs.register_error("chunker-replace", _counting_handler("\ufffd"))
+codecs.register_error("chunker-ignore", _counting_handler(""))
+
+class LineReader:
+    """
+    Iterates a file's lines in bounded memory. Invalid UTF-8 is replaced,
+    dropped, or ends the read ("skip") according to `errors`. Lines over
+    MAX_LINE_BYTES are clipped and reading stops at `max_bytes` /
+    `max_lines` (0: no cap). The counters are final once iteration ends.
     """
-    Splits file content into chunks.
-    Naive Line-based chunking for now (approx 1 line = 10 tokens).
-    Future: Use a real tokenizer.
+    def __init__(self, filepath: str, errors: str = "replace", max_bytes: int = 0, max_lines: int = 0):
+        if errors not in DECODE_POLICIES:
+            raise ValueError(f"Unknown decode policy {errors!r}, expected one of {DECODE_POLICIES}")
+        self.filepath = filepath
+        self.errors = errors
+        self.max_bytes = max_bytes
+        self.max_lines = max_lines
+        self.bytes_read = 0
+        self.lines = 0
+        self.truncated = False  # hit a cap or clipped a line
+        self.decode_errors = 0  # invalid byte sequences seen
+        self.rejected = False  # "skip" policy stopped at invalid UTF-8
+
+    def _decode(self, decoder, raw: bytes, final: bool = False) -> Optional[str]:
+        before = getattr(_decode_errors, "count", 0)
+        try:
+            text = decoder.decode(raw, final)
+        except UnicodeDecodeError:
+            self.decode_errors += 1
+            self.rejected = True
+            return None
+        self.decode_errors += getattr(_decode_errors, "count", 0) - before
+        return text
+
+    def __iter__(self) -> Iterator[str]:
+        handler = "strict" if self.errors == "skip" else "chunker-" + self.errors
+        decoder = codecs.getincrementaldecoder("utf-8")(handler)
+        try:
+            f = open(self.filepath, "rb")
+        except OSError:
+            return
+        with f:
+            while True:
+                limit = MAX_LINE_BYTES
+                if self.max_bytes:
+                    limit = min(limit, self.max_bytes - self.bytes_read)
+                if limit <= 0 or (self.max_lines and self.lines >= self.max_lines):
+                    self.truncated = f.read(1) != b""
+                    return
+                raw = f.readline(limit)
+                if not raw:
+                    break
+                self.bytes_read += len(raw)
+                clipped = not raw.endswith(b"\n") and len(raw) == MAX_LINE_BYTES
+                text = self._decode(decoder, raw)
+                if text is None:
+                    return
+                if clipped:
+                    # Skip the rest of the line, and any partial character
+                    for rest in iter(lambda: f.readline(MAX_LINE_BYTES), b""):
+                        self.bytes_read += len(rest)
+                        if rest.endswith(b"\n"):
+                            break
+                    decoder.reset()
+                    self.truncated = True
+                    text += "\n"
+                elif text.endswith("\r\n"):
+                    text = text[:-2] + "\n"
+                self.lines += 1
+                yield text
+            # A multi-byte character cut off by end of file
+            self._decode(decoder, b"", final=True)
+
+def chunk_file(filepath: str, max_tokens: int = 500, overlap: int = 50,
+               reader: Optional[LineReader] = None,
+               stream_min_bytes: int = STREAM_MIN_BYTES) -> Iterator[TextChunk]:
     """
+    Yields chunks of at most `max_tokens` tokens. Files under
+    `stream_min_bytes` are read whole and split by the chunker registered
+    for their extension (syntax-aware where available); larger files get
+    a sliding window over the line stream, so memory is bounded by one
+    window instead of the file (0 disables streaming).
+    """
+    reader = reader or LineReader(filepath)
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-    except UnicodeDecodeError:
-        return [] # Skip binary files
-    except Exception:
+        size = os.path.getsize(filepath)
+    except OSError:
+        return
+    if stream_min_bytes and size >= stream_min_bytes:
+        yield from stream_window(filepath, reader, max_tokens, overlap)
+        return
+    lines = list(reader)
+    if reader.rejected:
+        return  # "skip" policy: invalid UTF-8 drops the whole file
+    yield from get_chunker(filepath)(filepath, lines, max_tokens, overlap)
+
+# -- building blocks ---------------------------------------------------------
+
+def _make_chunk(filepath: str, lines: List[str], start: int, end: int) -> Optional[TextChunk]:
+    """Chunk for 1-based inclusive line range, or None if it is blank."""
+    content = "".join(lines[start - 1:end])
+    if not content.strip():
+        return None
+    return TextChunk(filepath=filepath, content=content, start_line=start, end_line=end)
+
+def _window(filepath: str, lines: List[str], start: int, end: int,
+            max_tokens: int, overlap: int) -> List[TextChunk]:
+    """
+    Sliding window over lines[start..end] packing whole lines up to the
+    token budget; consecutive windows share roughly `overlap` tokens.
+    """
+    chunks = []
+    line_tokens = [count_tokens(line) for line in lines[start - 1:end]]
+    i = start
+    while i <= end:
+        budget = 0
+        j = i
+        # Always take at least one line, even if it alone exceeds the budget
+        while j <= end and (j == i or budget + line_tokens[j - start] <= max_tokens):
+            budget += line_tokens[j - start]
+            j += 1
+        chunk = _make_chunk(filepath, lines, i, j - 1)
+        if chunk:
+            chunks.append(chunk)
+        if j > end:
+            break
+        # Step back over trailing lines worth ~overlap tokens, but always advance
+        back = 0
+        k = j - 1
+        while k > i + 1 and back + line_tokens[k - start] <= overlap:
+            back += line_tokens[k - start]
+            k -= 1
+        # Drop the overlap when the next line doesn't fit after it, or the
+        # next window would hold nothing but lines already emitted
+        i = k + 1 if back + line_tokens[j - start] <= max_tokens else j
+    return chunks
+
+def _emit(filepath: str, lines: List[str], start: int, end: int,
+          max_tokens: int, overlap: int) -> List[TextChunk]:
+    """One chunk for the range if it fits the budget, else a window split."""
+    if start > end:
         return []
+    if count_tokens("".join(lines[start - 1:end])) <= max_tokens:
+        chunk = _make_chunk(filepath, lines, start, end)
+        return [chunk] if chunk else []
+    return _window(filepath, lines, start, end, max_tokens, overlap)
+
+def _emit_segments(filepath: str, lines: List[str], segments: List[Tuple[int, int]],
+                   max_tokens: int, overlap: int) -> List[TextChunk]:
+    """
+    Emit sorted, disjoint segments (lines between them count as segments
+    too). Neighbouring segments are packed together while they fit the
+    budget; a segment is only ever cut when it alone exceeds it.
+    """
+    ranges = []
+    cursor = 1
+    for start, end in segments:
+        if start > cursor:
+            ranges.append((cursor, start - 1))
+        ranges.append((start, end))
+        cursor = end + 1
+    if cursor <= len(lines):
+        ranges.append((cursor, len(lines)))
 
     chunks = []
-    
-    # Heuristic: ~50 lines per chunk (~500 tokens)
-    LINES_PER_CHUNK = 50
-    OVERLAP_LINES = 5
-    
-    total_lines = len(lines)
-    
-    for i in range(0, total_lines, LINES_PER_CHUNK - OVERLAP_LINES):
-        end = min(i + LINES_PER_CHUNK, total_lines)
-        chunk_lines = lines[i:end]
-        content = "".join(chunk_lines)
-        
-        if not content.strip():
+    pack_start, pack_end, pack_tokens = None, None, 0
+    for start, end in ranges:
+        tokens = count_tokens("".join(lines[start - 1:end]))
+        if pack_start is not None and pack_tokens + tokens <= max_tokens:
+            pack_end, pack_tokens = end, pack_tokens + tokens
             continue
-            
-        chunks.append(TextChunk(
-            filepath=filepath,
-            content=content,
-            start_line=i + 1,
-            end_line=end
-        ))
-        
-        if end == total_lines:
-            break
-            
+        if pack_start is not None:
+            chunks.extend(_emit(filepath, lines, pack_start, pack_end, max_tokens, overlap))
+        pack_start, pack_end, pack_tokens = start, end, tokens
+    if pack_start is not None:
+        chunks.extend(_emit(filepath, lines, pack_start, pack_end, max_tokens, overlap))
     return chunks
+
+def stream_window(filepath: str, lines: Iterable[str], max_tokens: int = 500,
+                  overlap: int = 50) -> Iterator[TextChunk]:
+    """
+    Same windows as chunk_lines, but over an iterable: only the lines of
+    the current window are held in memory.
+    """
+    window = deque()  # (line, tokens) for lines first .. first + len - 1
+    first = 1
+    total = 0
+    for line in lines:
+        tokens = count_tokens(line)
+        if window and total + tokens > max_tokens:
+            content = "".join(text for text, _ in window)
+            if content.strip():
+                yield TextChunk(filepath=filepath, content=content, start_line=first,
+                                end_line=first + len(window) - 1)
+            # Keep trailing lines worth ~overlap tokens, as _window does
+            back = 0
+            k = len(window) - 1
+            while k > 1 and back + window[k][1] <= overlap:
+                back += window[k][1]
+                k -= 1
+            drop = k + 1 if back + tokens <= max_tokens else len(window)
+            for _ in range(drop):
+                total -= window.popleft()[1]
+                first += 1
+        window.append((line, tokens))
+        total += tokens
+    content = "".join(text for text, _ in window)
+    if content.strip():
+        yield TextChunk(filepath=filepath, content=content, start_line=first,
+                        end_line=first + len(window) - 1)
+
+# -- chunkers ----------------------------------------------------------------
+
+def chunk_lines(filepath: str, lines: List[str], max_tokens: int = 500, overlap: int = 50) -> List[TextChunk]:
+    """Fallback for unknown file types: token-budgeted sliding window."""
+    if not lines:
+        return []
+    return _window(filepath, lines, 1, len(lines), max_tokens, overlap)
+
+_PY_DEFS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+def _py_segments(body: List[ast.stmt], lines: List[str], max_tokens: int) -> List[Tuple[int, int]]:
+    segments = []
+    for node in body:
+        if not isinstance(node, _PY_DEFS):
+            continue
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        end = node.end_lineno or node.lineno
+        if isinstance(node, ast.ClassDef) and count_tokens("".join(lines[start - 1:end])) > max_tokens:
+            # Oversized class: header/attributes as one chunk, each method its own
+            inner = _py_segments(node.body, lines, max_tokens)
+            if inner:
+                segments.append((start, inner[0][0] - 1))
+                for i, (s, e) in enumerate(inner):
+                    segments.append((s, e))
+                    gap_end = inner[i + 1][0] - 1 if i + 1 < len(inner) else end
+                    if gap_end > e:
+                        segments.append((e + 1, gap_end))
+                continue
+        segments.append((start, end))
+    return segments
+
+@register_chunker(".py", ".pyi")
+def chunk_python(filepath: str, lines: List[str], max_tokens: int = 500, overlap: int = 50) -> List[TextChunk]:
+    """Splits on top-level function/class boundaries (methods, for oversized classes)."""
+    try:
+        tree = ast.parse("".join(lines))
+    except (SyntaxError, ValueError):
+        return chunk_lines(filepath, lines, max_tokens, overlap)
+    segments = _py_segments(tree.body, lines, max_tokens)
+    return _emit_segments(filepath, lines, segments, max_tokens, overlap)
+
+# Strips string literals and line comments before counting braces
+_BRACE_NOISE_RE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`[^`]*`|//.*$')
+
+@register_chunker(".c", ".h", ".cc", ".cpp", ".hpp", ".cs", ".go", ".java", ".js", ".jsx",
+                  ".kt", ".php", ".rs", ".scala", ".swift", ".ts", ".tsx", ".dart")
+def chunk_braces(filepath: str, lines: List[str], max_tokens: int = 500, overlap: int = 50) -> List[TextChunk]:
+    """
+    Heuristic for brace languages: a top-level block runs from the line
+    that opens it (plus directly preceding comments/annotations) to the
+    line where brace depth returns to zero.
+    """
+    segments = []
+    depth = 0
+    block_start = None
+    in_block_comment = False
+    for i, line in enumerate(lines, start=1):
+        code = line
+        if in_block_comment:
+            if "*/" not in code:
+                continue
+            code = code.split("*/", 1)[1]
+            in_block_comment = False
+        code = _BRACE_NOISE_RE.sub("", code)
+        if "/*" in code:
+            before, _, after = code.partition("/*")
+            if "*/" in after:
+                code = before + after.split("*/", 1)[1]
+            else:
+                code = before
+                in_block_comment = True
+
+        opens, closes = code.count("{"), code.count("}")
+        if depth == 0 and opens > closes and block_start is None:
+            block_start = i
+            # Pull in doc comments / annotations sitting right above the block
+            while block_start > 1 and (not segments or block_start - 1 > segments[-1][1]):
+                prev = lines[block_start - 2].strip()
+                if prev.startswith(("//", "/*", "*", "@", "#[")) or prev.endswith("*/"):
+                    block_start -= 1
+                else:
+                    break
+        depth = max(0, depth + opens - closes)
+        if depth == 0 and block_start is not None:
+            segments.append((block_start, i))
+            block_start = None
+    if block_start is not None:
+        segments.append((block_start, len(lines)))
+    return _emit_segments(filepath, lines, segments, max_tokens, overlap)
+
+_HEADING_RE = re.compile(r"^#{1,6}\s")
+
+@register_chunker(".md", ".markdown")
+def chunk_markdown(filepath: str, lines: List[str], max_tokens: int = 500, overlap: int = 50) -> List[TextChunk]:
+    """One chunk per heading section (headings inside code fences are ignored)."""
+    starts = []
+    in_fence = False
+    for i, line in enumerate(lines, start=1):
+        stripped = line.lstrip()
+        if stripped.startswith("```") or stripped.startswith("~~~"):
+            in_fence = not in_fence
+        elif not in_fence and _HEADING_RE.match(line):
+            starts.append(i)
+    if not starts:
+        return chunk_lines(filepath, lines, max_tokens, overlap)
+    segments = [(s, (starts[n + 1] - 1) if n + 1 < len(starts) else len(lines)) for n, s in enumerate(starts)]
+    return _emit_segments(filepath, lines, segments, max_tokens, overlap)
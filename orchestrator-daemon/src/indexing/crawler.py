@@ -1,42 +1,302 @@
 import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Generator, Iterable, List, Optional, Tuple
+
 import pathspec
-from typing import List, Generator
-
-def load_gitignore_spec(root_path: str) -> pathspec.PathSpec:
-    gitignore_path = os.path.join(root_path, ".gitignore")
-    patterns = []
-    
-    # Defaults
-    patterns.append(".git/")
-    patterns.append("__pycache__/")
-    patterns.append(".env")
-    patterns.append("node_modules/")
-    patterns.append("target/") # Rust
-    patterns.append("dist/")
-    patterns.append("build/")
-    
-    if os.path.exists(gitignore_path):
+
+from .chunker import CHUNKERS
+from ..config import Settings, settings as default_settings
+
+DEFAULT_IGNORES = [
+    ".git/",
+    "__pycache__/",
+    ".env",
+    "node_modules/",
+    "target/",  # Rust
+    "dist/",
+    "build/",
+]
+
+# Extensions that are text by construction; they skip the binary sniff.
+TEXT_EXTENSIONS = set(CHUNKERS) | {
+    ".txt", ".rst", ".json", ".yaml", ".yml", ".toml", ".ini", ".cfg", ".xml",
+    ".html", ".htm", ".css", ".scss", ".sh", ".bash", ".ps1", ".sql", ".csv",
+}
+
+SNIFF_BYTES = 8192
+
+@dataclass
+class CrawlEntry:
+    path: str
+    size: int
+    mtime: float
+
+@dataclass
+class CrawlStats:
+    """Files the crawler dropped, by reason (ignored paths are not counted)."""
+    excluded: Dict[str, int] = field(default_factory=dict)
+
+    def skip(self, reason: str):
+        self.excluded[reason] = self.excluded.get(reason, 0) + 1
+
+# -- ignore rules ------------------------------------------------------------
+
+_NAMED_GROUP_RE = re.compile(r"\(\?P<[^>]+>")
+
+class IgnoreRules:
+    """
+    Compiled patterns of one ignore file. Paths are given relative to the
+    file's directory, directories with a trailing slash. match() returns
+    True (ignored), False (re-included by a "!" pattern) or None.
+    """
+    def __init__(self, lines: Iterable[str]):
+        spec = pathspec.PathSpec.from_lines("gitwildmatch", lines)
+        self.patterns = [(p.regex, p.include) for p in spec.patterns if p.include is not None]
+        self.combined = None
+        if self.patterns and all(include for _, include in self.patterns):
+            # No negations: one alternation answers in a single regex pass
+            self.combined = re.compile("|".join(
+                "(?:%s)" % _NAMED_GROUP_RE.sub("(?:", regex.pattern) for regex, _ in self.patterns
+            ))
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def match(self, rel_path: str) -> Optional[bool]:
+        if self.combined is not None:
+            return True if self.combined.match(rel_path) else None
+        # Last matching pattern wins
+        for regex, include in reversed(self.patterns):
+            if regex.match(rel_path):
+                return include
+        return None
+
+# gitignore path -> ((mtime_ns, size), rules); re-read only when the file changes
+_rules_cache: Dict[str, Tuple[Tuple[int, int], Optional[IgnoreRules]]] = {}
+_rules_lock = threading.Lock()
+
+def _load_rules(path: str, st: Optional[os.stat_result] = None) -> Optional[IgnoreRules]:
+    try:
+        st = st or os.stat(path)
+    except OSError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _rules_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            rules = IgnoreRules(f.read().splitlines()) or None
+    except OSError:
+        rules = None
+    with _rules_lock:
+        _rules_cache[path] = (key, rules)
+    return rules
+
+def _git_excludes_file() -> Optional[str]:
+    """core.excludesFile from ~/.gitconfig, else git's XDG default."""
+    gitconfig = os.path.expanduser("~/.gitconfig")
+    try:
+        with open(gitconfig, "r", encoding="utf-8") as f:
+            section = ""
+            for line in f:
+                line = line.strip()
+                if line.startswith("["):
+                    section = line.strip("[]").strip().lower()
+                elif section == "core" and "=" in line:
+                    key, value = line.split("=", 1)
+                    if key.strip().lower() == "excludesfile":
+                        return os.path.expanduser(value.strip().strip('"'))
+    except OSError:
+        pass
+    xdg = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    return os.path.join(xdg, "git", "ignore")
+
+# A level is (length of the rel-dir prefix to strip, rules)
+Level = Tuple[int, IgnoreRules]
+
+def root_levels(root_path: str, config: Optional[Settings] = None) -> List[Level]:
+    """Ignore levels for the project root, lowest precedence first."""
+    cfg = config or default_settings
+    levels: List[Level] = [(0, IgnoreRules(DEFAULT_IGNORES))]
+    if cfg.index_use_global_excludes:
+        for path in (_git_excludes_file(), os.path.join(root_path, ".git", "info", "exclude")):
+            rules = _load_rules(path) if path else None
+            if rules:
+                levels.append((0, rules))
+    rules = _load_rules(os.path.join(root_path, ".gitignore"))
+    if rules:
+        levels.append((0, rules))
+    return levels
+
+def _ignored(levels: List[Level], rel_path: str) -> bool:
+    # Deeper .gitignore files take precedence over shallower ones
+    for prefix_len, rules in reversed(levels):
+        verdict = rules.match(rel_path[prefix_len:])
+        if verdict is not None:
+            return verdict
+    return False
+
+class IgnoreMatcher:
+    """
+    Single-path version of the crawler's rules (for watchers). Levels are
+    cached per directory, so checking many paths in one tree is cheap.
+    """
+    def __init__(self, root_path: str, config: Optional[Settings] = None):
+        self.root_path = os.path.abspath(root_path)
+        self._levels: Dict[str, List[Level]] = {"": root_levels(self.root_path, config)}
+
+    def _levels_for(self, rel_dir: str) -> List[Level]:
+        """rel_dir is "" or ends with "/"."""
+        levels = self._levels.get(rel_dir)
+        if levels is None:
+            parent = rel_dir[:-1].rpartition("/")[0]
+            levels = self._levels_for(parent + "/" if parent else "")
+            rules = _load_rules(os.path.join(self.root_path, rel_dir, ".gitignore"))
+            if rules:
+                levels = levels + [(len(rel_dir), rules)]
+            self._levels[rel_dir] = levels
+        return levels
+
+    def is_ignored(self, path: str) -> bool:
+        rel_path = os.path.relpath(os.path.abspath(path), self.root_path)
+        if rel_path == os.curdir:
+            return False
+        if rel_path.startswith(os.pardir):
+            return True
+        parts = rel_path.replace(os.sep, "/").split("/")
+        # An excluded directory cannot have anything re-included below it
+        rel_dir = ""
+        for part in parts[:-1]:
+            if _ignored(self._levels_for(rel_dir), rel_dir + part + "/"):
+                return True
+            rel_dir += part + "/"
+        name = rel_dir + parts[-1]
+        if os.path.isdir(path):
+            name += "/"
+        return _ignored(self._levels_for(rel_dir), name)
+
+# -- filters -----------------------------------------------------------------
+
+def _extensions(value: str) -> set:
+    return {e.strip().lower() if e.strip().startswith(".") else "." + e.strip().lower()
+            for e in value.split(",") if e.strip()}
+
+def looks_binary(path: str) -> bool:
+    """Git's heuristic: a NUL byte in the first few KB."""
+    try:
+        with open(path, "rb") as f:
+            return b"\0" in f.read(SNIFF_BYTES)
+    except OSError:
+        return True
+
+class _FileFilter:
+    def __init__(self, config: Settings, stats: Optional[CrawlStats]):
+        self.include = _extensions(config.index_include_extensions)
+        self.exclude = _extensions(config.index_exclude_extensions)
+        self.max_bytes = config.index_max_file_bytes
+        self.sniff = config.index_sniff_binary
+        self.stats = stats
+
+    def _skip(self, reason: str):
+        if self.stats is not None:
+            self.stats.skip(reason)
+
+    def check(self, path: str, name: str, st: os.stat_result) -> bool:
+        ext = os.path.splitext(name)[1].lower()
+        if (self.include and ext not in self.include) or ext in self.exclude:
+            self._skip("extension")
+            return False
+        if self.max_bytes and st.st_size > self.max_bytes:
+            self._skip("size")
+            return False
+        if self.sniff and ext not in TEXT_EXTENSIONS and looks_binary(path):
+            self._skip("binary")
+            return False
+        return True
+
+# -- crawling ----------------------------------------------------------------
+
+def _walk(root_path: str, start_dir: str, rel_dir: str, levels: List[Level],
+          file_filter: _FileFilter) -> Generator[CrawlEntry, None, None]:
+    stack = [(start_dir, rel_dir, levels)]
+    while stack:
+        dirpath, rel_dir, levels = stack.pop()
         try:
-            with open(gitignore_path, "r", encoding="utf-8") as f:
-                patterns.extend(f.readlines())
-        except Exception:
-            pass
-            
-    return pathspec.PathSpec.from_lines("gitwildmatch", patterns)
+            with os.scandir(dirpath) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name == ".gitignore" and rel_dir:
+                try:
+                    rules = _load_rules(entry.path, entry.stat())
+                except OSError:
+                    rules = None
+                if rules:
+                    levels = levels + [(len(rel_dir), rules)]
+                break
+
+        subdirs = []
+        for entry in entries:
+            rel_path = rel_dir + entry.name
+            try:
+                if entry.is_dir():
+                    # Like os.walk: symlinked directories are not followed
+                    if not entry.is_symlink() and not _ignored(levels, rel_path + "/"):
+                        subdirs.append((entry.path, rel_path + "/", levels))
+                    continue
+                if not entry.is_file() or _ignored(levels, rel_path):
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            if file_filter.check(entry.path, entry.name, st):
+                yield CrawlEntry(entry.path, st.st_size, st.st_mtime)
+        stack.extend(reversed(subdirs))
+
+def crawl_entries(root_path: str, config: Optional[Settings] = None,
+                  stats: Optional[CrawlStats] = None) -> Generator[CrawlEntry, None, None]:
+    """
+    Yields the project's indexable files with their size and mtime. Honors
+    the default excludes, the global git excludes, and .gitignore files at
+    every level; drops files by extension, size and a binary sniff.
+    """
+    cfg = config or default_settings
+    root_path = os.path.abspath(root_path)
+    yield from _walk(root_path, root_path, "", root_levels(root_path, cfg), _FileFilter(cfg, stats))
 
-def crawl_project(root_path: str) -> Generator[str, None, None]:
+def crawl_project(root_path: str, config: Optional[Settings] = None) -> Generator[str, None, None]:
     """
     Yields absolute file paths that are NOT ignored.
     """
-    spec = load_gitignore_spec(root_path)
-    
-    for root, dirs, files in os.walk(root_path):
-        # Filter directories in-place to prevent recursion into ignored dirs
-        dirs[:] = [d for d in dirs if not spec.match_file(os.path.join(os.path.relpath(os.path.join(root, d), root_path)))]
-        
-        for file in files:
-            abs_path = os.path.join(root, file)
-            rel_path = os.path.relpath(abs_path, root_path)
-            
-            if not spec.match_file(rel_path):
-                yield abs_path
+    for entry in crawl_entries(root_path, config):
+        yield entry.path
+
+def crawl_paths(root_path: str, paths: List[str], config: Optional[Settings] = None,
+                stats: Optional[CrawlStats] = None) -> Generator[CrawlEntry, None, None]:
+    """
+    Like crawl_entries, but only for the given files/directories (e.g. the
+    ones a watcher saw change). Missing paths are skipped.
+    """
+    cfg = config or default_settings
+    root_path = os.path.abspath(root_path)
+    matcher = IgnoreMatcher(root_path, cfg)
+    file_filter = _FileFilter(cfg, stats)
+    for path in paths:
+        if matcher.is_ignored(path):
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if os.path.isdir(path):
+            rel_dir = os.path.relpath(path, root_path).replace(os.sep, "/") + "/"
+            # Start from the parent's levels; _walk adds the directory's own .gitignore
+            parent = rel_dir[:-1].rpartition("/")[0]
+            levels = matcher._levels_for(parent + "/" if parent else "")
+            yield from _walk(root_path, path, rel_dir, levels, file_filter)
+        elif file_filter.check(path, os.path.basename(path), st):
+            yield CrawlEntry(path, st.st_size, st.st_mtime)
@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import uuid
+import threading
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set
+
+from .pipeline import IndexCancelled, IndexPipeline, IndexReport
+
+# queued -> running -> completed | failed | cancelled. Jobs that were queued
+# or running when the daemon stopped come back as "interrupted".
+FINISHED_STATUSES = ("completed", "failed", "cancelled", "interrupted")
+
+@dataclass
+class IndexJob:
+    job_id: str
+    root_path: str
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # "full" re-crawls the project; "incremental" re-checks `paths` only
+    scope: str = "full"
+    paths: int = 0
+    trigger: str = "api"  # api | watch
+    # Further index requests for the same project folded into this job
+    merged_requests: int = 0
+    progress: Dict = field(default_factory=dict)
+    report: Optional[Dict] = None
+    error: Optional[str] = None
+
+class IndexJobManager:
+    """
+    Runs index jobs on a small pool of worker threads. At most one job per
+    project runs at a time, and at most one more waits behind it: repeated
+    requests for a project that already has a queued job are merged into
+    that job instead of re-indexing the same tree twice. Job history is
+    kept in a JSON file so it survives restarts.
+    """
+    def __init__(self, pipeline_factory: Callable[[str], IndexPipeline], history_path: Optional[str] = None,
+                 max_concurrent: int = 1, max_history: int = 200,
+                 on_finished: Optional[Callable[[IndexJob, Optional[IndexReport]], None]] = None):
+        self.pipeline_factory = pipeline_factory
+        self.history_path = history_path
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_history = max_history
+        self.on_finished = on_finished
+        self._jobs: Dict[str, IndexJob] = {}
+        self._queue: Deque[str] = deque()
+        self._job_paths: Dict[str, Set[str]] = {}  # queued incremental jobs -> paths
+        self._active: Dict[str, IndexJob] = {}  # root_path -> job being run
+        self._running: Dict[str, IndexPipeline] = {}  # job_id -> its pipeline
+        self._cancel_requested = set()
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._stopping = False
+        self._load_history()
+
+    # -- persistence --------------------------------------------------------
+
+    def _load_history(self):
+        if not self.history_path or not os.path.exists(self.history_path):
+            return
+        try:
+            with open(self.history_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for raw in data.get("jobs", []):
+                job = IndexJob(**raw)
+                if job.status not in FINISHED_STATUSES:
+                    job.status = "interrupted"
+                    job.finished_at = job.finished_at or time.time()
+                self._jobs[job.job_id] = job
+        except Exception as e:
+            print(f"Ignoring unreadable index job history {self.history_path}: {e}")
+            self._jobs = {}
+
+    def _save_history(self):
+        """Caller holds the lock."""
+        if not self.history_path:
+            return
+        jobs = sorted(self._jobs.values(), key=lambda j: j.created_at)
+        finished = [j for j in jobs if j.status in FINISHED_STATUSES]
+        # Trim the oldest finished jobs; queued/running ones are always kept
+        for job in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job.job_id]
+        data = {"jobs": [asdict(j) for j in sorted(self._jobs.values(), key=lambda j: j.created_at)]}
+        os.makedirs(os.path.dirname(os.path.abspath(self.history_path)), exist_ok=True)
+        tmp_path = self.history_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.history_path)
+
+    # -- public API ---------------------------------------------------------
+
+    def submit(self, root_path: str, paths: Optional[Iterable[str]] = None, trigger: str = "api") -> IndexJob:
+        """
+        Queue an index run, or fold the request into the project's
+        already-queued job. Incremental requests (`paths`) merge their paths;
+        a full request turns the queued job into a full one.
+        """
+        root_path = os.path.abspath(root_path)
+        with self._cond:
+            for job_id in self._queue:
+                job = self._jobs[job_id]
+                if job.root_path == root_path:
+                    job.merged_requests += 1
+                    if paths is None:
+                        job.scope, job.paths = "full", 0
+                        self._job_paths.pop(job_id, None)
+                    elif job.scope == "incremental":
+                        self._job_paths[job_id].update(paths)
+                        job.paths = len(self._job_paths[job_id])
+                    return job
+            job = IndexJob(job_id=uuid.uuid4().hex[:12], root_path=root_path, trigger=trigger)
+            if paths is not None:
+                self._job_paths[job.job_id] = set(paths)
+                job.scope, job.paths = "incremental", len(self._job_paths[job.job_id])
+            self._jobs[job.job_id] = job
+            self._queue.append(job.job_id)
+            self._save_history()
+            self._ensure_workers()
+            self._cond.notify_all()
+            return job
+
+    def get(self, job_id: str) -> Optional[IndexJob]:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None and job_id in self._running:
+                job.progress = self._running[job_id].progress()
+            return job
+
+    def jobs(self, root_path: Optional[str] = None) -> List[IndexJob]:
+        with self._cond:
+            for job_id, pipeline in self._running.items():
+                self._jobs[job_id].progress = pipeline.progress()
+            jobs = sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+        if root_path is not None:
+            root_path = os.path.abspath(root_path)
+            jobs = [j for j in jobs if j.root_path == root_path]
+        return jobs
+
+    def latest_reports(self) -> Dict[str, dict]:
+        """Report of the most recent completed full run per project."""
+        reports: Dict[str, dict] = {}
+        for job in sorted(self.jobs(), key=lambda j: j.created_at):
+            if job.status == "completed" and job.scope == "full" and job.report:
+                reports[job.root_path] = job.report
+        return reports
+
+    def counts(self) -> Dict[str, int]:
+        """Jobs waiting and running right now."""
+        with self._cond:
+            return {"queued": len(self._queue), "running": len(self._active)}
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Stage queue depths summed over running pipelines."""
+        depths: Dict[str, int] = {"path": 0, "chunk": 0, "write": 0}
+        with self._cond:
+            pipelines = list(self._running.values())
+        for pipeline in pipelines:
+            for name, depth in pipeline.queue_depths().items():
+                depths[name] = depths.get(name, 0) + depth
+        return depths
+
+    def cancel(self, job_id: str) -> Optional[IndexJob]:
+        """Cancel a queued job outright, or ask a running one to stop."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATUSES:
+                return job
+            if job_id in self._queue:
+                self._queue.remove(job_id)
+                self._job_paths.pop(job_id, None)
+                job.status = "cancelled"
+                job.finished_at = time.time()
+                self._save_history()
+            elif job_id in self._running:
+                self._running[job_id].cancel()
+            else:
+                # Still starting up; cancelled as soon as its pipeline exists
+                self._cancel_requested.add(job_id)
+            return job
+
+    def cancel_project(self, root_path: str, timeout: float = 10.0) -> bool:
+        """
+        Cancel every queued or running job for a project and wait for the
+        running one to stop. False if it is still running after `timeout`.
+        """
+        root_path = os.path.abspath(root_path)
+        with self._cond:
+            job_ids = [j.job_id for j in self._jobs.values()
+                       if j.root_path == root_path and j.status not in FINISHED_STATUSES]
+        for job_id in job_ids:
+            self.cancel(job_id)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while root_path in self._active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: float = 10.0):
+        """Cancel running jobs and stop the workers (daemon shutdown)."""
+        with self._cond:
+            self._stopping = True
+            for pipeline in self._running.values():
+                pipeline.cancel()
+            self._cond.notify_all()
+            workers, self._workers = self._workers, []
+        for t in workers:
+            t.join(timeout=timeout)
+
+    # -- workers ------------------------------------------------------------
+
+    def _ensure_workers(self):
+        """Caller holds the lock."""
+        self._stopping = False
+        self._workers = [t for t in self._workers if t.is_alive()]
+        while len(self._workers) < self.max_concurrent:
+            t = threading.Thread(target=self._work, name=f"index-job-{len(self._workers)}", daemon=True)
+            self._workers.append(t)
+            t.start()
+
+    def _next_job(self) -> Optional[IndexJob]:
+        """Oldest queued job whose project is not already being indexed. Caller holds the lock."""
+        for job_id in self._queue:
+            job = self._jobs[job_id]
+            if job.root_path not in self._active:
+                self._queue.remove(job_id)
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopping:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+                self._active[job.root_path] = job
+                paths = self._job_paths.pop(job.job_id, None)
+                job.status = "running"
+                job.started_at = time.time()
+                self._save_history()
+
+            # Outside the lock: the first job may wait for the vector store to load
+            report = None
+            try:
+                pipeline = self.pipeline_factory(job.root_path)
+                with self._cond:
+                    self._running[job.job_id] = pipeline
+                    if job.job_id in self._cancel_requested or self._stopping:
+                        pipeline.cancel()
+                report = pipeline.run(job.root_path, sorted(paths) if paths is not None else None)
+                status, error = "completed", None
+            except IndexCancelled:
+                status, error = "cancelled", None
+            except Exception as e:
+                print(f"Indexing failed for {job.root_path}: {e}")
+                status, error = "failed", str(e)
+
+            with self._cond:
+                del self._active[job.root_path]
+                pipeline = self._running.pop(job.job_id, None)
+                self._cancel_requested.discard(job.job_id)
+                if pipeline is not None:
+                    job.progress = pipeline.progress()
+                job.status, job.error = status, error
+                job.report = asdict(report) if report is not None else None
+                job.finished_at = time.time()
+                self._save_history()
+                # A queued job for this project may be runnable now
+                self._cond.notify_all()
+
+            if self.on_finished is not None:
+                try:
+                    self.on_finished(job, report)
+                except Exception as e:
+                    print(f"Index job callback failed for {job.root_path}: {e}")
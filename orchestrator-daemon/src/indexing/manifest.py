@@ -0,0 +1,104 @@
+import os
+import json
+import hashlib
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+MANIFEST_VERSION = 1
+
+@dataclass
+class FileRecord:
+    path: str
+    size: int
+    mtime: float
+    content_hash: str
+    chunk_ids: List[str] = field(default_factory=list)
+
+def chunk_id(filepath: str, start_line: int) -> str:
+    return f"{filepath}:{start_line}"
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def hash_file(filepath: str, block_size: int = 1024 * 1024) -> Optional[str]:
+    h = hashlib.blake2b(digest_size=16)
+    try:
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                h.update(block)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+def normalize_root(root_path: str) -> str:
+    return os.path.normcase(os.path.abspath(root_path))
+
+def project_key(root_path: str) -> str:
+    """Stable short key for a project root; names its manifest and index partition."""
+    return hashlib.sha1(normalize_root(root_path).encode("utf-8")).hexdigest()[:16]
+
+def manifest_path_for(root_path: str, manifest_dir: str) -> str:
+    return os.path.join(manifest_dir, f"{project_key(root_path)}.json")
+
+class IndexManifest:
+    """
+    Per-project record of what is currently in the vector store.
+    Lets a re-index skip unchanged files and delete chunks of removed ones.
+    """
+    def __init__(self, root_path: str, manifest_dir: str):
+        self.root_path = os.path.abspath(root_path)
+        self.path = manifest_path_for(root_path, manifest_dir)
+        self.files: Dict[str, FileRecord] = {}
+
+    @classmethod
+    def load(cls, root_path: str, manifest_dir: str) -> "IndexManifest":
+        manifest = cls(root_path, manifest_dir)
+        if not os.path.exists(manifest.path):
+            return manifest
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                return manifest
+            for rec in data.get("files", []):
+                manifest.files[rec["path"]] = FileRecord(**rec)
+        except Exception as e:
+            # A corrupt manifest only costs a full re-index
+            print(f"Ignoring unreadable manifest {manifest.path}: {e}")
+            manifest.files = {}
+        return manifest
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {
+            "version": MANIFEST_VERSION,
+            "root_path": self.root_path,
+            "files": [asdict(r) for r in self.files.values()]
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, filepath: str) -> Optional[FileRecord]:
+        return self.files.get(filepath)
+
+    def is_unchanged(self, filepath: str, size: int, mtime: float) -> bool:
+        """Cheap stat-only check; a hit means the file need not even be read."""
+        rec = self.files.get(filepath)
+        return rec is not None and rec.size == size and rec.mtime == mtime
+
+    def update(self, record: FileRecord):
+        self.files[record.path] = record
+
+    def remove(self, filepath: str) -> Optional[FileRecord]:
+        return self.files.pop(filepath, None)
+
+    def missing_files(self, seen: set, within: Optional[List[str]] = None) -> List[FileRecord]:
+        """Records not in `seen`; with `within`, only those at or under one of those paths."""
+        if within is None:
+            return [rec for path, rec in self.files.items() if path not in seen]
+        exact = set(within)
+        prefixes = tuple(p.rstrip(os.sep) + os.sep for p in within)
+        return [rec for path, rec in self.files.items()
+                if path not in seen and (path in exact or path.startswith(prefixes))]
@@ -0,0 +1,447 @@
+import os
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, TYPE_CHECKING
+
+from .crawler import CrawlStats, crawl_entries, crawl_paths
+from .chunker import LineReader, TextChunk, chunk_file
+from .manifest import IndexManifest, FileRecord, hash_file, chunk_id
+from ..config import Settings, settings as default_settings
+from ..telemetry.metrics import metrics
+
+if TYPE_CHECKING:
+    # Kept out of worker processes: importing the store pulls in chromadb
+    from ..vector.store import VectorStore
+
+_DONE = object()
+
+INDEX_STAGE_SECONDS = metrics.histogram(
+    "orch_index_stage_duration_seconds",
+    "Indexing work per call: one file for crawl and read_chunk, one batch for embed and write", ["stage"])
+INDEX_CHUNKS = metrics.counter("orch_index_chunks_total", "Chunks written to or deleted from the index", ["op"])
+INDEX_FILES = metrics.counter("orch_index_files_total", "Files handled by completed index runs", ["outcome"])
+
+class IndexCancelled(Exception):
+    """Raised by IndexPipeline.run when cancel() stopped the run."""
+
+@dataclass
+class StageStats:
+    name: str
+    workers: int = 1
+    items: int = 0
+    calls: int = 0
+    busy_s: float = 0.0
+
+    def record(self, items: int, seconds: float):
+        self.items += items
+        self.calls += 1
+        self.busy_s += seconds
+        INDEX_STAGE_SECONDS.labels(self.name).observe(seconds)
+
+    def as_dict(self, wall_s: float) -> dict:
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "calls": self.calls,
+            "busy_s": round(self.busy_s, 3),
+            "items_per_s": round(self.items / self.busy_s, 1) if self.busy_s > 0 else 0.0,
+            # Fraction of the run this stage's workers spent doing work
+            "utilization": round(self.busy_s / (wall_s * self.workers), 3) if wall_s > 0 else 0.0
+        }
+
+@dataclass
+class FileResult:
+    path: str
+    size: int
+    mtime: float
+    content_hash: Optional[str]
+    chunks: Optional[Iterable[Dict]]  # None: content unchanged since last index
+    elapsed_s: float = 0.0
+    truncated: bool = False
+    decode_errors: int = 0
+
+def _chunk_dict(c: TextChunk) -> Dict:
+    return {
+        "filepath": c.filepath,
+        "content": c.content,
+        "start_line": c.start_line,
+        "end_line": c.end_line
+    }
+
+def read_and_chunk(path: str, size: int, mtime: float, previous_hash: Optional[str],
+                   max_tokens: int = 500, overlap: int = 50, errors: str = "replace",
+                   max_bytes: int = 0, max_lines: int = 0) -> FileResult:
+    """
+    Worker-side half of the pipeline. Top-level so it can be pickled
+    into a process pool.
+    """
+    start = time.perf_counter()
+    content_hash = hash_file(path)
+    if content_hash is not None and content_hash == previous_hash:
+        return FileResult(path, size, mtime, content_hash, None, time.perf_counter() - start)
+
+    reader = LineReader(path, errors, max_bytes, max_lines)
+    chunks = [_chunk_dict(c) for c in chunk_file(path, max_tokens=max_tokens, overlap=overlap,
+                                                  reader=reader, stream_min_bytes=0)]
+    return FileResult(path, size, mtime, content_hash, chunks, time.perf_counter() - start,
+                      reader.truncated, reader.decode_errors)
+
+@dataclass
+class IndexReport:
+    root_path: str
+    files_seen: int = 0
+    files_skipped: int = 0
+    files_indexed: int = 0
+    files_removed: int = 0
+    # Dropped by the crawler's extension / size / binary filters
+    files_excluded: Dict[str, int] = field(default_factory=dict)
+    # Indexed only up to chunk_max_file_bytes / chunk_max_file_lines, or with clipped lines
+    files_truncated: int = 0
+    files_invalid_utf8: int = 0
+    chunks_upserted: int = 0
+    chunks_deleted: int = 0
+    wall_s: float = 0.0
+    stages: Dict[str, dict] = field(default_factory=dict)
+    bottleneck: Optional[str] = None
+    embedding_cache: Dict[str, float] = field(default_factory=dict)
+
+class IndexPipeline:
+    """
+    Staged indexer: crawl -> read/chunk (process pool) -> embed -> write.
+    Stages are linked by bounded queues, so a slow stage applies
+    backpressure upstream instead of buffering the whole project in memory.
+    """
+    def __init__(self, vector_store: "VectorStore", config: Optional[Settings] = None):
+        self.vector_store = vector_store
+        self.config = config or default_settings
+        self._stop = threading.Event()
+        self._cancelled = False
+        self._errors: List[BaseException] = []
+        self._stages: Dict[str, StageStats] = {}
+        self._report: Optional[IndexReport] = None
+        self._started: Optional[float] = None
+        self._crawl_done = False
+        self._chunks_produced = 0
+        self._queues: Dict[str, "queue.Queue"] = {}
+
+    def cancel(self):
+        """Stop a running index; run() raises IndexCancelled once stages wind down."""
+        self._cancelled = True
+        self._stop.set()
+
+    def progress(self) -> dict:
+        """Live counters for a run in progress (safe to call from any thread)."""
+        report, stages = self._report, self._stages
+        if report is None or self._started is None:
+            return {}
+        elapsed = time.perf_counter() - self._started
+        files_queued = stages["crawl"].items
+        files_done = stages["read_chunk"].items
+        embed = stages["embed"]
+        return {
+            "elapsed_s": round(elapsed, 1),
+            "crawl_done": self._crawl_done,
+            "files_seen": report.files_seen,
+            "files_skipped": report.files_skipped,
+            "files_done": files_done,
+            # Only final once the crawl has finished
+            "files_remaining": max(0, files_queued - files_done),
+            "chunks_done": report.chunks_upserted,
+            "chunks_remaining": max(0, self._chunks_produced - report.chunks_upserted),
+            "files_per_s": round(files_done / elapsed, 1) if elapsed > 0 else 0.0,
+            "chunks_per_s": round(report.chunks_upserted / elapsed, 1) if elapsed > 0 else 0.0,
+            "embed_batches": embed.calls,
+            "embed_ms_per_batch": round(embed.busy_s / embed.calls * 1000, 1) if embed.calls else 0.0
+        }
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Items waiting between stages (path, chunk, write)."""
+        return {name: q.qsize() for name, q in self._queues.items()}
+
+    def run(self, root_path: str, paths: Optional[List[str]] = None) -> IndexReport:
+        """
+        Index the project at root_path. With `paths`, only those files and
+        directories are re-checked (incremental update from a watcher);
+        indexed files under them that no longer exist are removed.
+        """
+        root_path = os.path.abspath(root_path)
+        if self._cancelled:
+            raise IndexCancelled(root_path)
+        cfg = self.config
+        manifest_dir = os.path.join(self.vector_store.persist_path, "manifests")
+        manifest = IndexManifest.load(root_path, manifest_dir)
+        report = IndexReport(root_path=root_path)
+
+        self._stop.clear()
+        self._errors = []
+        self._crawl_done = False
+        self._chunks_produced = 0
+        self._stages = {
+            "crawl": StageStats("crawl"),
+            "read_chunk": StageStats("read_chunk", workers=cfg.index_read_workers),
+            "embed": StageStats("embed"),
+            "write": StageStats("write"),
+        }
+        path_q: "queue.Queue" = queue.Queue(maxsize=cfg.index_path_queue_size)
+        chunk_q: "queue.Queue" = queue.Queue(maxsize=cfg.index_chunk_queue_size)
+        write_q: "queue.Queue" = queue.Queue(maxsize=cfg.index_write_queue_size)
+        self._queues = {"path": path_q, "chunk": chunk_q, "write": write_q}
+        seen = set()
+
+        threads = [
+            threading.Thread(target=self._guard, args=(self._crawl_stage, root_path, paths, manifest, seen, path_q, report), daemon=True),
+            threading.Thread(target=self._guard, args=(self._read_stage, manifest, path_q, chunk_q, write_q, report), daemon=True),
+            threading.Thread(target=self._guard, args=(self._embed_stage, chunk_q, write_q), daemon=True),
+            threading.Thread(target=self._guard, args=(self._write_stage, write_q, report), daemon=True),
+        ]
+        cache = self.vector_store.embedding_cache
+        cache_before = cache.stats() if cache else None
+        start = time.perf_counter()
+        self._report, self._started = report, start
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        if self._errors:
+            raise self._errors[0]
+        if self._cancelled:
+            # Keep the old manifest: files reconciled but not yet written are
+            # picked up again (mostly from the embedding cache) next run.
+            self.vector_store.flush()
+            raise IndexCancelled(root_path)
+
+        # Orphans: files indexed previously that are gone or now ignored
+        for rec in manifest.missing_files(seen, within=paths):
+            self.vector_store.delete_ids(rec.chunk_ids)
+            report.chunks_deleted += len(rec.chunk_ids)
+            INDEX_CHUNKS.labels("deleted").inc(len(rec.chunk_ids))
+            report.files_removed += 1
+            manifest.remove(rec.path)
+        self.vector_store.flush()
+        manifest.save()
+
+        report.wall_s = round(time.perf_counter() - start, 3)
+        report.stages = {name: st.as_dict(report.wall_s) for name, st in self._stages.items()}
+        report.bottleneck = max(report.stages, key=lambda n: report.stages[n]["utilization"])
+        if cache:
+            report.embedding_cache = self._cache_delta(cache_before, cache.stats())
+        INDEX_FILES.labels("indexed").inc(report.files_indexed)
+        INDEX_FILES.labels("skipped").inc(report.files_skipped)
+        INDEX_FILES.labels("removed").inc(report.files_removed)
+        return report
+
+    @staticmethod
+    def _cache_delta(before: dict, after: dict) -> dict:
+        """Hit ratio for this run only, plus the cache's current footprint."""
+        hits = after["hits"] - before["hits"]
+        misses = after["misses"] - before["misses"]
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            "entries": after["entries"],
+            "size_mb": after["size_mb"],
+            "max_mb": after["max_mb"]
+        }
+
+    # -- plumbing ---------------------------------------------------------
+
+    def _guard(self, target, *args):
+        try:
+            target(*args)
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop.set()
+
+    def _put(self, q: "queue.Queue", item) -> bool:
+        """Blocking put that gives up once another stage has failed."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: "queue.Queue"):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    # -- stages -----------------------------------------------------------
+
+    def _crawl_stage(self, root_path, paths, manifest, seen, path_q, report):
+        stats = self._stages["crawl"]
+        crawl_stats = CrawlStats(excluded=report.files_excluded)
+        t0 = time.perf_counter()
+        if paths is None:
+            entries = crawl_entries(root_path, self.config, crawl_stats)
+        else:
+            entries = crawl_paths(root_path, paths, self.config, crawl_stats)
+        for entry in entries:
+            if self._stop.is_set():
+                return
+            seen.add(entry.path)
+            report.files_seen += 1
+            if manifest.is_unchanged(entry.path, entry.size, entry.mtime):
+                report.files_skipped += 1
+                continue
+            stats.record(1, time.perf_counter() - t0)
+            if not self._put(path_q, (entry.path, entry.size, entry.mtime)):
+                return
+            t0 = time.perf_counter()
+        self._crawl_done = True
+        self._put(path_q, _DONE)
+
+    def _read_stage(self, manifest, path_q, chunk_q, write_q, report):
+        cfg = self.config
+        stats = self._stages["read_chunk"]
+        max_inflight = cfg.index_read_workers * 2
+        executor_cls = ProcessPoolExecutor if cfg.index_use_processes else ThreadPoolExecutor
+        inflight = deque()
+
+        with executor_cls(max_workers=cfg.index_read_workers) as pool:
+            def drain(block: bool):
+                if not inflight:
+                    return
+                if block:
+                    wait(list(inflight), return_when=FIRST_COMPLETED)
+                for fut in [f for f in inflight if f.done()]:
+                    inflight.remove(fut)
+                    result = fut.result()
+                    stats.record(1, result.elapsed_s)
+                    self._reconcile(result, manifest, chunk_q, write_q, report)
+
+            while True:
+                item = self._get(path_q)
+                if item is _DONE:
+                    break
+                filepath, size, mtime = item
+                previous = manifest.get(filepath)
+                previous_hash = previous.content_hash if previous else None
+                if cfg.chunk_stream_min_bytes and size >= cfg.chunk_stream_min_bytes:
+                    self._stream_file(filepath, size, mtime, previous_hash, manifest, chunk_q, write_q, report)
+                    continue
+                inflight.append(pool.submit(
+                    read_and_chunk, filepath, size, mtime, previous_hash,
+                    cfg.chunk_max_tokens, cfg.chunk_overlap_tokens, cfg.chunk_decode_errors,
+                    cfg.chunk_max_file_bytes, cfg.chunk_max_file_lines
+                ))
+                drain(block=len(inflight) >= max_inflight)
+
+            while inflight and not self._stop.is_set():
+                drain(block=True)
+
+        self._put(chunk_q, _DONE)
+
+    def _stream_file(self, filepath, size, mtime, previous_hash, manifest, chunk_q, write_q, report):
+        """
+        Large files are chunked on the read stage thread instead of a
+        worker: chunks go to the bounded chunk queue as they are cut, so
+        memory does not grow with the file.
+        """
+        cfg = self.config
+        start = time.perf_counter()
+        content_hash = hash_file(filepath)
+        result = FileResult(filepath, size, mtime, content_hash, None)
+        reader = None
+        if content_hash is None or content_hash != previous_hash:
+            reader = LineReader(filepath, cfg.chunk_decode_errors, cfg.chunk_max_file_bytes,
+                                cfg.chunk_max_file_lines)
+            result.chunks = (_chunk_dict(c) for c in chunk_file(
+                filepath, max_tokens=cfg.chunk_max_tokens, overlap=cfg.chunk_overlap_tokens,
+                reader=reader, stream_min_bytes=1))
+        self._reconcile(result, manifest, chunk_q, write_q, report, reader)
+        # Includes time blocked on a full chunk queue
+        self._stages["read_chunk"].record(1, time.perf_counter() - start)
+
+    def _reconcile(self, result: FileResult, manifest, chunk_q, write_q, report,
+                   reader: Optional[LineReader] = None):
+        """Manifest bookkeeping for one file; runs on the read stage thread only."""
+        previous = manifest.get(result.path)
+        if result.chunks is None:
+            # Touched but not modified: refresh stat info only
+            previous.size, previous.mtime = result.size, result.mtime
+            report.files_skipped += 1
+            return
+
+        new_ids = []
+        for c in result.chunks:
+            if not self._put(chunk_q, c):
+                return
+            new_ids.append(chunk_id(c["filepath"], c["start_line"]))
+            self._chunks_produced += 1
+        if reader is not None:
+            # Streamed: the reader's counters are final only now
+            result.truncated, result.decode_errors = reader.truncated, reader.decode_errors
+        if result.truncated:
+            report.files_truncated += 1
+        if result.decode_errors:
+            report.files_invalid_utf8 += 1
+
+        if previous is not None:
+            stale = list(set(previous.chunk_ids) - set(new_ids))
+            if stale:
+                self._put(write_q, ("delete", stale))
+                report.chunks_deleted += len(stale)
+
+        manifest.update(FileRecord(
+            path=result.path,
+            size=result.size,
+            mtime=result.mtime,
+            content_hash=result.content_hash or "",
+            chunk_ids=new_ids
+        ))
+        report.files_indexed += 1
+
+    def _embed_stage(self, chunk_q, write_q):
+        stats = self._stages["embed"]
+        batch_size = self.config.index_embed_batch_size
+        batch: List[Dict] = []
+
+        def flush():
+            t0 = time.perf_counter()
+            embeddings = self.vector_store.embed_texts([c["content"] for c in batch])
+            stats.record(len(batch), time.perf_counter() - t0)
+            return self._put(write_q, ("upsert", list(batch), embeddings))
+
+        while True:
+            item = self._get(chunk_q)
+            if item is _DONE:
+                break
+            batch.append(item)
+            # Only full batches go to the model until the stream ends
+            if len(batch) >= batch_size:
+                if not flush():
+                    return
+                batch = []
+
+        if batch and not self._stop.is_set():
+            flush()
+        self._put(write_q, _DONE)
+
+    def _write_stage(self, write_q, report):
+        stats = self._stages["write"]
+        while True:
+            item = self._get(write_q)
+            if item is _DONE:
+                break
+            t0 = time.perf_counter()
+            if item[0] == "upsert":
+                _, chunks, embeddings = item
+                self.vector_store.upsert_embeddings(chunks, embeddings)
+                report.chunks_upserted += len(chunks)
+                INDEX_CHUNKS.labels("upserted").inc(len(chunks))
+                stats.record(len(chunks), time.perf_counter() - t0)
+            else:
+                self.vector_store.delete_ids(item[1])
+                INDEX_CHUNKS.labels("deleted").inc(len(item[1]))
+                stats.record(0, time.perf_counter() - t0)
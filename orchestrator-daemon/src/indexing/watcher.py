@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .crawler import IgnoreMatcher, crawl_entries
+from ..config import Settings, settings as default_settings
+
+try:
+    # watchdog uses inotify on Linux (FSEvents / ReadDirectoryChangesW elsewhere)
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    HAS_WATCHDOG = True
+except ImportError:
+    HAS_WATCHDOG = False
+    FileSystemEventHandler = object
+
+# (root_path, changed paths) -> job id of the queued incremental run
+SubmitFn = Callable[[str, List[str]], str]
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "ProjectWatcher"):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        paths = [event.src_path]
+        dest = getattr(event, "dest_path", None)
+        if dest:
+            paths.append(dest)
+        self.watcher.record(paths)
+
+class ProjectWatcher:
+    """
+    Watches one indexed project and feeds changed paths to incremental
+    index runs. Events are debounced: a batch is submitted once the tree
+    has been quiet for `debounce_s`, or `max_delay_s` after its first event
+    so a steady stream of writes cannot hold indexing back forever.
+    """
+    def __init__(self, root_path: str, submit: SubmitFn, config: Optional[Settings] = None,
+                 use_polling: bool = False):
+        cfg = config or default_settings
+        self.root_path = os.path.abspath(root_path)
+        self.submit = submit
+        self.debounce_s = cfg.watch_debounce_s
+        self.max_delay_s = cfg.watch_max_delay_s
+        self.poll_interval_s = cfg.watch_poll_interval_s
+        self.config = cfg
+        self.backend = "polling" if use_polling or not HAS_WATCHDOG else "inotify"
+        self._ignore = IgnoreMatcher(self.root_path, cfg)
+        self._pending: Dict[str, float] = {}  # path -> first event time
+        self._last_event = 0.0
+        self._inflight: Dict[str, Tuple[float, int]] = {}  # job id -> (oldest event, paths)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._observer = None
+        self._snapshot: Dict[str, Tuple[int, float]] = {}
+        self.started_at: Optional[float] = None
+        self.events = 0
+        self.batches = 0
+        self.last_lag_s: Optional[float] = None
+        self.max_lag_s = 0.0
+        self.last_indexed_at: Optional[float] = None
+
+    def start(self):
+        if self.started_at is not None:
+            return
+        self.started_at = time.time()
+        self._stop.clear()
+        if self.backend == "inotify":
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), self.root_path, recursive=True)
+            self._observer.start()
+        else:
+            self._snapshot = self._scan()
+            self._threads.append(threading.Thread(target=self._poll, name="watch-poll", daemon=True))
+        self._threads.append(threading.Thread(target=self._flush_loop, name="watch-flush", daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=2.0)
+            self._observer = None
+        for t in self._threads:
+            t.join(timeout=self.poll_interval_s + 1.0)
+        self._threads = []
+        self.started_at = None
+
+    def record(self, paths: Iterable[str]):
+        now = time.time()
+        with self._lock:
+            for path in paths:
+                path = os.path.abspath(path)
+                if os.path.basename(path) == ".gitignore":
+                    # New ignore rules apply to the next events
+                    self._ignore = IgnoreMatcher(self.root_path, self.config)
+                if self._ignore.is_ignored(path):
+                    continue
+                self._pending.setdefault(path, now)
+                self._last_event = now
+                self.events += 1
+
+    def job_finished(self, job_id: str):
+        """Called when an index job finishes; records lag for the watcher's own jobs."""
+        with self._lock:
+            entry = self._inflight.pop(job_id, None)
+            if entry is None:
+                return
+            now = time.time()
+            self.last_lag_s = round(now - entry[0], 3)
+            self.max_lag_s = max(self.max_lag_s, self.last_lag_s)
+            self.last_indexed_at = now
+
+    def _flush_loop(self):
+        while not self._stop.wait(0.1):
+            now = time.time()
+            with self._lock:
+                if not self._pending:
+                    continue
+                oldest = min(self._pending.values())
+                if now - self._last_event < self.debounce_s and now - oldest < self.max_delay_s:
+                    continue
+                paths, self._pending = list(self._pending), {}
+            try:
+                job_id = self.submit(self.root_path, paths)
+            except Exception as e:
+                print(f"Watcher for {self.root_path} failed to queue re-index: {e}")
+                continue
+            with self._lock:
+                # A batch merged into an already-queued job keeps the older timestamp
+                previous = self._inflight.get(job_id)
+                first = min(oldest, previous[0]) if previous else oldest
+                count = len(paths) + (previous[1] if previous else 0)
+                self._inflight[job_id] = (first, count)
+                self.batches += 1
+
+    def _scan(self) -> Dict[str, Tuple[int, float]]:
+        return {e.path: (e.size, e.mtime) for e in crawl_entries(self.root_path, self.config)}
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval_s):
+            try:
+                current = self._scan()
+            except Exception as e:
+                print(f"Watcher poll failed for {self.root_path}: {e}")
+                continue
+            changed = [p for p, stat in current.items() if self._snapshot.get(p) != stat]
+            changed.extend(p for p in self._snapshot if p not in current)
+            self._snapshot = current
+            if changed:
+                self.record(changed)
+
+    def status(self) -> dict:
+        with self._lock:
+            now = time.time()
+            oldest = min(self._pending.values()) if self._pending else None
+            inflight_oldest = min((e[0] for e in self._inflight.values()), default=None)
+            waiting_since = min([t for t in (oldest, inflight_oldest) if t is not None], default=None)
+            return {
+                "root_path": self.root_path,
+                "backend": self.backend,
+                "running": self.started_at is not None,
+                "events": self.events,
+                "batches": self.batches,
+                # Paths seen but not yet handed to an index job
+                "queue_depth": len(self._pending),
+                "inflight_jobs": len(self._inflight),
+                "inflight_paths": sum(e[1] for e in self._inflight.values()),
+                # Age of the oldest change not yet reflected in the index
+                "current_lag_s": round(now - waiting_since, 3) if waiting_since else 0.0,
+                "last_lag_s": self.last_lag_s,
+                "max_lag_s": round(self.max_lag_s, 3),
+                "last_indexed_at": self.last_indexed_at
+            }
+
+class WatchManager:
+    """Project watchers by root path; the watched set is saved so watching resumes after a restart."""
+    def __init__(self, submit: SubmitFn, state_path: Optional[str] = None, config: Optional[Settings] = None):
+        self.submit = submit
+        self.state_path = state_path
+        self.config = config or default_settings
+        self._watchers: Dict[str, ProjectWatcher] = {}
+        self._lock = threading.Lock()
+
+    def _save(self):
+        if not self.state_path:
+            return
+        data = {"projects": [
+            {"root_path": w.root_path, "polling": w.backend == "polling"} for w in self._watchers.values()
+        ]}
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.state_path)
+
+    def resume(self):
+        """Restart the watchers that were active when the daemon last stopped."""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                projects = json.load(f).get("projects", [])
+        except Exception as e:
+            print(f"Ignoring unreadable watch state {self.state_path}: {e}")
+            return
+        for p in projects:
+            if os.path.isdir(p["root_path"]):
+                self.watch(p["root_path"], use_polling=p.get("polling", False))
+
+    def watch(self, root_path: str, use_polling: bool = False) -> ProjectWatcher:
+        root_path = os.path.abspath(root_path)
+        with self._lock:
+            watcher = self._watchers.get(root_path)
+            if watcher is None:
+                watcher = ProjectWatcher(root_path, self.submit, self.config, use_polling=use_polling)
+                watcher.start()
+                self._watchers[root_path] = watcher
+                self._save()
+            return watcher
+
+    def unwatch(self, root_path: str) -> bool:
+        with self._lock:
+            watcher = self._watchers.pop(os.path.abspath(root_path), None)
+            if watcher is not None:
+                self._save()
+        if watcher is None:
+            return False
+        watcher.stop()
+        return True
+
+    def get(self, root_path: str) -> Optional[ProjectWatcher]:
+        return self._watchers.get(os.path.abspath(root_path))
+
+    def job_finished(self, root_path: str, job_id: str):
+        watcher = self._watchers.get(root_path)
+        if watcher is not None:
+            watcher.job_finished(job_id)
+
+    def status(self) -> List[dict]:
+        return [w.status() for w in list(self._watchers.values())]
+
+    def stop(self):
+        """Stop all watchers but keep them in the saved state (daemon shutdown)."""
+        with self._lock:
+            watchers = list(self._watchers.values())
+        for watcher in watchers:
+            watcher.stop()
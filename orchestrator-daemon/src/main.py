@@ -1,13 +1,45 @@
+import asyncio
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from src.api.routes import router as api_router
+from src.api.routes import router as api_router, coordinator, index_jobs, project_watchers
+from src.resources import registry
+from src.ollama.async_client import get_async_client
+from src.ollama.catalog import catalog
+from src.ollama.warm_pool import warm_pool
+from src.hardware.sampler import hardware_sampler
+from src.config import settings
+from src.telemetry.tracing import TimingMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the embedding model and vector index in the background so lightweight
+    # routes answer immediately; /ready reports when they are available.
+    registry.warm_up()
+    hardware_sampler.start()
+    await catalog.start()
+    # Load the agents' models now so the first task doesn't wait for them
+    await warm_pool.start(preload=coordinator.agent_models)
+    project_watchers.resume()
+    yield
+    project_watchers.stop()
+    # Cancelled runs keep their old manifest, so nothing is half-recorded
+    await asyncio.to_thread(index_jobs.stop)
+    await warm_pool.stop()
+    await catalog.stop()
+    hardware_sampler.stop()
+    await get_async_client().aclose()
 
 app = FastAPI(
     title="Local AI Orchestrator - Core Daemon",
     description="Privacy-first, hardware-aware local AI orchestration.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
+# Per-route latency histograms and the optional Server-Timing header
+app.add_middleware(TimingMiddleware, server_timing=settings.server_timing)
+
 # Register routes
 app.include_router(api_router)
 
@@ -1,5 +1,6 @@
 from enum import Enum
 from dataclasses import dataclass
+from typing import Tuple
 from ..hardware.detection import HardwareProfile
 
 class ModelTier(str, Enum):
@@ -14,29 +15,36 @@ class ModelRecommendation:
     reasoning: str
     max_memory_usage_gb: float
 
-def select_model_tier(profile: HardwareProfile) -> ModelRecommendation:
-    # Heuristics (Approximate VRAM needs for 4-bit quantization):
-    # Tiny (3B): ~2.5 GB
-    # Small (7B): ~5.5 GB
-    # Medium (13B): ~9.5 GB
-    # Large (32B): ~20.0 GB
-    
+def usable_memory(profile: HardwareProfile, resident_gb: float = 0.0) -> Tuple[float, str]:
+    """
+    (GB free for models, where): free VRAM if there is a usable GPU, else RAM
+    minus an OS reserve. `resident_gb`, held by models that are already
+    loaded, counts as usable too (up to the total), so loading a model does
+    not shrink the capacity computed for it.
+    """
     total_vram = 0.0
+    capacity_vram = 0.0
     # For now, simplistic approach: use total VRAM if consistent, else max of single card.
     # We'll stick to treating VRAM as a pool but be conservative.
     if profile.gpus:
         total_vram = sum(gpu.free_memory_mb for gpu in profile.gpus) / 1024.0
-    
+        capacity_vram = sum(gpu.total_memory_mb for gpu in profile.gpus) / 1024.0
+
     # Reserve 4GB for OS/System if using RAM
-    usable_ram = max(0.0, profile.ram_available_gb - 4.0)
-    
+    usable_ram = max(0.0, min(profile.ram_available_gb + resident_gb, profile.ram_total_gb) - 4.0)
+
     # Prefer GPU
-    if total_vram > 2.0:
-        available_memory = total_vram
-        source = "VRAM"
-    else:
-        available_memory = usable_ram
-        source = "System RAM (Slow)"
+    if total_vram + resident_gb > 2.0 and capacity_vram > 2.0:
+        return min(total_vram + resident_gb, capacity_vram), "VRAM"
+    return usable_ram, "System RAM (Slow)"
+
+def select_model_tier(profile: HardwareProfile, resident_gb: float = 0.0) -> ModelRecommendation:
+    # Heuristics (Approximate VRAM needs for 4-bit quantization):
+    # Tiny (3B): ~2.5 GB
+    # Small (7B): ~5.5 GB
+    # Medium (13B): ~9.5 GB
+    # Large (32B): ~20.0 GB
+    available_memory, source = usable_memory(profile, resident_gb)
     
     if available_memory >= 22.0:
         return ModelRecommendation(ModelTier.LARGE, f"Available {source}: {available_memory:.1f}GB", 20.0)
@@ -0,0 +1,201 @@
+from typing import AsyncIterator, Iterable, List, Optional
+
+import httpx
+
+from .client import (OLLAMA_ERRORS, Completion, CompletionChunk, KeepAlive, OllamaModel, keep_alive_for,
+                     parse_models, parse_stream_line)
+from .completion_cache import completion_key, get_completion_cache
+from .scheduler import generation_scheduler
+from ..config import Settings, settings as default_settings
+
+class AsyncOllamaClient:
+    """
+    Async Ollama client over one shared keep-alive connection pool.
+    Generations go through the generation scheduler, so a burst of
+    requests queues (or is turned away) here instead of piling up inside
+    Ollama.
+    """
+    def __init__(self, config: Optional[Settings] = None):
+        cfg = config or default_settings
+        self.host = cfg.ollama_host
+        self._limits = httpx.Limits(
+            max_connections=cfg.ollama_max_connections,
+            max_keepalive_connections=cfg.ollama_max_connections
+        )
+        self._timeout = httpx.Timeout(cfg.ollama_read_timeout_s, connect=cfg.ollama_connect_timeout_s)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.in_flight = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the server's running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.host, limits=self._limits, timeout=self._timeout)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def is_running(self) -> bool:
+        try:
+            resp = await self.client.get("/", timeout=1.0)
+            return resp.status_code == 200
+        except Exception:
+            return False
+
+    async def list_models(self) -> List[OllamaModel]:
+        try:
+            resp = await self.client.get("/api/tags", timeout=2.0)
+            if resp.status_code != 200:
+                return []
+            return parse_models(resp.json())
+        except Exception:
+            return []
+
+    async def list_running_models(self) -> List[OllamaModel]:
+        try:
+            resp = await self.client.get("/api/ps", timeout=2.0)
+            if resp.status_code != 200:
+                return []
+            return parse_models(resp.json())
+        except Exception:
+            return []
+
+    async def pull_model(self, model: str) -> bool:
+        """Pull a model, waiting for the download to finish."""
+        try:
+            async with self.client.stream("POST", "/api/pull", json={"name": model}, timeout=None) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if line and '"error"' in line:
+                        print(f"Failed to pull model {model}: {line}")
+                        return False
+            return True
+        except Exception as e:
+            print(f"Failed to pull model {model}: {e}")
+            return False
+
+    async def load_model(self, model: str, keep_alive: Optional[KeepAlive] = None) -> bool:
+        """Load a model into memory without generating (a request with no prompt)."""
+        payload = {"model": model}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        try:
+            # Loading a large model from disk can take minutes
+            resp = await self.client.post("/api/generate", json=payload, timeout=None)
+            resp.raise_for_status()
+            return True
+        except Exception as e:
+            print(f"Failed to load model {model}: {e}")
+            return False
+
+    async def unload_model(self, model: str) -> bool:
+        try:
+            resp = await self.client.post("/api/generate", json={"model": model, "keep_alive": 0})
+            resp.raise_for_status()
+            return True
+        except Exception as e:
+            print(f"Failed to unload model {model}: {e}")
+            return False
+
+    async def delete_model(self, model: str) -> bool:
+        try:
+            resp = await self.client.request("DELETE", "/api/delete", json={"name": model})
+            return resp.status_code == 200
+        except Exception as e:
+            print(f"Failed to delete model {model}: {e}")
+            return False
+
+    async def complete(self, model: str, prompt: str, system: str = "", options: Optional[dict] = None,
+                       use_cache: bool = True, sources: Iterable[str] = (),
+                       priority: str = "interactive") -> Completion:
+        """Async counterpart of client.complete."""
+        cache = get_completion_cache() if use_cache else None
+        key = completion_key(model, system, prompt, options)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return Completion(text=cached, cache_hit=True)
+
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False
+        }
+        if system:
+            payload["system"] = system
+        if options:
+            payload["options"] = options
+        keep_alive = keep_alive_for(model)
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+
+        async with generation_scheduler.aslot(model, priority) as slot:
+            queue_wait_ms = round(slot.wait_s * 1000, 1)
+            self.in_flight += 1
+            try:
+                resp = await self.client.post("/api/generate", json=payload)
+                resp.raise_for_status()
+                text = resp.json().get("response", "")
+            except Exception as e:
+                print(f"Ollama generation failed: {e}")
+                OLLAMA_ERRORS.labels("generate").inc()
+                return Completion(text=f"Error responding to prompt: {e}", error=str(e), queue_wait_ms=queue_wait_ms)
+            finally:
+                self.in_flight -= 1
+
+        if cache is not None:
+            cache.put(key, model, text, sources)
+        return Completion(text=text, queue_wait_ms=queue_wait_ms)
+
+    async def generate(self, model: str, prompt: str, system: str = "", options: Optional[dict] = None,
+                       use_cache: bool = True) -> str:
+        return (await self.complete(model, prompt, system, options, use_cache)).text
+
+    async def stream_generate(self, model: str, prompt: str, system: str = "",
+                              priority: str = "interactive") -> AsyncIterator[CompletionChunk]:
+        """Async counterpart of client.stream_completion."""
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True
+        }
+        if system:
+            payload["system"] = system
+        keep_alive = keep_alive_for(model)
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+
+        async with generation_scheduler.aslot(model, priority) as slot:
+            queue_wait_ms = round(slot.wait_s * 1000, 1)
+            self.in_flight += 1
+            try:
+                async with self.client.stream("POST", "/api/generate", json=payload) as resp:
+                    resp.raise_for_status()
+                    async for line in resp.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = parse_stream_line(line)
+                        if chunk.done:
+                            chunk.queue_wait_ms = queue_wait_ms
+                        yield chunk
+                        if chunk.done:
+                            return
+                yield CompletionChunk(done=True, error="Stream ended before generation finished",
+                                      queue_wait_ms=queue_wait_ms)
+            except Exception as e:
+                print(f"Ollama streaming failed: {e}")
+                OLLAMA_ERRORS.labels("stream").inc()
+                yield CompletionChunk(done=True, error=str(e), queue_wait_ms=queue_wait_ms)
+            finally:
+                self.in_flight -= 1
+
+_client: Optional[AsyncOllamaClient] = None
+
+def get_async_client() -> AsyncOllamaClient:
+    global _client
+    if _client is None:
+        _client = AsyncOllamaClient()
+    return _client
@@ -0,0 +1,140 @@
+import time
+import asyncio
+import threading
+from typing import Dict, List, Optional
+
+from .client import OllamaModel, is_ollama_running, list_models, list_running_models, model_context_length
+from .async_client import get_async_client
+from ..config import settings
+
+DEFAULT_MODEL = "llama2"
+
+class ModelCatalog:
+    """
+    In-memory view of Ollama's installed and loaded models. Agents and
+    routes read from here; a background task refreshes it every `ttl_s`,
+    and pull/delete events refresh it immediately.
+    """
+    def __init__(self, ttl_s: float = 30.0):
+        self.ttl_s = ttl_s
+        self.running = False
+        self.refreshed_at = 0.0
+        self._models: List[OllamaModel] = []
+        self._loaded: List[OllamaModel] = []
+        self._context_lengths: Dict[str, Optional[int]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        # Set by invalidate(); cleared by the next refresh
+        self._invalidated = False
+
+    def _apply(self, running: bool, models: List[OllamaModel], loaded: List[OllamaModel]):
+        with self._lock:
+            self.running = running
+            self._models = models if running else []
+            self._loaded = loaded if running else []
+            self.refreshed_at = time.time()
+            self._invalidated = False
+
+    def is_stale(self) -> bool:
+        return self._invalidated or time.time() - self.refreshed_at > self.ttl_s
+
+    async def refresh(self):
+        ollama = get_async_client()
+        running = await ollama.is_running()
+        models, loaded = [], []
+        if running:
+            models, loaded = await asyncio.gather(ollama.list_models(), ollama.list_running_models())
+        self._apply(running, models, loaded)
+
+    def refresh_sync(self):
+        running = is_ollama_running()
+        models = list_models() if running else []
+        loaded = list_running_models() if running else []
+        self._apply(running, models, loaded)
+
+    def _ensure_loaded(self):
+        # Only block when there is nothing to serve yet, or in callers outside
+        # the server (scripts), which never start the refresh task. With the
+        # task running, a stale snapshot is served until it refreshes.
+        if self.refreshed_at == 0.0 or (self._invalidated and self._task is None):
+            self.refresh_sync()
+
+    def models(self) -> List[OllamaModel]:
+        self._ensure_loaded()
+        return list(self._models)
+
+    def loaded_models(self) -> List[OllamaModel]:
+        self._ensure_loaded()
+        return list(self._loaded)
+
+    def default_model(self) -> str:
+        models = self.models()
+        return models[0].name if models else DEFAULT_MODEL
+
+    def context_length(self, model_name: str) -> Optional[int]:
+        """Model's trained context length, fetched once per model and cached."""
+        if model_name in self._context_lengths:
+            return self._context_lengths[model_name]
+        length = model_context_length(model_name)
+        self._context_lengths[model_name] = length
+        return length
+
+    def mark_loaded(self, model_name: str):
+        """Record that a generation just used `model_name`, so Ollama holds it in memory."""
+        with self._lock:
+            if any(m.name == model_name for m in self._loaded):
+                return
+            known = next((m for m in self._models if m.name == model_name), None)
+            self._loaded.append(known or OllamaModel(name=model_name, size_gb=0.0))
+
+    def invalidate(self):
+        """Request an immediate background refresh (e.g. after a pull or delete)."""
+        self._invalidated = True
+        self._context_lengths.clear()
+        if self._wake is not None:
+            self._wake.set()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        # wait_for can swallow a cancel that races with the wake event,
+        # so the loop also checks an explicit flag.
+        self._stopping = True
+        self._wake.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Model catalog refresh failed: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.ttl_s)
+            except asyncio.TimeoutError:
+                pass
+
+    def snapshot(self) -> dict:
+        return {
+            "running": self.running,
+            "refreshed_at": self.refreshed_at,
+            "models": list(self._models),
+            "loaded": list(self._loaded)
+        }
+
+catalog = ModelCatalog(ttl_s=settings.model_catalog_ttl_s)
@@ -1,59 +1,231 @@
+import json
 import requests
 import dataclasses
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+from ..config import settings
+from .completion_cache import completion_key, get_completion_cache
+from .scheduler import generation_scheduler
+from ..telemetry.metrics import metrics
 
-OLLAMA_HOST = "http://127.0.0.1:11434"
+OLLAMA_HOST = settings.ollama_host
+# (connect, read): the read timeout applies between bytes, so between
+# tokens when streaming, not to the whole generation
+GENERATE_TIMEOUT = (settings.ollama_connect_timeout_s, settings.ollama_read_timeout_s)
+
+OLLAMA_ERRORS = metrics.counter("orch_ollama_errors_total", "Failed Ollama generations", ["operation"])
+
+# One keep-alive connection pool for all sync calls
+_session = requests.Session()
+
+KeepAlive = Union[int, str]
+
+# Per-model keep_alive overrides (pinned models stay loaded: -1). Every
+# request that names a model resets its expiry in Ollama, so generations
+# must send the model's policy too, not just the warm pool's loads.
+_keep_alive: Dict[str, KeepAlive] = {}
+
+def set_keep_alive(model: str, value: Optional[KeepAlive]):
+    """Override how long Ollama keeps `model` loaded; None restores the default."""
+    if value is None:
+        _keep_alive.pop(model, None)
+    else:
+        _keep_alive[model] = value
+
+def keep_alive_for(model: str) -> Optional[KeepAlive]:
+    """keep_alive to send with requests for `model`; None leaves Ollama's default."""
+    if model in _keep_alive:
+        return _keep_alive[model]
+    value = settings.ollama_keep_alive.strip()
+    if not value:
+        return None
+    # Ollama reads bare numbers as seconds (-1: forever), strings as durations ("30m")
+    return int(value) if value.lstrip("-").isdigit() else value
 
 @dataclasses.dataclass
 class OllamaModel:
     name: str
     size_gb: float
 
+@dataclasses.dataclass
+class CompletionChunk:
+    token: str = ""
+    done: bool = False
+    # Final chunk only: Ollama's eval counters/durations (nanoseconds)
+    stats: Optional[dict] = None
+    error: Optional[str] = None
+    # Final chunk only: time spent waiting for a generation slot
+    queue_wait_ms: Optional[float] = None
+
+@dataclasses.dataclass
+class Completion:
+    text: str
+    cache_hit: bool = False
+    error: Optional[str] = None
+    queue_wait_ms: float = 0.0
+
 def is_ollama_running() -> bool:
     try:
-        resp = requests.get(f"{OLLAMA_HOST}/", timeout=1.0)
+        resp = _session.get(f"{OLLAMA_HOST}/", timeout=1.0)
         return resp.status_code == 200
     except:
         return False
 
+def parse_models(data: dict) -> List[OllamaModel]:
+    """Parse an /api/tags (or /api/ps) response body."""
+    models = []
+    for m in data.get("models", []):
+        size_bytes = m.get("size", 0)
+        models.append(OllamaModel(
+            name=m.get("name", "unknown"),
+            size_gb=round(size_bytes / (1024**3), 2)
+        ))
+    return models
+
+def parse_stream_line(line) -> CompletionChunk:
+    """Turn one NDJSON line of a streaming /api/generate response into a chunk."""
+    data = json.loads(line)
+    if data.get("error"):
+        return CompletionChunk(done=True, error=data["error"])
+    if data.get("done"):
+        stats = {k: v for k, v in data.items() if k.endswith("_count") or k.endswith("_duration")}
+        return CompletionChunk(token=data.get("response", ""), done=True, stats=stats)
+    return CompletionChunk(token=data.get("response", ""))
+
 def list_models() -> List[OllamaModel]:
     try:
-        resp = requests.get(f"{OLLAMA_HOST}/api/tags", timeout=2.0)
+        resp = _session.get(f"{OLLAMA_HOST}/api/tags", timeout=2.0)
         if resp.status_code != 200:
             return []
-        data = resp.json()
-        models = []
-        for m in data.get("models", []):
-            size_bytes = m.get("size", 0)
-            models.append(OllamaModel(
-                name=m.get("name", "unknown"),
-                size_gb=round(size_bytes / (1024**3), 2)
-            ))
-        return models
+        return parse_models(resp.json())
     except:
         return []
 
-def pull_model_hook(model_name: str) -> bool:
-    # Trigger pull (non-blocking hook for now, just checks if reachable)
-    # Real implementation would spawn a background task
-    return is_ollama_running()
+def list_running_models() -> List[OllamaModel]:
+    """Models currently loaded in Ollama's memory (/api/ps)."""
+    try:
+        resp = _session.get(f"{OLLAMA_HOST}/api/ps", timeout=2.0)
+        if resp.status_code != 200:
+            return []
+        return parse_models(resp.json())
+    except:
+        return []
+
+def parse_context_length(data: dict) -> Optional[int]:
+    """Trained context length from an /api/show body (model_info["<arch>.context_length"])."""
+    for key, value in (data.get("model_info") or {}).items():
+        if key.endswith(".context_length") and isinstance(value, int):
+            return value
+    return None
+
+def model_context_length(model: str) -> Optional[int]:
+    try:
+        resp = _session.post(f"{OLLAMA_HOST}/api/show", json={"name": model}, timeout=2.0)
+        if resp.status_code != 200:
+            return None
+        return parse_context_length(resp.json())
+    except:
+        return None
+
+def pull_model(model_name: str) -> bool:
+    """Pull a model, blocking until the download finishes."""
+    try:
+        with _session.post(f"{OLLAMA_HOST}/api/pull", json={"name": model_name}, stream=True,
+                           timeout=(settings.ollama_connect_timeout_s, None)) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if line and b'"error"' in line:
+                    print(f"Failed to pull model {model_name}: {line.decode(errors='replace')}")
+                    return False
+        return True
+    except Exception as e:
+        print(f"Failed to pull model {model_name}: {e}")
+        return False
 
-def generate_completion(model: str, prompt: str, system: str = "") -> str:
+def complete(model: str, prompt: str, system: str = "", options: Optional[dict] = None,
+             use_cache: bool = True, sources: Iterable[str] = (), priority: str = "interactive") -> Completion:
+    """
+    Generates a completion from Ollama, answering from the completion cache
+    when the same (model, system, prompt, options) was generated before.
+    `sources` are the files the prompt's context came from; re-indexing
+    their project invalidates the cached answer. Generations wait for a
+    scheduler slot; raises GenerationRejected when the queue is full.
+    """
+    cache = get_completion_cache() if use_cache else None
+    key = completion_key(model, system, prompt, options)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return Completion(text=cached, cache_hit=True)
+
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": False
+    }
+    if system:
+        payload["system"] = system
+    if options:
+        payload["options"] = options
+    keep_alive = keep_alive_for(model)
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+
+    with generation_scheduler.slot(model, priority) as slot:
+        queue_wait_ms = round(slot.wait_s * 1000, 1)
+        try:
+            resp = _session.post(f"{OLLAMA_HOST}/api/generate", json=payload, timeout=GENERATE_TIMEOUT)
+            resp.raise_for_status()
+            text = resp.json().get("response", "")
+        except Exception as e:
+            print(f"Ollama generation failed: {e}")
+            OLLAMA_ERRORS.labels("generate").inc()
+            return Completion(text=f"Error responding to prompt: {e}", error=str(e), queue_wait_ms=queue_wait_ms)
+
+    if cache is not None:
+        cache.put(key, model, text, sources)
+    return Completion(text=text, queue_wait_ms=queue_wait_ms)
+
+def generate_completion(model: str, prompt: str, system: str = "", options: Optional[dict] = None,
+                        use_cache: bool = True) -> str:
     """
     Generates a completion from Ollama.
     """
-    try:
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "stream": False
-        }
-        if system:
-            payload["system"] = system
-            
-        resp = requests.post(f"{OLLAMA_HOST}/api/generate", json=payload, timeout=60.0)
-        resp.raise_for_status()
-        return resp.json().get("response", "")
-    except Exception as e:
-        print(f"Ollama generation failed: {e}")
-        return f"Error responding to prompt: {e}"
+    return complete(model, prompt, system, options, use_cache).text
+
+def stream_completion(model: str, prompt: str, system: str = "",
+                      priority: str = "interactive") -> Iterator[CompletionChunk]:
+    """
+    Streams a completion from Ollama token by token. The last chunk has
+    done=True and carries the generation stats (or an error).
+    """
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": True
+    }
+    if system:
+        payload["system"] = system
+    keep_alive = keep_alive_for(model)
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+
+    with generation_scheduler.slot(model, priority) as slot:
+        queue_wait_ms = round(slot.wait_s * 1000, 1)
+        try:
+            with _session.post(f"{OLLAMA_HOST}/api/generate", json=payload, stream=True,
+                               timeout=GENERATE_TIMEOUT) as resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if not line:
+                        continue
+                    chunk = parse_stream_line(line)
+                    if chunk.done:
+                        chunk.queue_wait_ms = queue_wait_ms
+                    yield chunk
+                    if chunk.done:
+                        return
+            yield CompletionChunk(done=True, error="Stream ended before generation finished", queue_wait_ms=queue_wait_ms)
+        except Exception as e:
+            print(f"Ollama streaming failed: {e}")
+            OLLAMA_ERRORS.labels("stream").inc()
+            yield CompletionChunk(done=True, error=str(e), queue_wait_ms=queue_wait_ms)
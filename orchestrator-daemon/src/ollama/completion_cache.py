@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Iterable, Optional
+
+from ..config import settings
+
+def completion_key(model: str, system: str, prompt: str, options: Optional[dict] = None) -> str:
+    payload = json.dumps([model, system or "", prompt, options or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8", errors="surrogatepass"), digest_size=16).hexdigest()
+
+class CompletionCache:
+    """
+    On-disk cache of finished generations keyed by completion_key(). Entries
+    expire after `ttl_s` and the table is bounded by size with LRU eviction.
+    Each entry remembers the files its prompt context came from, so
+    re-indexing a project can drop the answers built on it.
+    """
+    def __init__(self, path: str, max_mb: float = 64.0, ttl_s: float = 86400.0):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS completion_sources (
+                key TEXT NOT NULL,
+                path TEXT NOT NULL,
+                PRIMARY KEY (key, path)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_lru ON completions(last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completion_sources_path ON completion_sources(path)")
+        self._conn.commit()
+        self._recount()
+
+    def _recount(self):
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM completions").fetchone()
+        self._bytes, self._entries = row[0], row[1]
+
+    def _delete_keys(self, where: str, params: tuple):
+        """Delete completions (and their sources) selected by `where`. Caller holds the lock."""
+        keys = [r[0] for r in self._conn.execute(f"SELECT key FROM completions WHERE {where}", params)]
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            marks = ",".join("?" * len(part))
+            self._conn.execute(f"DELETE FROM completions WHERE key IN ({marks})", part)
+            self._conn.execute(f"DELETE FROM completion_sources WHERE key IN ({marks})", part)
+        return len(keys)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_s:
+                self._delete_keys("key = ?", (key,))
+                self._recount()
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str, sources: Iterable[str] = ()):
+        now = time.time()
+        size = len(response.encode("utf-8", errors="surrogatepass")) + len(key)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._delete_keys("key = ?", (key,))
+                self._bytes -= old[0]
+                self._entries -= 1
+            self._conn.execute(
+                "INSERT INTO completions (key, model, response, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now)
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO completion_sources (key, path) VALUES (?, ?)",
+                [(key, os.path.abspath(p)) for p in sources]
+            )
+            self._bytes += size
+            self._entries += 1
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired rows, then least-recently-used ones until 90% of the cap. Caller holds the lock."""
+        self._delete_keys("created < ?", (time.time() - self.ttl_s,))
+        self._recount()
+        target = int(self.max_bytes * 0.9)
+        while self._bytes > target and self._entries > 0:
+            batch = max(1, self._entries // 10)
+            self._delete_keys("key IN (SELECT key FROM completions ORDER BY last_used LIMIT ?)", (batch,))
+            self._recount()
+
+    def invalidate_project(self, root_path: str) -> int:
+        """Drop every completion whose context came from a file under `root_path`."""
+        root = os.path.abspath(root_path)
+        prefix = root.rstrip(os.sep) + os.sep
+        with self._lock:
+            removed = self._delete_keys(
+                "key IN (SELECT key FROM completion_sources WHERE path = ? OR substr(path, 1, ?) = ?)",
+                (root, len(prefix), prefix)
+            )
+            if removed:
+                self._recount()
+            self._conn.commit()
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.execute("DELETE FROM completion_sources")
+            self._recount()
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "entries": self._entries,
+            "size_mb": round(self._bytes / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "ttl_s": self.ttl_s
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_cache: Optional[CompletionCache] = None
+_cache_lock = threading.Lock()
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    """Process-wide completion cache, or None when disabled (completion_cache_max_mb=0)."""
+    global _cache
+    if not settings.completion_cache_max_mb:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CompletionCache(
+                    os.path.join(settings.vector_db_path, "completion_cache.sqlite"),
+                    settings.completion_cache_max_mb,
+                    settings.completion_cache_ttl_s
+                )
+    return _cache
@@ -0,0 +1,318 @@
+import math
+import time
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from ..config import Settings, settings as default_settings
+from ..hardware.sampler import hardware_sampler
+from ..models.selection import select_model_tier, usable_memory
+from ..telemetry.metrics import metrics
+from ..telemetry.tracing import span
+
+# Interactive requests (the UI) always go before batch ones (scripts)
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+# Generations one model serves at once, by hardware tier: KV cache for
+# parallel requests has to fit next to the weights.
+TIER_SLOTS = {"Tiny (1-3B)": 1, "Small (7B)": 2, "Medium (13B)": 4, "Large (32B)": 6}
+
+GENERATION_QUEUE_SECONDS = metrics.histogram(
+    "orch_generation_queue_wait_seconds", "Time generations waited for a slot", ["priority"])
+GENERATIONS_REJECTED = metrics.counter(
+    "orch_generations_rejected_total", "Generations refused because the queue was full or the wait too long",
+    ["priority", "reason"])
+
+class GenerationRejected(Exception):
+    """The scheduler is saturated; retry after `retry_after_s`."""
+    def __init__(self, message: str, retry_after_s: int):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+@dataclass
+class GenerationSlot:
+    model: str
+    priority: str
+    wait_s: float = 0.0
+
+@dataclass
+class _Memory:
+    """Catalog and hardware state, read before taking the scheduler lock."""
+    loaded: Set[str]
+    sizes: Dict[str, float]
+    free_gb: float
+
+class _Waiter:
+    __slots__ = ("model", "priority", "rank", "seq", "granted", "_event", "_loop", "_future")
+
+    def __init__(self, model: str, priority: str, seq: int, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.model = model
+        self.priority = priority
+        self.rank = PRIORITIES[priority]
+        self.seq = seq
+        self.granted = False
+        self._loop = loop
+        if loop is None:
+            self._event = threading.Event()
+        else:
+            self._future = loop.create_future()
+
+    def grant(self):
+        """Caller holds the scheduler lock."""
+        self.granted = True
+        if self._loop is None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self._future.done():
+            self._future.set_result(None)
+
+class GenerationScheduler:
+    """
+    Admission control in front of Ollama. A generation runs only when its
+    model has a free slot (per-model limit from the hardware tier, counting
+    memory held by loaded models as available), the
+    total stays under ollama_max_concurrent_generations, and a model that
+    is not loaded yet fits in free memory. Otherwise it waits in a bounded
+    per-priority queue; interactive waiters always go first. A full queue,
+    or a wait longer than the priority's limit, raises GenerationRejected
+    with a Retry-After estimate instead of letting latency grow unbounded.
+    Works from both threads (slot) and coroutines (aslot).
+    """
+    def __init__(self, config: Optional[Settings] = None):
+        self.config = config or default_settings
+        self._lock = threading.Lock()
+        self._running: Dict[str, int] = {}
+        self._waiters: List[_Waiter] = []
+        self._seq = 0
+        self._limit: Optional[int] = None
+        self._limit_at = 0.0
+        # Moving average of how long a generation holds its slot
+        self._avg_hold_s = 5.0
+        self.admitted = 0
+        self.rejected = 0
+
+    # -- policy -------------------------------------------------------------
+
+    def per_model_limit(self) -> int:
+        """Concurrent generations per model; refreshed with the hardware samples."""
+        if self.config.generation_slots_per_model > 0:
+            return self.config.generation_slots_per_model
+        now = time.monotonic()
+        if self._limit is None or now - self._limit_at > self.config.hardware_sample_interval_s:
+            # Loaded models' memory counts: the tier must not drop once they are resident
+            resident_gb = sum(m.size_gb for m in _catalog().snapshot()["loaded"])
+            tier = select_model_tier(hardware_sampler.smoothed_profile(), resident_gb).tier
+            self._limit = max(1, min(TIER_SLOTS.get(tier.value, 1), self.config.ollama_max_concurrent_generations))
+            self._limit_at = now
+        return self._limit
+
+    def _memory(self) -> _Memory:
+        """
+        Read before taking the lock, so admission never waits on the catalog
+        or the sampler; refreshes the cached per-model limit on the way.
+        """
+        snapshot = _catalog().snapshot()
+        self.per_model_limit()
+        free_gb, _ = usable_memory(hardware_sampler.smoothed_profile())
+        return _Memory({m.name for m in snapshot["loaded"]},
+                       {m.name: m.size_gb for m in snapshot["models"]}, free_gb)
+
+    def _fits_in_memory(self, model: str, memory: _Memory) -> bool:
+        """A model that is not loaded needs its size in free memory, plus headroom."""
+        if model in memory.loaded:
+            return True
+        size_gb = memory.sizes.get(model, 0.0)
+        if not size_gb:
+            return True
+        return memory.free_gb >= size_gb + self.config.generation_memory_headroom_gb
+
+    def _can_run(self, model: str, memory: _Memory) -> bool:
+        """Caller holds the lock."""
+        total = sum(self._running.values())
+        if total >= self.config.ollama_max_concurrent_generations:
+            return False
+        if self._running.get(model, 0) >= self.per_model_limit():
+            return False
+        # With nothing running, let Ollama swap models rather than wait forever
+        return total == 0 or self._running.get(model, 0) > 0 or self._fits_in_memory(model, memory)
+
+    def _queue_limit(self, priority: str) -> int:
+        if priority == "interactive":
+            return self.config.generation_queue_interactive
+        return self.config.generation_queue_batch
+
+    def _max_wait_s(self, priority: str) -> float:
+        if priority == "interactive":
+            return self.config.generation_max_wait_interactive_s
+        return self.config.generation_max_wait_batch_s
+
+    def _retry_after(self, queued: int) -> int:
+        """Seconds until a slot is likely free for a request behind `queued` others."""
+        slots = max(1, self.per_model_limit())
+        return max(1, math.ceil(self._avg_hold_s * (queued + 1) / slots))
+
+    # -- bookkeeping (caller holds the lock) --------------------------------
+
+    def _enqueue(self, model: str, priority: str, memory: _Memory, loop=None) -> Optional[_Waiter]:
+        """None if the slot was granted right away; raises when the queue is full."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {sorted(PRIORITIES)}")
+        ahead = [w for w in self._waiters if w.rank <= PRIORITIES[priority]]
+        # Waiters for other models are held back by their own model's limit
+        # or by memory, never by a free global slot, so they can be overtaken
+        if not any(w.model == model for w in ahead) and self._can_run(model, memory):
+            self._running[model] = self._running.get(model, 0) + 1
+            self.admitted += 1
+            return None
+        queued = sum(1 for w in self._waiters if w.priority == priority)
+        if queued >= self._queue_limit(priority):
+            self._reject(priority, "queue_full")
+            raise GenerationRejected(f"Generation queue for {priority} requests is full",
+                                     self._retry_after(len(ahead)))
+        self._seq += 1
+        waiter = _Waiter(model, priority, self._seq, loop)
+        self._waiters.append(waiter)
+        self._waiters.sort(key=lambda w: (w.rank, w.seq))
+        return waiter
+
+    def _dispatch(self, memory: _Memory):
+        """Grant slots to waiters in priority order while they can run."""
+        for waiter in list(self._waiters):
+            if self._can_run(waiter.model, memory):
+                self._waiters.remove(waiter)
+                self._running[waiter.model] = self._running.get(waiter.model, 0) + 1
+                self.admitted += 1
+                waiter.grant()
+            elif sum(self._running.values()) >= self.config.ollama_max_concurrent_generations:
+                break
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Drop a waiter that gave up. True if it had been granted meanwhile (caller must release)."""
+        if waiter.granted:
+            return True
+        self._waiters.remove(waiter)
+        return False
+
+    def _reject(self, priority: str, reason: str):
+        self.rejected += 1
+        GENERATIONS_REJECTED.labels(priority, reason).inc()
+
+    def _release(self, model: str, held_s: float):
+        memory = self._memory()
+        with self._lock:
+            self._running[model] -= 1
+            if not self._running[model]:
+                del self._running[model]
+            self._avg_hold_s = 0.8 * self._avg_hold_s + 0.2 * held_s
+            self._dispatch(memory)
+
+    # -- public API -----------------------------------------------------------
+
+    def slot(self, model: str, priority: str = "interactive") -> "_SyncSlot":
+        """`with scheduler.slot(model) as slot:` from a thread."""
+        return _SyncSlot(self, model, priority)
+
+    def aslot(self, model: str, priority: str = "interactive") -> "_AsyncSlot":
+        """`async with scheduler.aslot(model) as slot:` from a coroutine."""
+        return _AsyncSlot(self, model, priority)
+
+    def running(self, model: str) -> int:
+        """Generations of `model` holding a slot right now."""
+        with self._lock:
+            return self._running.get(model, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            queued = {p: sum(1 for w in self._waiters if w.priority == p) for p in PRIORITIES}
+            return {
+                "running": dict(self._running),
+                "queued": queued,
+                "per_model_limit": self.per_model_limit(),
+                "max_concurrent": self.config.ollama_max_concurrent_generations,
+                "avg_generation_s": round(self._avg_hold_s, 2),
+                "admitted": self.admitted,
+                "rejected": self.rejected
+            }
+
+class _SyncSlot:
+    def __init__(self, scheduler: GenerationScheduler, model: str, priority: str):
+        self.scheduler = scheduler
+        self.slot = GenerationSlot(model, priority)
+        self._granted_at = 0.0
+
+    def __enter__(self) -> GenerationSlot:
+        s, slot = self.scheduler, self.slot
+        start = time.perf_counter()
+        with span("queue_wait"):
+            memory = s._memory()
+            with s._lock:
+                waiter = s._enqueue(slot.model, slot.priority, memory)
+            if waiter is not None and not waiter._event.wait(s._max_wait_s(slot.priority)):
+                with s._lock:
+                    if not s._abandon(waiter):
+                        s._reject(slot.priority, "timeout")
+                        raise GenerationRejected(f"Waited {s._max_wait_s(slot.priority):.0f}s for a generation slot",
+                                                 s._retry_after(len(s._waiters)))
+        self._granted_at = time.perf_counter()
+        slot.wait_s = self._granted_at - start
+        GENERATION_QUEUE_SECONDS.labels(slot.priority).observe(slot.wait_s)
+        return slot
+
+    def __exit__(self, exc_type, exc, tb):
+        self.scheduler._release(self.slot.model, time.perf_counter() - self._granted_at)
+        return False
+
+class _AsyncSlot:
+    def __init__(self, scheduler: GenerationScheduler, model: str, priority: str):
+        self.scheduler = scheduler
+        self.slot = GenerationSlot(model, priority)
+        self._granted_at = 0.0
+
+    async def __aenter__(self) -> GenerationSlot:
+        s, slot = self.scheduler, self.slot
+        start = time.perf_counter()
+        with span("queue_wait"):
+            memory = s._memory()
+            with s._lock:
+                waiter = s._enqueue(slot.model, slot.priority, memory, asyncio.get_running_loop())
+            if waiter is not None:
+                await self._wait(waiter)
+        self._granted_at = time.perf_counter()
+        slot.wait_s = self._granted_at - start
+        GENERATION_QUEUE_SECONDS.labels(slot.priority).observe(slot.wait_s)
+        return slot
+
+    async def _wait(self, waiter: _Waiter):
+        s, priority = self.scheduler, self.slot.priority
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter._future), s._max_wait_s(priority))
+        except asyncio.TimeoutError:
+            with s._lock:
+                if waiter.granted:
+                    return
+                s._abandon(waiter)
+                s._reject(priority, "timeout")
+                raise GenerationRejected(f"Waited {s._max_wait_s(priority):.0f}s for a generation slot",
+                                         s._retry_after(len(s._waiters)))
+        except asyncio.CancelledError:
+            # Client went away while queued; hand a slot granted meanwhile back
+            with s._lock:
+                granted = s._abandon(waiter)
+            if granted:
+                s._release(waiter.model, 0.0)
+            raise
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.scheduler._release(self.slot.model, time.perf_counter() - self._granted_at)
+        return False
+
+def _catalog():
+    # Imported late: the catalog imports the clients, which import this module
+    from .catalog import catalog
+    return catalog
+
+generation_scheduler = GenerationScheduler()
@@ -0,0 +1,236 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional, Set
+
+from .async_client import get_async_client
+from .catalog import catalog
+from .client import keep_alive_for, set_keep_alive
+from .scheduler import generation_scheduler
+from ..config import Settings, settings as default_settings
+from ..hardware.sampler import hardware_sampler
+from ..models.selection import select_model_tier
+
+class WarmPool:
+    """
+    Keeps the models the agents use resident in Ollama. Models are preloaded
+    at startup, so the first task doesn't pay the load time, and tracked in
+    least-recently-used order with their sizes. When the resident total would
+    exceed the memory budget (unless configured, the tier's
+    max_memory_usage_gb, counting resident models as available), the least
+    recently used model that is neither pinned nor generating is unloaded.
+    Pinned models never expire or get evicted.
+    """
+    def __init__(self, config: Optional[Settings] = None):
+        self.config = config or default_settings
+        # name -> size_gb, least recently used first
+        self._resident: "OrderedDict[str, float]" = OrderedDict()
+        self._pinned: Set[str] = set()
+        self._lock = threading.Lock()
+        self._preload: Callable[[], Iterable[str]] = lambda: ()
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+        self.loads = 0
+        self.evictions = 0
+
+    def budget_gb(self) -> float:
+        if self.config.warm_pool_budget_gb > 0:
+            return self.config.warm_pool_budget_gb
+        # The resident models' memory is not free, but it is the pool's to
+        # spend: without it every load would shrink the budget and evict
+        profile = hardware_sampler.smoothed_profile()
+        return select_model_tier(profile, self.used_gb()).max_memory_usage_gb
+
+    def used_gb(self) -> float:
+        with self._lock:
+            return sum(self._resident.values())
+
+    def _size(self, model: str) -> float:
+        """Resident size if Ollama reports it (includes the KV cache), else the size on disk."""
+        snapshot = catalog.snapshot()
+        for m in snapshot["loaded"] + snapshot["models"]:
+            if m.name == model and m.size_gb:
+                return m.size_gb
+        return 0.0
+
+    def touch(self, model: str):
+        """Record a use of `model` (it is loaded now); safe to call from any thread."""
+        catalog.mark_loaded(model)
+        size, budget = self._size(model), self.budget_gb()
+        with self._lock:
+            if model in self._resident:
+                self._resident.move_to_end(model)
+            else:
+                self._resident[model] = size
+            over = sum(self._resident.values()) > budget
+        if over and self._loop is not None:
+            # Evict from the pool's own task, never on the caller's request path
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _sync(self):
+        """Reconcile with what Ollama actually holds; it unloads idle models on its own."""
+        loaded = {m.name: m.size_gb for m in catalog.snapshot()["loaded"]}
+        with self._lock:
+            for name in list(self._resident):
+                if name not in loaded:
+                    del self._resident[name]
+            for name, size in loaded.items():
+                if name in self._resident:
+                    self._resident[name] = size or self._resident[name]
+                else:
+                    # Loaded behind our back: oldest, first to go
+                    self._resident[name] = size
+                    self._resident.move_to_end(name, last=False)
+
+    def _victims(self, need_gb: float = 0.0, keep: Optional[str] = None) -> List[str]:
+        """Least recently used models to unload so `need_gb` more fits in the budget."""
+        budget = self.budget_gb()
+        victims = []
+        with self._lock:
+            used = sum(size for name, size in self._resident.items() if name != keep)
+            for name, size in self._resident.items():
+                if used + need_gb <= budget:
+                    break
+                if name == keep or name in self._pinned or generation_scheduler.running(name):
+                    continue
+                victims.append(name)
+                used -= size
+        return victims
+
+    async def _evict(self, models: List[str]):
+        ollama = get_async_client()
+        for name in models:
+            if await ollama.unload_model(name):
+                with self._lock:
+                    self._resident.pop(name, None)
+                self.evictions += 1
+                print(f"Warm pool: unloaded {name} (least recently used, over {self.budget_gb():.1f}GB budget)")
+        if models:
+            catalog.invalidate()
+
+    async def load(self, model: str) -> bool:
+        """Make `model` resident, evicting least recently used models to make room."""
+        await self._evict(self._victims(self._size(model), keep=model))
+        if not await get_async_client().load_model(model, keep_alive_for(model)):
+            return False
+        self.loads += 1
+        self.touch(model)
+        return True
+
+    async def pin(self, model: str) -> bool:
+        """Load `model` (pulling it first if it isn't installed) and keep it loaded until unpinned."""
+        if not any(m.name == model for m in catalog.snapshot()["models"]):
+            if not await get_async_client().pull_model(model):
+                return False
+            await catalog.refresh()
+        with self._lock:
+            self._pinned.add(model)
+        set_keep_alive(model, -1)
+        if not await self.load(model):
+            await self.unpin(model)
+            return False
+        return True
+
+    async def unpin(self, model: str) -> bool:
+        """Return `model` to normal keep-alive and LRU eviction; False if it wasn't pinned."""
+        with self._lock:
+            if model not in self._pinned:
+                return False
+            self._pinned.discard(model)
+            resident = model in self._resident
+        set_keep_alive(model, None)
+        if resident:
+            # Replace Ollama's "forever" with the default expiry
+            await get_async_client().load_model(model, keep_alive_for(model))
+        return True
+
+    def forget(self, model: str):
+        """Drop a deleted model from the pool."""
+        with self._lock:
+            self._resident.pop(model, None)
+            self._pinned.discard(model)
+        set_keep_alive(model, None)
+
+    async def preload(self):
+        """Load the agents' models (and any configured extras) that fit in the budget."""
+        if catalog.is_stale():
+            await catalog.refresh()
+        if not catalog.running:
+            return
+        self._sync()
+        extra = [m.strip() for m in self.config.warm_pool_models.split(",") if m.strip()]
+        installed = {m.name for m in catalog.snapshot()["models"]}
+        for model in dict.fromkeys([*self._preload(), *extra]):
+            if model not in installed:
+                print(f"Warm pool: {model} is not installed, not preloading")
+                continue
+            with self._lock:
+                if model in self._resident:
+                    continue
+            if self.used_gb() + self._size(model) > self.budget_gb():
+                print(f"Warm pool: {model} does not fit in the {self.budget_gb():.1f}GB budget, not preloading")
+                continue
+            if await self.load(model):
+                print(f"Warm pool: preloaded {model}")
+
+    async def start(self, preload: Optional[Callable[[], Iterable[str]]] = None):
+        """`preload` returns the models to load at startup (called once Ollama's models are known)."""
+        if self._task is not None:
+            return
+        if preload is not None:
+            self._preload = preload
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+
+    async def _run(self):
+        if self.config.warm_pool_preload:
+            try:
+                await self.preload()
+            except Exception as e:
+                print(f"Warm pool preload failed: {e}")
+        while not self._stopping:
+            try:
+                if catalog.is_stale():
+                    await catalog.refresh()
+                self._sync()
+                await self._evict(self._victims())
+            except Exception as e:
+                print(f"Warm pool maintenance failed: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=catalog.ttl_s)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            resident = [{"name": name, "size_gb": size, "pinned": name in self._pinned}
+                        for name, size in self._resident.items()]
+            pinned = sorted(self._pinned)
+        return {
+            "budget_gb": round(self.budget_gb(), 2),
+            "used_gb": round(sum(m["size_gb"] for m in resident), 2),
+            "resident": resident,  # least recently used first
+            "pinned": pinned,
+            "loads": self.loads,
+            "evictions": self.evictions
+        }
+
+warm_pool = WarmPool()
@@ -0,0 +1,110 @@
+import os
+import time
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from .config import Settings, settings as default_settings
+
+@dataclass
+class ResourceState:
+    status: str = "cold"  # cold | loading | ready | failed
+    load_s: Optional[float] = None
+    error: Optional[str] = None
+
+class ResourceRegistry:
+    """
+    Process-wide owner of the heavy resources (embedding model, per-project
+    vector stores). Each is created once, on first use or by the
+    background warm-up, so importing the API does not load torch.
+    """
+    def __init__(self, config: Optional[Settings] = None):
+        self.config = config or default_settings
+        self._instances: Dict[str, Any] = {}
+        self._states: Dict[str, ResourceState] = {
+            "embedding_model": ResourceState(),
+            "projects": ResourceState(),
+        }
+        self._locks = {name: threading.Lock() for name in self._states}
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited
+            if name in self._instances:
+                return self._instances[name]
+            state = self._states[name]
+            state.status = "loading"
+            start = time.perf_counter()
+            try:
+                instance = factory()
+            except Exception as e:
+                state.status = "failed"
+                state.error = str(e)
+                raise
+            state.load_s = round(time.perf_counter() - start, 3)
+            state.status = "ready"
+            state.error = None
+            self._instances[name] = instance
+            return instance
+
+    def loaded(self, name: str) -> Optional[Any]:
+        """The resource if it has finished loading, without triggering a load."""
+        return self._instances.get(name)
+
+    def embedding_model(self):
+        from .vector.embedder import load_embedding_model
+        return self._get("embedding_model", lambda: load_embedding_model(self.config.embedding_model))
+
+    def projects(self):
+        """Per-project vector stores sharing one embedder (see src/vector/projects.py)."""
+        def _create():
+            from .vector.embedder import Embedder
+            from .vector.index import create_chroma_client
+            from .vector.projects import ProjectStores
+            embedder = Embedder(
+                self.embedding_model(),
+                os.path.join(self.config.vector_db_path, "embedding_cache.sqlite"),
+                self.config.embedding_cache_max_mb,
+                batch_window_ms=self.config.query_batch_window_ms,
+                batch_max_size=self.config.query_batch_max_size,
+                model_name=self.config.embedding_model
+            )
+            client = None
+            if self.config.vector_backend == "chroma":
+                # One client for every project's collection
+                client = create_chroma_client(self.config.vector_db_path)
+            return ProjectStores(embedder, self.config, client)
+        return self._get("projects", _create)
+
+    def warm_up(self) -> threading.Thread:
+        """Load everything on a background thread; safe to call repeatedly."""
+        if self._warmup_thread is not None:
+            return self._warmup_thread
+
+        def _run():
+            try:
+                self.projects()
+            except Exception as e:
+                print(f"Resource warm-up failed: {e}")
+
+        self._warmup_thread = threading.Thread(target=_run, name="resource-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    def is_ready(self) -> bool:
+        return all(s.status == "ready" for s in self._states.values())
+
+    def status(self) -> dict:
+        return {
+            "ready": self.is_ready(),
+            "resources": {
+                name: {"status": s.status, "load_s": s.load_s, "error": s.error}
+                for name, s in self._states.items()
+            }
+        }
+
+registry = ResourceRegistry()
@@ -0,0 +1,85 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import metrics
+
+SPAN_SECONDS = metrics.histogram(
+    "orch_span_duration_seconds", "Time spent in each instrumented stage of a request", ["span"])
+HTTP_SECONDS = metrics.histogram(
+    "orch_http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"])
+
+# Spans finished so far in the current request; None outside a request.
+# asyncio.to_thread and Starlette's threadpool copy the context, so spans
+# recorded in worker threads land in the same list.
+_trace: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("orch_trace", default=None)
+
+class Span:
+    """Times a `with` block into the span histogram and the request trace."""
+    __slots__ = ("name", "_observe", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._observe = SPAN_SECONDS.labels(name).observe
+
+    def __enter__(self) -> "Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        self._observe(elapsed)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((self.name, elapsed))
+        return False
+
+def span(name: str) -> Span:
+    return Span(name)
+
+def server_timing(trace: List[Tuple[str, float]], total_s: float) -> str:
+    """Server-Timing header value; repeated spans are summed, in first-seen order."""
+    totals: Dict[str, float] = {}
+    for name, elapsed in trace:
+        totals[name] = totals.get(name, 0.0) + elapsed
+    totals["total"] = total_s
+    return ", ".join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in totals.items())
+
+class TimingMiddleware:
+    """
+    ASGI middleware: records per-route request latency and collects the
+    request's spans; with `server_timing` they are also sent back in a
+    Server-Timing header. For streaming responses the header only covers
+    the work done before the first byte.
+    """
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace: List[Tuple[str, float]] = []
+        token = _trace.set(trace)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = server_timing(trace, time.perf_counter() - start)
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _trace.reset(token)
+            # Route templates, not raw paths, keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_SECONDS.labels(scope["method"], route, status).observe(time.perf_counter() - start)
@@ -0,0 +1,110 @@
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+class EmbeddingBatcher:
+    """
+    Coalesces single-text encode requests from concurrent callers into one
+    model call. A worker thread waits for the first request, then keeps
+    collecting for `window_ms` (or until `max_batch` texts are queued) and
+    encodes the whole batch at once. Sync callers block on a future; async
+    callers await it without tying up the event loop.
+    """
+    def __init__(self, encode: Callable[[List[str]], List[List[float]]],
+                 window_ms: float = 3.0, max_batch: int = 32):
+        self._encode = encode
+        self.window_s = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[Tuple[str, float, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.max_batch_seen = 0
+        self.queue_wait_s = 0.0
+        self.max_queue_wait_s = 0.0
+        self.encode_s = 0.0
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, time.perf_counter(), future))
+        return future
+
+    def pending(self) -> int:
+        """Requests waiting for the next batch."""
+        return self._queue.qsize()
+
+    def encode(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    async def aencode(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _collect(self) -> List[Tuple[str, float, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Drain whatever is already queued even once the window is up
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Skip callers that gave up (e.g. a cancelled request) while queued
+            batch = [item for item in self._collect() if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            # Identical concurrent queries are encoded once
+            unique: Dict[str, int] = {}
+            for text, _, _ in batch:
+                unique.setdefault(text, len(unique))
+            try:
+                vectors = self._encode(list(unique))
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for text, _, future in batch:
+                future.set_result(vectors[unique[text]])
+
+            waits = [started - enqueued for _, enqueued, _ in batch]
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.max_batch_seen = max(self.max_batch_seen, len(batch))
+                self.queue_wait_s += sum(waits)
+                self.max_queue_wait_s = max(self.max_queue_wait_s, max(waits))
+                self.encode_s += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "window_ms": round(self.window_s * 1000, 2),
+                "max_batch": self.max_batch,
+                "batches": self.batches,
+                "requests": self.requests,
+                "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_seen,
+                "avg_queue_wait_ms": round(self.queue_wait_s / self.requests * 1000, 2) if self.requests else 0.0,
+                "max_queue_wait_ms": round(self.max_queue_wait_s * 1000, 2),
+                "avg_encode_ms": round(self.encode_s / self.batches * 1000, 2) if self.batches else 0.0,
+                "queued": self._queue.qsize()
+            }
@@ -0,0 +1,118 @@
+import re
+import hashlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .embedding_cache import EmbeddingCache, content_hash
+from .query_cache import LRUCache
+from .batcher import EmbeddingBatcher
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+# Model name that selects HashingEmbeddingModel instead of downloading weights
+HASHING_MODEL = 'hash'
+
+_TOKEN = re.compile(r"[A-Za-z][a-z]*|[0-9]+")
+
+class HashingEmbeddingModel:
+    """
+    Offline stand-in for a SentenceTransformer: each word (identifiers are
+    split on case and underscores) is hashed to a signed dimension. Texts
+    sharing words get similar vectors, which is enough for benchmarks and
+    machines without the MiniLM weights, but it is not a semantic model.
+    """
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self._slots: Dict[str, tuple] = {}
+
+    def _slot(self, token: str) -> tuple:
+        slot = self._slots.get(token)
+        if slot is None:
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            slot = (value % self.dim, 1.0 if value >> 63 else -1.0)
+            self._slots[token] = slot
+        return slot
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in _TOKEN.findall(text):
+                d, sign = self._slot(token.lower())
+                out[i, d] += sign
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+def load_embedding_model(model_name: str = EMBEDDING_MODEL):
+    if model_name == HASHING_MODEL:
+        return HashingEmbeddingModel()
+    # sentence_transformers pulls in torch and friends; it is imported on
+    # first use so importing this module stays cheap.
+    from sentence_transformers import SentenceTransformer
+    # Load local model (CPU optimized)
+    return SentenceTransformer(model_name, device='cpu')
+
+class Embedder:
+    """
+    The embedding side of retrieval: the model, the on-disk embedding
+    cache, and the query embedding LRU and batcher. One instance is shared
+    by every project's VectorStore.
+    """
+    def __init__(self, model, cache_path: Optional[str] = None, cache_max_mb: Optional[float] = 256.0,
+                 batch_window_ms: float = 3.0, batch_max_size: int = 32, model_name: str = EMBEDDING_MODEL):
+        self.model = model
+        self.model_name = model_name
+        # No cache_path (or cache_max_mb=None/0) disables the on-disk embedding cache
+        self.embedding_cache = None
+        if cache_path and cache_max_mb:
+            self.embedding_cache = EmbeddingCache(cache_path, cache_max_mb)
+        self.query_embedding_cache = LRUCache(maxsize=1024)
+        # Concurrent query embeddings share one model call
+        self.query_batcher = EmbeddingBatcher(self.embed_texts, batch_window_ms, batch_max_size)
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Encode texts, consulting the embedding cache first so only
+        never-seen content reaches the model.
+        """
+        if not texts:
+            return []
+        if self.embedding_cache is None:
+            return self.model.encode(texts).tolist()
+
+        hashes = [content_hash(t) for t in texts]
+        cached = self.embedding_cache.get_many(self.model_name, hashes)
+
+        # Encode each distinct missing text once
+        missing: Dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            if h not in cached and h not in missing:
+                missing[h] = t
+        if missing:
+            vectors = self.model.encode(list(missing.values())).tolist()
+            fresh = dict(zip(missing.keys(), vectors))
+            self.embedding_cache.put_many(self.model_name, fresh)
+            cached.update(fresh)
+
+        return [cached[h] for h in hashes]
+
+    def embed_query(self, query: str) -> List[float]:
+        vector = self.query_embedding_cache.get(query)
+        if vector is None:
+            vector = self.query_batcher.encode(query)
+            self.query_embedding_cache.put(query, vector)
+        return vector
+
+    async def aembed_query(self, query: str) -> List[float]:
+        vector = self.query_embedding_cache.get(query)
+        if vector is None:
+            vector = await self.query_batcher.aencode(query)
+            self.query_embedding_cache.put(query, vector)
+        return vector
+
+    def stats(self) -> dict:
+        return {
+            "query_embeddings": self.query_embedding_cache.stats(),
+            "query_batches": self.query_batcher.stats(),
+            "embeddings": self.embedding_cache.stats() if self.embedding_cache else None
+        }
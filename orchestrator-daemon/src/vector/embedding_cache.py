@@ -0,0 +1,117 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).hexdigest()
+
+class EmbeddingCache:
+    """
+    On-disk, content-addressed cache of embeddings keyed by
+    (model id, content hash). Bounded by size with LRU eviction.
+    """
+    def __init__(self, path: str, max_mb: float = 256.0):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, hash)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_lru ON embeddings(last_used)")
+        self._conn.commit()
+        row = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0), COUNT(*) FROM embeddings").fetchone()
+        self._bytes, self._entries = row[0], row[1]
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        if not hashes:
+            return {}
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # SQLite caps bound parameters; 500 per query stays well under it
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({marks})",
+                    [model, *part]
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, model, h) for h in found]
+                )
+                self._conn.commit()
+            hit_count = sum(1 for h in hashes if h in found)
+            self.hits += hit_count
+            self.misses += len(hashes) - hit_count
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        if not items:
+            return
+        now = time.time()
+        rows = [(model, h, np.asarray(v, dtype=np.float32).tobytes(), now) for h, v in items.items()]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            if self._conn.total_changes - before:
+                # Vectors of one model share a size, so the first row is representative
+                added = self._conn.total_changes - before
+                self._entries += added
+                self._bytes += added * len(rows[0][2])
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least-recently-used rows until 90% of the cap. Caller holds the lock."""
+        target = int(self.max_bytes * 0.9)
+        while self._bytes > target and self._entries > 0:
+            batch = max(1, self._entries // 10)
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (batch,)
+            )
+            row = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0), COUNT(*) FROM embeddings").fetchone()
+            self._bytes, self._entries = row[0], row[1]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "entries": self._entries,
+            "size_mb": round(self._bytes / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2)
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,139 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ..config import Settings, settings as default_settings
+
+VECTOR_BACKENDS = ("chroma", "mmap")
+
+COLLECTION_NAME = "project_code"
+
+class VectorIndex(ABC):
+    """
+    Storage behind VectorStore: embeddings plus their document text and
+    metadata, addressed by chunk id. Records are returned as dicts with
+    "id", "content", "metadata" and, from query(), "distance" (squared L2,
+    smaller is closer).
+    """
+    name = "base"
+
+    @abstractmethod
+    def count(self) -> int:
+        pass
+
+    @abstractmethod
+    def upsert(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]],
+               documents: Sequence[str], metadatas: Sequence[Dict]):
+        pass
+
+    @abstractmethod
+    def delete(self, ids: Sequence[str]):
+        pass
+
+    @abstractmethod
+    def get(self, ids: Sequence[str], where: Optional[Dict] = None) -> List[Dict]:
+        """Records for the ids that exist (and match `where`), in any order."""
+        pass
+
+    @abstractmethod
+    def query(self, embedding: Sequence[float], n_results: int, where: Optional[Dict] = None) -> List[Dict]:
+        """Nearest records, closest first."""
+        pass
+
+    @abstractmethod
+    def documents(self, page_size: int = 1000) -> Iterator[List[Tuple[str, str]]]:
+        """Pages of (id, document) over the whole index."""
+        pass
+
+    @abstractmethod
+    def drop(self):
+        """Delete the index and everything stored in it."""
+        pass
+
+    def flush(self):
+        """Make writes durable; called after a batch of writes."""
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "vectors": self.count()}
+
+# chromadb pulls in a lot; it is imported on first use so importing this
+# module stays cheap.
+def create_chroma_client(persist_path: str):
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+    return chromadb.PersistentClient(path=persist_path, settings=ChromaSettings(anonymized_telemetry=False))
+
+class ChromaIndex(VectorIndex):
+    name = "chroma"
+
+    def __init__(self, client, collection_name: str = COLLECTION_NAME):
+        self.client = client
+        self.collection_name = collection_name
+        self.collection = client.get_or_create_collection(collection_name)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(
+            documents=list(documents),
+            embeddings=list(embeddings),
+            metadatas=list(metadatas),
+            ids=list(ids)
+        )
+
+    def delete(self, ids):
+        self.collection.delete(ids=list(ids))
+
+    def get(self, ids, where=None):
+        kwargs = {"where": where} if where else {}
+        results = self.collection.get(ids=list(ids), include=["documents", "metadatas"], **kwargs)
+        return [
+            {"id": doc_id, "content": doc, "metadata": meta, "distance": None}
+            for doc_id, doc, meta in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+
+    def query(self, embedding, n_results, where=None):
+        kwargs = {"where": where} if where else {}
+        results = self.collection.query(
+            query_embeddings=[list(embedding)],
+            n_results=n_results,
+            **kwargs
+        )
+        output = []
+        if results["ids"]:
+            for i in range(len(results["ids"][0])):
+                output.append({
+                    "id": results["ids"][0][i],
+                    "content": results["documents"][0][i],
+                    "metadata": results["metadatas"][0][i],
+                    "distance": results["distances"][0][i] if results["distances"] else 0.0
+                })
+        return output
+
+    def drop(self):
+        self.client.delete_collection(self.collection_name)
+
+    def documents(self, page_size=1000):
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                return
+            yield list(zip(page["ids"], page["documents"]))
+            offset += len(page["ids"])
+
+def create_vector_index(path: str, name: str = COLLECTION_NAME, config: Optional[Settings] = None,
+                        client=None) -> VectorIndex:
+    """
+    The backend selected by config.vector_backend: Chroma collection `name`
+    in the shared client, or an mmap index in the directory `path`.
+    """
+    cfg = config or default_settings
+    if cfg.vector_backend == "chroma":
+        return ChromaIndex(client or create_chroma_client(cfg.vector_db_path), name)
+    if cfg.vector_backend == "mmap":
+        from .mmap_index import MmapIndex
+        return MmapIndex(os.path.join(path, "mmap_index"), dtype=cfg.vector_mmap_dtype,
+                         ivf_min_vectors=cfg.vector_ivf_min_vectors, nprobe=cfg.vector_ivf_nprobe)
+    raise ValueError(f"Unknown vector backend {cfg.vector_backend!r}, expected one of {VECTOR_BACKENDS}")
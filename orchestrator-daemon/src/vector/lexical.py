@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import math
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Identifiers, optionally joined by punctuation that is meaningful in code
+# (os.path.join, std::vector, max-tokens, src/api/routes), and numbers.
+_TOKEN_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:(?:\.|::|->|-|/)[A-Za-z_][A-Za-z0-9_]*)*|\d+")
+_PART_SPLIT_RE = re.compile(r"\.|::|->|-|/|_+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z]|\d|\b)|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_IDENTIFIER_QUERY_RE = re.compile(r"[\w.:\-/>]+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Code-aware tokens: each identifier is kept whole (lowercased, with its
+    punctuation) and also split into snake_case / camelCase parts, so both
+    `getUserName` and `user name` match.
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(text):
+        raw = match.group(0)
+        whole = raw.lower()
+        tokens.append(whole)
+        parts = []
+        for piece in _PART_SPLIT_RE.split(raw):
+            if piece:
+                parts.extend(p.lower() for p in _CAMEL_RE.findall(piece))
+        if len(parts) > 1 or (parts and parts[0] != whole):
+            tokens.extend(p for p in parts if len(p) > 1)
+    return tokens
+
+def is_identifier_query(query: str) -> bool:
+    """A single token that looks like code (snake_case, camelCase, dotted, ...)."""
+    q = query.strip().strip("`'\"")
+    if not q or not _IDENTIFIER_QUERY_RE.fullmatch(q):
+        return False
+    return any(c in q for c in "_.:/-") or (q[1:] != q[1:].lower() and q != q.upper())
+
+class LexicalIndex:
+    """
+    In-process BM25 inverted index kept alongside the vector index.
+    Postings are rebuilt from the per-document term counts on load, so
+    only those are persisted: a JSON snapshot plus an append-only log of
+    the documents changed since, which is folded into the snapshot once it
+    grows to a fraction of the index. A save after a small batch of edits
+    (watch mode) then costs the size of the batch, not of the index.
+    """
+    # Rewrite the snapshot once the log holds this share of the index
+    # (and at least LOG_MIN_COMPACT entries)
+    LOG_COMPACT_RATIO = 0.25
+    LOG_MIN_COMPACT = 1000
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.log_path = path + ".log" if path else None
+        self.k1 = k1
+        self.b = b
+        self._doc_terms: Dict[str, Dict[str, int]] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_len = 0
+        # Changes not yet on disk: doc_id -> terms, or None for a removal
+        self._pending: Dict[str, Optional[Dict[str, int]]] = {}
+        self._log_entries = 0
+        self._needs_snapshot = False  # after clear(): the log can't express it
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                for doc_id, terms in data.get("docs", {}).items():
+                    self._add_terms(doc_id, terms)
+        except Exception as e:
+            print(f"Ignoring unreadable lexical index {self.path}: {e}")
+            self._doc_terms, self._doc_len, self._postings, self._total_len = {}, {}, {}, 0
+            self._needs_snapshot = True
+        if not os.path.exists(self.log_path):
+            return
+        good, torn = 0, False
+        with open(self.log_path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("no line end")
+                    entry = json.loads(line)
+                    doc_id, terms = entry["id"], entry["terms"]
+                except (ValueError, KeyError, TypeError):
+                    torn = True
+                    break
+                self._remove(doc_id)
+                if terms is not None:
+                    self._add_terms(doc_id, terms)
+                self._log_entries += 1
+                good += len(line)
+        if torn:
+            # Cut the torn write off, or the next append would be glued to it
+            # and lost with it
+            print(f"Truncating torn lexical index log {self.log_path} at byte {good}")
+            os.truncate(self.log_path, good)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._pending and not self._needs_snapshot:
+                    return
+                pending, self._pending = self._pending, {}
+                self._log_entries += len(pending)
+                compact = (self._needs_snapshot or not os.path.exists(self.path) or self._log_entries >= max(
+                    self.LOG_MIN_COMPACT, self.LOG_COMPACT_RATIO * len(self._doc_terms)))
+                # Values are replaced, never mutated, so a shallow copy is a snapshot
+                data = {"docs": dict(self._doc_terms)} if compact else None
+                self._needs_snapshot = False
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Log first, so snapshot + log is complete even if we stop midway
+            if pending and (not compact or os.path.exists(self.log_path)):
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps({"id": doc_id, "terms": terms}, separators=(",", ":")) + "\n"
+                                 for doc_id, terms in pending.items())
+            if data is None:
+                return
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+            # Replaying the log over the new snapshot is harmless, so a crash
+            # before this point loses nothing
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            with self._lock:
+                self._log_entries = 0
+
+    def _add_terms(self, doc_id: str, terms: Dict[str, int]):
+        self._doc_terms[doc_id] = terms
+        length = sum(terms.values())
+        self._doc_len[doc_id] = length
+        self._total_len += length
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+
+    def _remove(self, doc_id: str):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self._total_len -= self._doc_len.pop(doc_id, 0)
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[term]
+
+    def add_many(self, docs: Iterable[Tuple[str, str]]):
+        """Index (doc_id, text) pairs, replacing any previous version of each doc."""
+        prepared = [(doc_id, dict(Counter(tokenize(text)))) for doc_id, text in docs]
+        with self._lock:
+            for doc_id, terms in prepared:
+                self._remove(doc_id)
+                self._add_terms(doc_id, terms)
+                self._pending[doc_id] = terms
+
+    def remove_many(self, doc_ids: Iterable[str]):
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+                self._pending[doc_id] = None
+
+    def clear(self):
+        with self._lock:
+            self._doc_terms, self._doc_len, self._postings, self._total_len = {}, {}, {}, 0
+            self._pending = {}
+            self._needs_snapshot = True
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if not n_docs or not terms:
+                return []
+            avgdl = self._total_len / n_docs
+            scores: Dict[str, float] = {}
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several ranked id lists; ids ranked well by any list float up."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
@@ -0,0 +1,456 @@
+import os
+import json
+import shutil
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .index import VectorIndex
+
+INDEX_VERSION = 1
+DTYPES = ("float32", "int8")
+# Vectors live in fixed-size segment files that are never resized, so a
+# mapped file never has to be grown or replaced while a query reads it.
+SEGMENT_ROWS = 16384
+# Per-row side data, stored next to each vector segment
+ROW_DTYPE = np.dtype([("scale", "<f4"), ("sqnorm", "<f4"), ("list", "<i4")])
+
+SCORE_BLOCK = 2048  # int8 rows widened to float32 at a time (stays in cache)
+
+IVF_SAMPLE = 32768  # vectors used to train the coarse quantizer
+IVF_ITERATIONS = 8
+
+_SQL_OPS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+def where_sql(where: Dict) -> Tuple[str, list]:
+    """Chroma-style metadata filter as an SQL condition over the JSON metadata column."""
+    clauses, params = [], []
+    for key, cond in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_sql(w) for w in cond]
+            if parts:
+                joiner = " AND " if key == "$and" else " OR "
+                clauses.append("(" + joiner.join(sql for sql, _ in parts) + ")")
+                for _, p in parts:
+                    params.extend(p)
+            continue
+        if '"' in key:
+            raise ValueError(f"Unsupported metadata key {key!r}")
+        path = f'$."{key}"'
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, value in cond.items():
+            if op in _SQL_OPS:
+                clauses.append(f"json_extract(metadata, ?) {_SQL_OPS[op]} ?")
+                params.extend([path, value])
+            elif op in ("$in", "$nin"):
+                marks = ",".join("?" * len(value))
+                negate = "NOT " if op == "$nin" else ""
+                clauses.append(f"json_extract(metadata, ?) {negate}IN ({marks})")
+                params.extend([path, *value])
+            else:
+                raise ValueError(f"Unsupported where operator {op!r}")
+    return " AND ".join(clauses) or "1", params
+
+def _dots(block: np.ndarray, q: np.ndarray, buf: np.ndarray) -> np.ndarray:
+    if block.dtype == np.float32:
+        return block @ q
+    out = np.empty(len(block), dtype=np.float32)
+    for i in range(0, len(block), len(buf)):
+        part = block[i:i + len(buf)]
+        widened = buf[:len(part)]
+        np.copyto(widened, part, casting="unsafe")
+        out[i:i + len(part)] = widened @ q
+    return out
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest centroid (L2) for each row."""
+    half_sqnorms = 0.5 * (centroids ** 2).sum(axis=1)
+    return np.argmax(vectors @ centroids.T - half_sqnorms, axis=1).astype(np.int32)
+
+class MmapIndex(VectorIndex):
+    """
+    In-process vector index. Embeddings are rows of memory-mapped .npy
+    segments (float32, or int8 with a per-row scale); ids, documents and
+    metadata are in a SQLite side table keyed by row. Queries are blocked
+    dot products over the live rows. Past `ivf_min_vectors`, a coarse IVF
+    partition is trained and a query only scans the `nprobe` lists whose
+    centroids are nearest to it.
+    """
+    name = "mmap"
+
+    def __init__(self, path: str, dtype: str = "int8", ivf_min_vectors: int = 50_000, nprobe: int = 8):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype {dtype!r}, expected one of {DTYPES}")
+        self.path = path
+        self.ivf_min_vectors = ivf_min_vectors
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+
+        header = self._load_header()
+        if header.get("dtype", dtype) != dtype:
+            print(f"{path} holds {header['dtype']} vectors; vector_mmap_dtype={dtype} applies once it is rebuilt")
+        self.dtype = header.get("dtype", dtype)
+        self.dim: Optional[int] = header.get("dim")
+        self.segment_rows = header.get("segment_rows", SEGMENT_ROWS)
+        self._ivf_trained_on = header.get("ivf_trained_on", 0)
+
+        self._conn = sqlite3.connect(os.path.join(path, "meta.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+        self._segments: List[Tuple[np.ndarray, np.ndarray]] = [
+            self._open_segment(i) for i in range(header.get("segments", 0))
+        ]
+        # The side table is the source of truth for which rows are in use
+        capacity = len(self._segments) * self.segment_rows
+        rows = np.fromiter((r for (r,) in self._conn.execute("SELECT row FROM chunks")), dtype=np.int64)
+        if len(rows) and rows.max() >= capacity:
+            print(f"Dropping {int((rows >= capacity).sum())} rows without vectors from {path}")
+            self._conn.execute("DELETE FROM chunks WHERE row >= ?", (capacity,))
+            self._conn.commit()
+            rows = rows[rows < capacity]
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._alive[rows] = True
+        self._count = len(rows)
+        self._high_water = int(rows.max()) + 1 if len(rows) else 0
+        # Reused lowest first
+        self._free = np.flatnonzero(~self._alive[:self._high_water])[::-1].tolist()
+
+        self._centroids: Optional[np.ndarray] = None
+        centroids_path = os.path.join(path, "centroids.npy")
+        if self._ivf_trained_on and os.path.exists(centroids_path):
+            self._centroids = np.load(centroids_path)
+
+    # -- storage ---------------------------------------------------------------
+
+    def _load_header(self) -> dict:
+        header_path = os.path.join(self.path, "index.json")
+        if not os.path.exists(header_path):
+            return {}
+        with open(header_path, "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("version") != INDEX_VERSION:
+            raise ValueError(f"{self.path} has index version {header.get('version')}, expected {INDEX_VERSION}")
+        return header
+
+    def _save_header(self):
+        header = {
+            "version": INDEX_VERSION,
+            "dtype": self.dtype,
+            "dim": self.dim,
+            "segment_rows": self.segment_rows,
+            "segments": len(self._segments),
+            "ivf_trained_on": self._ivf_trained_on
+        }
+        header_path = os.path.join(self.path, "index.json")
+        tmp_path = header_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        os.replace(tmp_path, header_path)
+
+    def _open_segment(self, i: int, create: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        vectors_path = os.path.join(self.path, f"vectors_{i:04d}.npy")
+        rows_path = os.path.join(self.path, f"rows_{i:04d}.npy")
+        if not create:
+            return (np.lib.format.open_memmap(vectors_path, mode="r+"),
+                    np.lib.format.open_memmap(rows_path, mode="r+"))
+        vectors = np.lib.format.open_memmap(vectors_path, mode="w+", dtype=self.dtype,
+                                            shape=(self.segment_rows, self.dim))
+        side = np.lib.format.open_memmap(rows_path, mode="w+", dtype=ROW_DTYPE, shape=(self.segment_rows,))
+        side["list"] = -1
+        return vectors, side
+
+    def _allocate(self, n: int) -> List[int]:
+        """Rows for n new vectors: freed rows first, then fresh ones. Caller holds the lock."""
+        rows = [self._free.pop() for _ in range(min(n, len(self._free)))]
+        fresh = n - len(rows)
+        if fresh:
+            rows.extend(range(self._high_water, self._high_water + fresh))
+            self._high_water += fresh
+            segments_needed = -(-self._high_water // self.segment_rows)
+            if segments_needed > len(self._segments):
+                while len(self._segments) < segments_needed:
+                    self._segments.append(self._open_segment(len(self._segments), create=True))
+                grown = np.zeros(segments_needed * self.segment_rows, dtype=bool)
+                grown[:len(self._alive)] = self._alive
+                self._alive = grown
+                self._save_header()
+        return rows
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(stored rows, scales, squared norms of what is stored)."""
+        if self.dtype == "float32":
+            return vectors, np.ones(len(vectors), dtype=np.float32), (vectors ** 2).sum(axis=1)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.rint(vectors / scales[:, None]).clip(-127, 127).astype(np.int8)
+        restored = quantized * scales[:, None]
+        return quantized, scales.astype(np.float32), (restored ** 2).sum(axis=1)
+
+    def _decode(self, s: int, offsets) -> np.ndarray:
+        vectors, side = self._segments[s]
+        block = np.asarray(vectors[offsets], dtype=np.float32)
+        if self.dtype == "int8":
+            block *= side["scale"][offsets][:, None]
+        return block
+
+    def _write(self, rows: np.ndarray, vectors: np.ndarray):
+        stored, scales, sqnorms = self._encode(vectors)
+        lists = _nearest(vectors, self._centroids) if self._centroids is not None else np.full(len(rows), -1)
+        segment_of, offsets = np.divmod(rows, self.segment_rows)
+        for s in np.unique(segment_of):
+            m = segment_of == s
+            seg_vectors, side = self._segments[s]
+            seg_vectors[offsets[m]] = stored[m]
+            side["scale"][offsets[m]] = scales[m]
+            side["sqnorm"][offsets[m]] = sqnorms[m]
+            side["list"][offsets[m]] = lists[m]
+
+    def _rows_for(self, ids: List[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        # SQLite caps bound parameters; 500 per query stays well under it
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            marks = ",".join("?" * len(part))
+            found.update(self._conn.execute(f"SELECT id, row FROM chunks WHERE id IN ({marks})", part).fetchall())
+        return found
+
+    # -- VectorIndex -------------------------------------------------------------
+
+    def count(self) -> int:
+        return self._count
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if not len(ids):
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("Expected one embedding per id")
+        # An id repeated within the batch keeps its last version
+        positions = {doc_id: i for i, doc_id in enumerate(ids)}
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._save_header()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the index ({self.dim})")
+            row_of = self._rows_for(list(positions))
+            new_ids = [doc_id for doc_id in positions if doc_id not in row_of]
+            row_of.update(zip(new_ids, self._allocate(len(new_ids))))
+
+            rows = np.array([row_of[doc_id] for doc_id in positions], dtype=np.int64)
+            self._write(rows, vectors[list(positions.values())])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [(row_of[doc_id], doc_id, documents[i], json.dumps(metadatas[i])) for doc_id, i in positions.items()]
+            )
+            self._conn.commit()
+            self._alive[rows] = True
+            self._count += len(new_ids)
+
+    def delete(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        with self._lock:
+            row_of = self._rows_for(ids)
+            if not row_of:
+                return
+            doc_ids = list(row_of)
+            for i in range(0, len(doc_ids), 500):
+                part = doc_ids[i:i + 500]
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(part))})", part)
+            self._conn.commit()
+            rows = list(row_of.values())
+            self._alive[rows] = False
+            self._free.extend(rows)
+            self._free.sort(reverse=True)
+            self._count -= len(rows)
+
+    def get(self, ids, where=None):
+        ids = list(ids)
+        condition, params = where_sql(where) if where else ("1", [])
+        output = []
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT id, document, metadata FROM chunks WHERE id IN ({marks}) AND {condition}",
+                    [*part, *params]
+                ).fetchall()
+                output.extend({"id": doc_id, "content": doc, "metadata": json.loads(meta), "distance": None}
+                              for doc_id, doc, meta in rows)
+        return output
+
+    def documents(self, page_size=1000):
+        last_row = -1
+        while True:
+            with self._lock:
+                page = self._conn.execute(
+                    "SELECT row, id, document FROM chunks WHERE row > ? ORDER BY row LIMIT ?",
+                    (last_row, page_size)
+                ).fetchall()
+            if not page:
+                return
+            last_row = page[-1][0]
+            yield [(doc_id, doc) for _, doc_id, doc in page]
+
+    def query(self, embedding, n_results, where=None):
+        q = np.asarray(embedding, dtype=np.float32).ravel()
+        with self._lock:
+            if self.dim is None or not self._count or n_results <= 0:
+                return []
+            if q.shape[0] != self.dim:
+                raise ValueError(f"Query dimension {q.shape[0]} does not match the index ({self.dim})")
+            mask = self._alive
+            if where:
+                condition, params = where_sql(where)
+                allowed = [r for (r,) in self._conn.execute(f"SELECT row FROM chunks WHERE {condition}", params)]
+                mask = np.zeros_like(self._alive)
+                mask[allowed] = True
+                mask &= self._alive
+            segments, centroids = list(self._segments), self._centroids
+
+        probes = None
+        if centroids is not None:
+            probes = np.argsort(-(centroids @ q - 0.5 * (centroids ** 2).sum(axis=1)))[:self.nprobe]
+        rows, distances = self._scan(q, segments, mask, n_results, probes)
+        if probes is not None and len(rows) < n_results:
+            # Filter too selective for the probed lists; fall back to a full scan
+            rows, distances = self._scan(q, segments, mask, n_results, None)
+
+        with self._lock:
+            marks = ",".join("?" * len(rows))
+            records = {
+                row: (doc_id, doc, meta) for row, doc_id, doc, meta in self._conn.execute(
+                    f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({marks})", rows.tolist()
+                )
+            }
+        output = []
+        for row, distance in zip(rows.tolist(), distances.tolist()):
+            record = records.get(row)
+            if record is None:
+                continue  # deleted while the query ran
+            output.append({"id": record[0], "content": record[1], "metadata": json.loads(record[2]),
+                           "distance": distance})
+        return output
+
+    def _scan(self, q: np.ndarray, segments, mask: np.ndarray, k: int,
+              probes: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k rows by squared L2 distance, closest first."""
+        q_sqnorm = float(q @ q)
+        buf = np.empty((SCORE_BLOCK, len(q)), dtype=np.float32) if self.dtype == "int8" else None
+        found_rows, found_distances = [], []
+        for s, (vectors, side) in enumerate(segments):
+            live = mask[s * self.segment_rows:(s + 1) * self.segment_rows]
+            if probes is not None:
+                lists = side["list"]
+                live = live & (np.isin(lists, probes) | (lists < 0))
+            offsets = np.flatnonzero(live)
+            if not len(offsets):
+                continue
+            if offsets[-1] - offsets[0] + 1 == len(offsets):
+                # Contiguous rows: score a slice of the map instead of gathering
+                window = slice(offsets[0], offsets[-1] + 1)
+                block, scales, sqnorms = vectors[window], side["scale"][window], side["sqnorm"][window]
+            else:
+                block, scales, sqnorms = vectors[offsets], side["scale"][offsets], side["sqnorm"][offsets]
+            dots = _dots(block, q, buf)
+            if self.dtype == "int8":
+                dots *= scales
+            distances = q_sqnorm + sqnorms - 2.0 * dots
+            if len(distances) > k:
+                top = np.argpartition(distances, k - 1)[:k]
+                offsets, distances = offsets[top], distances[top]
+            found_rows.append(offsets + s * self.segment_rows)
+            found_distances.append(distances)
+        if not found_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows, distances = np.concatenate(found_rows), np.concatenate(found_distances)
+        order = np.argsort(distances)[:k]
+        return rows[order], distances[order]
+
+    # -- maintenance ---------------------------------------------------------------
+
+    def flush(self):
+        with self._lock:
+            for vectors, side in self._segments:
+                vectors.flush()
+                side.flush()
+            if self.ivf_min_vectors and self._count >= self.ivf_min_vectors \
+                    and self._count >= 2 * self._ivf_trained_on:
+                self._train_ivf()
+
+    def _train_ivf(self):
+        """k-means over a sample of live vectors, then assign every row to a list. Caller holds the lock."""
+        rng = np.random.default_rng(0)
+        live = np.flatnonzero(self._alive)
+        sample_rows = np.sort(rng.choice(live, size=min(len(live), IVF_SAMPLE), replace=False))
+        segment_of, offsets = np.divmod(sample_rows, self.segment_rows)
+        sample = np.concatenate([self._decode(s, offsets[segment_of == s]) for s in np.unique(segment_of)])
+
+        n_lists = max(1, int(np.sqrt(self._count)))
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(IVF_ITERATIONS):
+            labels = _nearest(sample, centroids)
+            counts = np.bincount(labels, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+            # Re-seed empty lists with random vectors
+            centroids[~filled] = sample[rng.choice(len(sample), size=int((~filled).sum()))]
+
+        for s, (_, side) in enumerate(self._segments):
+            used = min(self.segment_rows, self._high_water - s * self.segment_rows)
+            if used <= 0:
+                break
+            for start in range(0, used, 4096):
+                stop = min(used, start + 4096)
+                side["list"][start:stop] = _nearest(self._decode(s, slice(start, stop)), centroids)
+        self._centroids = centroids.astype(np.float32)
+        np.save(os.path.join(self.path, "centroids.npy"), self._centroids)
+        self._ivf_trained_on = self._count
+        self._save_header()
+
+    def stats(self) -> dict:
+        disk_bytes = sum(os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path))
+        return {
+            "backend": self.name,
+            "vectors": self._count,
+            "dtype": self.dtype,
+            "dim": self.dim,
+            "segments": len(self._segments),
+            "disk_mb": round(disk_bytes / (1024 * 1024), 2),
+            "ivf_lists": len(self._centroids) if self._centroids is not None else 0,
+            "nprobe": self.nprobe
+        }
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._segments = []
+            self._conn.close()
+
+    def drop(self):
+        with self._lock:
+            # Unmap first: mapped files can't be deleted on Windows
+            self._segments = []
+            self._alive = np.zeros(0, dtype=bool)
+            self._count = 0
+            self._conn.close()
+            shutil.rmtree(self.path, ignore_errors=True)
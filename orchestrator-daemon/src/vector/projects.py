@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import shutil
+import threading
+from typing import Dict, List, Optional
+
+from ..config import Settings, settings as default_settings
+from ..indexing.manifest import normalize_root, project_key
+from .embedder import Embedder
+from .index import create_vector_index
+from .lexical import reciprocal_rank_fusion
+from .store import VectorStore
+
+class ProjectNotFound(LookupError):
+    pass
+
+class ProjectStores:
+    """
+    One VectorStore per indexed project, each with its own index partition
+    (a Chroma collection or an mmap directory) under
+    vector_db_path/projects/<key>/, where <key> is derived from the
+    normalized root path. All stores share one Embedder, so the model and
+    the embedding cache are loaded once. Stores are opened on first use.
+    """
+    def __init__(self, embedder: Embedder, config: Optional[Settings] = None, client=None):
+        self.embedder = embedder
+        self.config = config or default_settings
+        self.client = client  # shared Chroma client when vector_backend == "chroma"
+        self.base_path = os.path.join(self.config.vector_db_path, "projects")
+        self._roots: Dict[str, str] = {}  # key -> root path
+        self._stores: Dict[str, VectorStore] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if os.path.isdir(self.base_path):
+            for key in os.listdir(self.base_path):
+                meta_path = os.path.join(self.base_path, key, "project.json")
+                try:
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        self._roots[key] = json.load(f)["root_path"]
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Ignoring unreadable project index {meta_path}: {e}")
+        if not self._roots and os.path.isdir(os.path.join(self.config.vector_db_path, "manifests")):
+            print("Found an index from before per-project partitions; it is no longer searched. "
+                  "Re-index projects to move them (cached embeddings are reused).")
+
+    def _dir(self, key: str) -> str:
+        return os.path.join(self.base_path, key)
+
+    def _open(self, key: str) -> VectorStore:
+        """Caller holds the lock."""
+        store = self._stores.get(key)
+        if store is None:
+            project_dir = self._dir(key)
+            index = create_vector_index(project_dir, f"project_{key}", self.config, self.client)
+            store = VectorStore(project_dir, retrieval_mode=self.config.retrieval_mode,
+                                index=index, embedder=self.embedder)
+            self._stores[key] = store
+        return store
+
+    def get(self, root_path: str, create: bool = False) -> VectorStore:
+        """The project's store; raises ProjectNotFound unless it exists or `create`."""
+        key = project_key(root_path)
+        with self._lock:
+            if key not in self._roots:
+                if not create:
+                    raise ProjectNotFound(f"Project is not indexed: {root_path}")
+                os.makedirs(self._dir(key), exist_ok=True)
+                root = normalize_root(root_path)
+                with open(os.path.join(self._dir(key), "project.json"), "w", encoding="utf-8") as f:
+                    json.dump({"root_path": root, "created_at": time.time()}, f)
+                self._roots[key] = root
+            return self._open(key)
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            return [{"key": key, "root_path": root, "loaded": key in self._stores}
+                    for key, root in sorted(self._roots.items(), key=lambda kv: kv[1])]
+
+    def open_stores(self) -> List[VectorStore]:
+        """Stores opened so far; does not open any."""
+        with self._lock:
+            return list(self._stores.values())
+
+    def stats(self, root_path: str) -> dict:
+        store = self.get(root_path)
+        key = project_key(root_path)
+        disk_bytes = 0
+        for d, _, files in os.walk(self._dir(key)):
+            for name in files:
+                try:
+                    disk_bytes += os.path.getsize(os.path.join(d, name))
+                except OSError:
+                    pass
+        return {
+            "key": key,
+            "root_path": self._roots.get(key),
+            "disk_mb": round(disk_bytes / (1024 * 1024), 2),
+            "index": store.index.stats(),
+            "lexical_docs": len(store.lexical),
+            "generation": store.generation
+        }
+
+    def drop(self, root_path: str) -> dict:
+        """Delete the project's index partition, manifest and side indexes."""
+        key = project_key(root_path)
+        with self._lock:
+            if key not in self._roots:
+                raise ProjectNotFound(f"Project is not indexed: {root_path}")
+            store = self._open(key)
+            store.index.drop()
+            del self._stores[key]
+            root = self._roots.pop(key)
+            shutil.rmtree(self._dir(key), ignore_errors=True)
+        return {"key": key, "root_path": root}
+
+    def query_similar(self, query: str, n_results: int = 5, where: Optional[Dict] = None,
+                      mode: Optional[str] = None, project: Optional[str] = None) -> List[Dict]:
+        """
+        Search one project, or every indexed project when `project` is None.
+        Results from several projects are merged by distance when all of
+        them are plain vector hits, otherwise by reciprocal rank.
+        """
+        if project is not None:
+            return self.get(project).query_similar(query, n_results, where, mode)
+
+        with self._lock:
+            stores = [self._open(key) for key in self._roots]
+        per_project = [s.query_similar(query, n_results, where, mode) for s in stores]
+        if len(per_project) <= 1:
+            return per_project[0] if per_project else []
+        hits = [r for results in per_project for r in results]
+        if all(r.get("distance") is not None and "score" not in r for r in hits):
+            return sorted(hits, key=lambda r: r["distance"])[:n_results]
+
+        by_key = {}
+        rankings = []
+        for i, results in enumerate(per_project):
+            ranking = []
+            for r in results:
+                by_key[f"{i}:{r['id']}"] = r
+                ranking.append(f"{i}:{r['id']}")
+            rankings.append(ranking)
+        return [by_key[k] for k, _ in reciprocal_rank_fusion(rankings)[:n_results]]
@@ -1,53 +1,205 @@
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+import os
+import copy
+import json
+import threading
+from typing import List, Dict, Optional
+from ..indexing.manifest import chunk_id
+from .query_cache import LRUCache
+from .embedder import EMBEDDING_MODEL, Embedder, load_embedding_model
+from .lexical import LexicalIndex, is_identifier_query, reciprocal_rank_fusion
+from .index import ChromaIndex, VectorIndex, create_chroma_client
+from ..telemetry.tracing import span
+
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid", "auto")
 
 class VectorStore:
-    def __init__(self, persist_path: str = "./vector_db"):
-        self.client = chromadb.PersistentClient(path=persist_path, settings=Settings(anonymized_telemetry=False))
-        self.collection = self.client.get_or_create_collection("project_code")
-        # Load local model (CPU optimized)
-        self.model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+    def __init__(self, persist_path: str = "./vector_db", cache_max_mb: Optional[float] = 256.0,
+                 client=None, model=None, retrieval_mode: str = "auto",
+                 batch_window_ms: float = 3.0, batch_max_size: int = 32,
+                 index: Optional[VectorIndex] = None, embedder: Optional[Embedder] = None):
+        """
+        `index` selects the storage backend (Chroma unless given; see
+        src/vector/index.py). `embedder` (or `client` and `model`) can be
+        injected so project stores share one embedding model and cache
+        (see src/vector/projects.py).
+        """
+        self.persist_path = persist_path
+        self.index = index or ChromaIndex(client or create_chroma_client(persist_path))
+        if embedder is None:
+            cache_path = os.path.join(persist_path, "embedding_cache.sqlite")
+            embedder = Embedder(model or load_embedding_model(EMBEDDING_MODEL), cache_path, cache_max_mb,
+                                batch_window_ms, batch_max_size)
+        self.embedder = embedder
+        self.embedding_cache = embedder.embedding_cache
 
-    def add_chunks(self, chunks: List[Dict]):
+        # Bumped after every write; cached query results from an older
+        # generation are never served.
+        self.generation = 0
+        self._generation_lock = threading.Lock()
+        self.query_result_cache = LRUCache(maxsize=256)
+
+        self.retrieval_mode = retrieval_mode
+        lexical_path = os.path.join(persist_path, "lexical_index.json")
+        needs_rebuild = not os.path.exists(lexical_path)
+        self.lexical = LexicalIndex(lexical_path)
+        if needs_rebuild and self.index.count() > 0:
+            self.rebuild_lexical_index()
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        return self.embedder.embed_texts(texts)
+
+    def upsert_embeddings(self, chunks: List[Dict], embeddings: List[List[float]]):
         """
-        chunks: List of specific format from Chunker
+        Write already-embedded chunks. Split from add_chunks so the indexing
+        pipeline can run encoding and index writes on separate stages.
         """
         if not chunks:
             return
-            
+
         texts = [c["content"] for c in chunks]
         metadatas = [{
             "filepath": c["filepath"],
             "start_line": c["start_line"],
             "end_line": c["end_line"]
         } for c in chunks]
-        ids = [f"{c['filepath']}:{c['start_line']}" for c in chunks]
-        
-        embeddings = self.model.encode(texts).tolist()
-        
-        self.collection.upsert(
-            documents=texts,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            ids=ids
-        )
-
-    def query_similar(self, query: str, n_results: int = 5) -> List[Dict]:
-        query_embedding = self.model.encode([query]).tolist()
-        results = self.collection.query(
-            query_embeddings=query_embedding,
-            n_results=n_results
-        )
-        
+        ids = [chunk_id(c["filepath"], c["start_line"]) for c in chunks]
+
+        self.index.upsert(ids, embeddings, texts, metadatas)
+        self.lexical.add_many(zip(ids, texts))
+        self._bump_generation()
+
+    def add_chunks(self, chunks: List[Dict]):
+        """
+        chunks: List of specific format from Chunker
+        """
+        if not chunks:
+            return
+
+        embeddings = self.embed_texts([c["content"] for c in chunks])
+        self.upsert_embeddings(chunks, embeddings)
+
+    def delete_ids(self, ids: List[str]):
+        if not ids:
+            return
+        self.index.delete(list(ids))
+        self.lexical.remove_many(ids)
+        self._bump_generation()
+
+    def flush(self):
+        """Persist in-memory side indexes; call after a batch of writes."""
+        self.index.flush()
+        self.lexical.save()
+
+    def rebuild_lexical_index(self, page_size: int = 1000):
+        """Rebuild the lexical index from documents already in the vector index."""
+        self.lexical.clear()
+        for page in self.index.documents(page_size):
+            self.lexical.add_many(page)
+        self.lexical.save()
+
+    def _bump_generation(self):
+        with self._generation_lock:
+            self.generation += 1
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embedder.embed_query(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        return await self.embedder.aembed_query(query)
+
+    def query_similar(self, query: str, n_results: int = 5, where: Optional[Dict] = None,
+                      mode: Optional[str] = None) -> List[Dict]:
+        """
+        mode: "vector" (embeddings only), "lexical" (BM25 only, never touches
+        the embedding model), "hybrid" (both, fused with reciprocal rank
+        fusion) or "auto": lexical for identifier-like queries, else hybrid.
+        """
+        requested = mode = mode or self.retrieval_mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+
+        # Read the generation before searching: if a write lands mid-query the
+        # result is stored under the old generation and discarded next time.
+        generation = self.generation
+        key = (query, n_results, json.dumps(where, sort_keys=True) if where else None, mode)
+        cached = self.query_result_cache.get(key, valid=lambda entry: entry[0] == generation)
+        if cached is not None:
+            return copy.deepcopy(cached[1])
+
+        if mode == "auto":
+            if not len(self.lexical):
+                mode = "vector"
+            elif is_identifier_query(query):
+                mode = "lexical"
+            else:
+                mode = "hybrid"
+
+        if mode == "vector":
+            output = self._vector_search(query, n_results, where)
+        elif mode == "lexical":
+            output = self._lexical_search(query, n_results, where)
+            if not output and requested == "auto":
+                # Identifier not found verbatim; fall back to semantic search
+                output = self._vector_search(query, n_results, where)
+        else:
+            output = self._hybrid_search(query, n_results, where)
+
+        self.query_result_cache.put(key, (generation, copy.deepcopy(output)))
+        return output
+
+    def _vector_search(self, query: str, n_results: int, where: Optional[Dict]) -> List[Dict]:
+        with span("embed_query"):
+            embedding = self.embed_query(query)
+        with span("vector_search"):
+            return self.index.query(embedding, n_results, where)
+
+    def _lexical_search(self, query: str, n_results: int, where: Optional[Dict]) -> List[Dict]:
+        # Over-fetch when filtering, since the filter is applied afterwards
+        with span("lexical_search"):
+            hits = self.lexical.search(query, k=n_results * 4 if where else n_results)
+        if not hits:
+            return []
+        scores = dict(hits)
+        output = self._fetch([doc_id for doc_id, _ in hits], where)
+        for r in output:
+            r["score"] = round(scores[r["id"]], 4)
+        return output[:n_results]
+
+    def _hybrid_search(self, query: str, n_results: int, where: Optional[Dict]) -> List[Dict]:
+        depth = n_results * 4
+        vector_hits = self._vector_search(query, depth, where)
+        with span("lexical_search"):
+            lexical_ids = [doc_id for doc_id, _ in self.lexical.search(query, k=depth)]
+        fused = reciprocal_rank_fusion([[r["id"] for r in vector_hits], lexical_ids])
+
+        by_id = {r["id"]: r for r in vector_hits}
+        missing = [doc_id for doc_id, _ in fused[:n_results] if doc_id not in by_id]
+        for r in self._fetch(missing, where):
+            by_id[r["id"]] = r
+
         output = []
-        if results["ids"]:
-            for i in range(len(results["ids"][0])):
-                output.append({
-                    "id": results["ids"][0][i],
-                    "content": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i],
-                    "distance": results["distances"][0][i] if results["distances"] else 0.0
-                })
+        for doc_id, score in fused:
+            r = by_id.get(doc_id)
+            if r is None:
+                continue  # filtered out by `where`
+            r["score"] = round(score, 4)
+            output.append(r)
+            if len(output) == n_results:
+                break
         return output
+
+    def _fetch(self, ids: List[str], where: Optional[Dict]) -> List[Dict]:
+        """Load documents by id, preserving the order of `ids`."""
+        if not ids:
+            return []
+        by_id = {r["id"]: r for r in self.index.get(ids, where)}
+        return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+
+    def cache_stats(self) -> dict:
+        return {
+            "generation": self.generation,
+            "query_results": self.query_result_cache.stats(),
+            "lexical_docs": len(self.lexical),
+            "index": self.index.stats(),
+            **self.embedder.stats()
+        }
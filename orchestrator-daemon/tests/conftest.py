@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the daemon as `src.…`, like uvicorn does (src.main:app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from src.agents.implementations import CodeReaderAgent
+from src.ollama.catalog import DEFAULT_MODEL, catalog
+from src.ollama.client import OllamaModel
+
+@pytest.fixture
+def empty_catalog(monkeypatch):
+    monkeypatch.setattr(catalog, "running", False)
+    monkeypatch.setattr(catalog, "refreshed_at", 0.0)
+    monkeypatch.setattr(catalog, "_models", [])
+    monkeypatch.setattr(catalog, "_loaded", [])
+
+    def blocking_refresh():
+        raise AssertionError("refresh_sync() called from a coroutine")
+    monkeypatch.setattr(catalog, "refresh_sync", blocking_refresh)
+
+def test_aselect_model_fetches_the_catalog_asynchronously(empty_catalog, monkeypatch):
+    async def refresh():
+        catalog._apply(True, [OllamaModel("qwen2.5-coder:7b", 4.7)], [])
+    monkeypatch.setattr(catalog, "refresh", refresh)
+    assert asyncio.run(CodeReaderAgent().aselect_model()) == "qwen2.5-coder:7b"
+
+def test_aselect_model_falls_back_when_ollama_is_unreachable(empty_catalog, monkeypatch):
+    async def refresh():
+        raise ConnectionError("connection refused")
+    monkeypatch.setattr(catalog, "refresh", refresh)
+    assert asyncio.run(CodeReaderAgent().aselect_model()) == DEFAULT_MODEL
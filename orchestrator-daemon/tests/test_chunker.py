@@ -0,0 +1,45 @@
+import random
+
+from src.indexing.chunker import _window, chunk_lines, count_tokens, stream_window
+
+def spans(chunks):
+    return [(c.start_line, c.end_line) for c in chunks]
+
+def make_lines(token_counts):
+    return [" ".join(f"w{i}" for i in range(n)) + "\n" for n in token_counts]
+
+def check_windows(chunks, lines, max_tokens):
+    covered = set()
+    previous_end = 0
+    for c in chunks:
+        new_lines = set(range(c.start_line, c.end_line + 1)) - covered
+        # Every window brings at least one line the previous ones didn't have
+        assert new_lines, f"window {c.start_line}-{c.end_line} only repeats overlap"
+        assert c.end_line > previous_end
+        # Only a single oversized line may exceed the budget
+        if c.start_line != c.end_line:
+            assert count_tokens(c.content) <= max_tokens
+        covered |= new_lines
+        previous_end = c.end_line
+    assert covered == set(range(1, len(lines) + 1))
+
+def test_oversized_line_after_overlap_tail_is_not_duplicated():
+    lines = make_lines([5] * 20 + [200] + [5] * 5)
+    chunks = _window("f.txt", lines, 1, len(lines), max_tokens=100, overlap=15)
+    assert spans(chunks) == [(1, 20), (21, 21), (22, 26)]
+
+def test_overlap_kept_when_the_next_line_fits():
+    lines = make_lines([10] * 30)
+    chunks = _window("f.txt", lines, 1, len(lines), max_tokens=100, overlap=20)
+    assert spans(chunks)[:2] == [(1, 10), (9, 18)]
+    check_windows(chunks, lines, 100)
+
+def test_stream_window_matches_chunk_lines():
+    rng = random.Random(7)
+    for _ in range(200):
+        counts = [rng.choice([1, 3, 8, 20, 60, 150]) for _ in range(rng.randint(1, 60))]
+        lines = make_lines(counts)
+        max_tokens, overlap = rng.choice([(50, 10), (100, 15), (100, 40)])
+        expected = chunk_lines("f.txt", lines, max_tokens, overlap)
+        assert spans(stream_window("f.txt", iter(lines), max_tokens, overlap)) == spans(expected)
+        check_windows(expected, lines, max_tokens)
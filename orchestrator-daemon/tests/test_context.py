@@ -0,0 +1,13 @@
+from src.agents.context import clip_tokens
+from src.indexing.chunker import count_tokens
+
+def test_clip_tokens_keeps_leading_words_within_budget():
+    answer = "def load(path):\n    return json.loads(open(path).read())\n" * 20
+    clipped = clip_tokens(answer, 40)
+    assert count_tokens(clipped) <= 40
+    assert answer.startswith(clipped)
+    assert count_tokens(clipped) > 30
+
+def test_clip_tokens_leaves_short_text_alone():
+    assert clip_tokens("short answer\n", 40) == "short answer\n"
+    assert clip_tokens("anything", 0) == ""
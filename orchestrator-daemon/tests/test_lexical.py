@@ -0,0 +1,80 @@
+import os
+
+from src.vector.lexical import LexicalIndex
+
+def docs(n, prefix="doc"):
+    return [(f"{prefix}{i}", f"def handler_{i}(request): return render_page_{i % 7}(request)") for i in range(n)]
+
+def test_small_saves_append_to_the_log(tmp_path):
+    path = str(tmp_path / "lexical_index.json")
+    index = LexicalIndex(path)
+    index.add_many(docs(2000))
+    index.save()
+    snapshot_mtime = os.stat(path).st_mtime_ns
+    assert not os.path.exists(index.log_path)
+
+    index.add_many([("doc5", "def renamed_handler(): pass")])
+    index.remove_many(["doc6"])
+    index.save()
+    assert os.stat(path).st_mtime_ns == snapshot_mtime
+    with open(index.log_path) as f:
+        assert len(f.readlines()) == 2
+
+    reloaded = LexicalIndex(path)
+    assert len(reloaded) == 1999
+    assert reloaded.search("renamed_handler", k=1)[0][0] == "doc5"
+    assert reloaded.search("handler_6", k=5)[0][0] != "doc6"
+
+def test_log_is_compacted_into_the_snapshot(tmp_path):
+    path = str(tmp_path / "lexical_index.json")
+    index = LexicalIndex(path)
+    index.LOG_MIN_COMPACT = 10
+    index.add_many(docs(20))
+    index.save()
+    for i in range(10):
+        index.add_many([(f"doc{i}", f"def updated_{i}(): pass")])
+        index.save()
+    assert not os.path.exists(index.log_path)
+    reloaded = LexicalIndex(path)
+    assert len(reloaded) == 20
+    assert reloaded.search("updated_3", k=1)[0][0] == "doc3"
+
+def test_clear_rewrites_the_snapshot(tmp_path):
+    path = str(tmp_path / "lexical_index.json")
+    index = LexicalIndex(path)
+    index.add_many(docs(5))
+    index.save()
+    index.add_many(docs(1, prefix="extra"))
+    index.save()
+    index.clear()
+    index.add_many(docs(2, prefix="fresh"))
+    index.save()
+    assert not os.path.exists(index.log_path)
+    assert sorted(LexicalIndex(path)._doc_terms) == ["fresh0", "fresh1"]
+
+def test_torn_log_line_is_ignored(tmp_path):
+    path = str(tmp_path / "lexical_index.json")
+    index = LexicalIndex(path)
+    index.add_many(docs(3))
+    index.save()
+    index.add_many([("doc9", "def late_arrival(): pass")])
+    index.save()
+    with open(index.log_path, "a") as f:
+        f.write('{"id": "doc1", "ter')
+    reloaded = LexicalIndex(path)
+    assert len(reloaded) == 4
+
+def test_saves_after_a_torn_log_line_survive_a_reload(tmp_path):
+    path = str(tmp_path / "lexical_index.json")
+    index = LexicalIndex(path)
+    index.add_many(docs(3))
+    index.save()
+    index.add_many([("doc9", "def late_arrival(): pass")])
+    index.save()
+    with open(index.log_path, "a") as f:
+        f.write('{"id": "doc1", "ter')
+    reopened = LexicalIndex(path)
+    reopened.add_many([("after0", "def after_crash(): pass"), ("after1", "def also_after(): pass")])
+    reopened.save()
+    reloaded = LexicalIndex(path)
+    assert sorted(reloaded._doc_terms) == ["after0", "after1", "doc0", "doc1", "doc2", "doc9"]
@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+from src.config import Settings
+from src.hardware.detection import GPUInfo, HardwareProfile
+from src.models.selection import ModelTier, select_model_tier
+from src.ollama.scheduler import GenerationRejected, GenerationScheduler, _Memory
+
+def make_scheduler(memory: _Memory = None, **overrides) -> GenerationScheduler:
+    config = Settings(**{
+        "generation_slots_per_model": 1,
+        "ollama_max_concurrent_generations": 4,
+        "generation_queue_interactive": 2,
+        "generation_queue_batch": 2,
+        "generation_max_wait_interactive_s": 5.0,
+        "generation_max_wait_batch_s": 5.0,
+        **overrides
+    })
+    scheduler = GenerationScheduler(config)
+    # No catalog or hardware in tests
+    scheduler._memory = lambda: memory or _Memory(loaded=set(), sizes={}, free_gb=64.0)
+    return scheduler
+
+async def hold(scheduler, model, priority, order, release: asyncio.Event):
+    async with scheduler.aslot(model, priority) as slot:
+        order.append(model if priority == "interactive" else f"{model}/{priority}")
+        await release.wait()
+        return slot.wait_s
+
+def test_admits_up_to_the_per_model_limit_then_queues():
+    async def run():
+        scheduler = make_scheduler(generation_slots_per_model=2)
+        order, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(hold(scheduler, "m", "interactive", order, release)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert len(order) == 2
+        assert scheduler.stats()["queued"]["interactive"] == 1
+        release.set()
+        waits = await asyncio.gather(*tasks)
+        assert len(order) == 3
+        assert scheduler.stats()["running"] == {}
+        assert max(waits) > 0
+    asyncio.run(run())
+
+def test_interactive_overtakes_queued_batch():
+    async def run():
+        scheduler = make_scheduler()
+        order = []
+        first, rest = asyncio.Event(), asyncio.Event()
+        running = asyncio.create_task(hold(scheduler, "m", "batch", order, first))
+        await asyncio.sleep(0.01)
+        batch = asyncio.create_task(hold(scheduler, "m", "batch", order, rest))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(hold(scheduler, "m", "interactive", order, rest))
+        await asyncio.sleep(0.01)
+        first.set()
+        await asyncio.sleep(0.01)
+        rest.set()
+        await asyncio.gather(running, batch, interactive)
+        assert order == ["m/batch", "m", "m/batch"]
+    asyncio.run(run())
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def run():
+        scheduler = make_scheduler(generation_queue_interactive=1)
+        order, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(hold(scheduler, "m", "interactive", order, release)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(GenerationRejected) as rejected:
+            async with scheduler.aslot("m"):
+                pass
+        assert rejected.value.retry_after_s >= 1
+        assert scheduler.rejected == 1
+        release.set()
+        await asyncio.gather(*tasks)
+    asyncio.run(run())
+
+def test_wait_longer_than_the_limit_is_rejected():
+    async def run():
+        scheduler = make_scheduler(generation_max_wait_interactive_s=0.05)
+        order, release = [], asyncio.Event()
+        task = asyncio.create_task(hold(scheduler, "m", "interactive", order, release))
+        await asyncio.sleep(0.01)
+        with pytest.raises(GenerationRejected):
+            async with scheduler.aslot("m"):
+                pass
+        assert scheduler.stats()["queued"]["interactive"] == 0
+        release.set()
+        await task
+    asyncio.run(run())
+
+def test_busy_model_does_not_block_another_model():
+    async def run():
+        scheduler = make_scheduler()
+        order, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(hold(scheduler, "a", "interactive", order, release)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        async with scheduler.aslot("b") as slot:
+            assert slot.wait_s < 0.01
+        release.set()
+        await asyncio.gather(*tasks)
+    asyncio.run(run())
+
+def test_sync_slot_releases_on_exit():
+    scheduler = make_scheduler()
+    with scheduler.slot("m") as slot:
+        assert scheduler.running("m") == 1
+        assert slot.wait_s >= 0
+    assert scheduler.running("m") == 0
+
+def test_unknown_priority_is_an_error():
+    with pytest.raises(ValueError):
+        with make_scheduler().slot("m", "urgent"):
+            pass
+
+def test_model_that_does_not_fit_waits_for_the_running_ones():
+    async def run():
+        memory = _Memory(loaded={"small"}, sizes={"small": 2.0, "big": 8.0}, free_gb=4.0)
+        scheduler = make_scheduler(memory)
+        order, release = [], asyncio.Event()
+        small = asyncio.create_task(hold(scheduler, "small", "interactive", order, release))
+        await asyncio.sleep(0.01)
+        big = asyncio.create_task(hold(scheduler, "big", "interactive", order, release))
+        await asyncio.sleep(0.01)
+        assert order == ["small"]
+        assert scheduler.stats()["queued"]["interactive"] == 1
+        release.set()
+        await asyncio.gather(small, big)
+        assert order == ["small", "big"]
+    asyncio.run(run())
+
+def test_loaded_models_do_not_lower_the_tier():
+    def profile(free_gb: float) -> HardwareProfile:
+        gpu = GPUInfo("gpu", total_memory_mb=16 * 1024, free_memory_mb=int(free_gb * 1024),
+                      driver_version="", cuda_version="")
+        return HardwareProfile("Linux", 8, 16, 32.0, 24.0, [gpu])
+
+    assert select_model_tier(profile(12.0)).tier == ModelTier.MEDIUM
+    # An 8GB model loaded: 4GB free, but the machine can still run the same tier
+    assert select_model_tier(profile(4.0)).tier == ModelTier.TINY
+    assert select_model_tier(profile(4.0), resident_gb=8.0).tier == ModelTier.MEDIUM
+    # ... and never more than the card holds
+    assert select_model_tier(profile(4.0), resident_gb=40.0).tier == ModelTier.MEDIUM
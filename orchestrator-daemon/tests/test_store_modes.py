@@ -0,0 +1,43 @@
+from src.vector.embedder import Embedder, HashingEmbeddingModel
+from src.vector.mmap_index import MmapIndex
+from src.vector.store import VectorStore
+
+CHUNKS = [
+    {"filepath": "session.py", "start_line": 1, "end_line": 3,
+     "content": "def load_user_session(request):\n    return request.cookies.get('session')\n"},
+    {"filepath": "parser.py", "start_line": 1, "end_line": 3,
+     "content": "def parse_config(text):\n    return dict(line.split('=') for line in text.splitlines())\n"},
+]
+
+# Identifier-like, so "auto" resolves to lexical, but not in any document
+MISSING_IDENTIFIER = "frobnicate_widget"
+
+def make_store(tmp_path, retrieval_mode: str) -> VectorStore:
+    store = VectorStore(str(tmp_path), retrieval_mode=retrieval_mode,
+                        index=MmapIndex(str(tmp_path / "mmap_index"), dtype="float32"),
+                        embedder=Embedder(HashingEmbeddingModel()))
+    store.add_chunks(CHUNKS)
+    return store
+
+def test_auto_request_falls_back_to_vector_on_a_hybrid_store(tmp_path):
+    store = make_store(tmp_path, "hybrid")
+    assert store.query_similar(MISSING_IDENTIFIER, n_results=2, mode="auto")
+
+def test_explicit_lexical_request_does_not_fall_back_on_an_auto_store(tmp_path):
+    store = make_store(tmp_path, "auto")
+    assert store.query_similar(MISSING_IDENTIFIER, n_results=2, mode="lexical") == []
+
+def test_default_auto_mode_falls_back(tmp_path):
+    store = make_store(tmp_path, "auto")
+    assert store.query_similar(MISSING_IDENTIFIER, n_results=2)
+
+def test_identifier_found_verbatim_uses_lexical_scores(tmp_path):
+    store = make_store(tmp_path, "auto")
+    results = store.query_similar("parse_config", n_results=2)
+    assert results[0]["metadata"]["filepath"] == "parser.py"
+    assert "score" in results[0]
+
+def test_vector_mode_ignores_the_lexical_index(tmp_path):
+    store = make_store(tmp_path, "auto")
+    store.lexical.clear()
+    assert len(store.query_similar("session cookies", n_results=2, mode="vector")) == 2
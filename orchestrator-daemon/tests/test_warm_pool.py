@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from src.config import Settings
+from src.hardware.detection import GPUInfo, HardwareProfile
+from src.ollama import warm_pool as warm_pool_module
+from src.ollama.client import OllamaModel
+from src.ollama.warm_pool import WarmPool
+
+SIZES = {"a": 4.0, "b": 4.0, "c": 4.0, "big": 8.0}
+
+class FakeCatalog:
+    def __init__(self):
+        self.loaded = set()
+
+    def snapshot(self) -> dict:
+        return {
+            "running": True,
+            "refreshed_at": 1.0,
+            "models": [OllamaModel(name=n, size_gb=s) for n, s in SIZES.items()],
+            "loaded": [OllamaModel(name=n, size_gb=SIZES[n]) for n in self.loaded]
+        }
+
+    def mark_loaded(self, model: str):
+        self.loaded.add(model)
+
+    def invalidate(self):
+        pass
+
+class FakeOllama:
+    def __init__(self, catalog: FakeCatalog):
+        self.catalog = catalog
+        self.unloaded = []
+
+    async def load_model(self, model, keep_alive=None) -> bool:
+        self.catalog.loaded.add(model)
+        return True
+
+    async def unload_model(self, model) -> bool:
+        self.catalog.loaded.discard(model)
+        self.unloaded.append(model)
+        return True
+
+class FakeSampler:
+    """16GB card; free memory is what the resident models leave."""
+    def __init__(self, catalog: FakeCatalog):
+        self.catalog = catalog
+
+    def smoothed_profile(self) -> HardwareProfile:
+        free_gb = 16.0 - sum(SIZES[m] for m in self.catalog.loaded)
+        gpu = GPUInfo("gpu", total_memory_mb=16 * 1024, free_memory_mb=int(free_gb * 1024),
+                      driver_version="", cuda_version="")
+        return HardwareProfile("Linux", 8, 16, 32.0, 24.0, [gpu])
+
+@pytest.fixture
+def fakes(monkeypatch):
+    catalog = FakeCatalog()
+    ollama = FakeOllama(catalog)
+    monkeypatch.setattr(warm_pool_module, "catalog", catalog)
+    monkeypatch.setattr(warm_pool_module, "get_async_client", lambda: ollama)
+    monkeypatch.setattr(warm_pool_module, "hardware_sampler", FakeSampler(catalog))
+    monkeypatch.setattr(warm_pool_module.generation_scheduler, "running", lambda model: 0)
+    return catalog, ollama
+
+def test_evicts_least_recently_used_first(fakes):
+    _, ollama = fakes
+    pool = WarmPool(Settings(warm_pool_budget_gb=10.0))
+    asyncio.run(pool.load("a"))
+    asyncio.run(pool.load("b"))
+    pool.touch("a")
+    asyncio.run(pool.load("c"))
+    assert ollama.unloaded == ["b"]
+    assert [m["name"] for m in pool.stats()["resident"]] == ["a", "c"]
+
+def test_pinned_and_generating_models_are_not_evicted(fakes, monkeypatch):
+    pool = WarmPool(Settings(warm_pool_budget_gb=10.0))
+    for model in ("a", "b", "c"):
+        pool.touch(model)
+    pool._pinned.add("a")
+    monkeypatch.setattr(warm_pool_module.generation_scheduler, "running", lambda model: int(model == "b"))
+    assert pool._victims() == ["c"]
+    assert pool._victims(need_gb=8.0, keep="c") == []
+
+def test_loading_a_model_does_not_shrink_the_budget(fakes):
+    _, ollama = fakes
+    pool = WarmPool(Settings())
+    before = pool.budget_gb()
+    assert before == 9.5
+    assert asyncio.run(pool.load("big"))
+    assert pool.budget_gb() == before
+    asyncio.run(pool._evict(pool._victims()))
+    assert ollama.unloaded == []
+    assert pool.stats()["used_gb"] == 8.0